@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmarks of the command-output parsers and scan result encoders
+Each benchmark runs on recorded command output from bench_data/ (including a dense
+environment with 200+ BSSIDs). Timings are normalized to a fixed pure-Python
+calibration workload so baselines recorded on one machine remain meaningful on
+another; a benchmark fails if it is more than `tolerance` slower than its baseline
+or if its result summary changed.
+
+Usage:
+    python3 bench_parsers.py              # compare with bench_baselines.json (exit 1 on regression)
+    python3 bench_parsers.py --update     # record new baselines
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+from podman_api import parse_ps_names
+from scan_codec import encode_scan_json, encode_scan_results, max_payload_size
+from wifi_config import parse_ipv4_address, parse_nmcli_wifi_list, parse_wpa_scan_results
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'bench_data')
+BASELINES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'bench_baselines.json')
+DEFAULT_TOLERANCE = 0.5
+MIN_RUN_TIME = 0.05
+REPEATS = 7
+BENCH_MTU = 517
+
+
+def read_data(name: str) -> str:
+    with open(os.path.join(DATA_DIR, name), encoding='utf-8') as f:
+        return f.read()
+
+
+def benchmarks() -> dict:
+    """{name: zero-argument callable} - inputs are loaded and prepared outside the timed call"""
+    nmcli_dense = read_data('nmcli_wifi_list_dense.txt')
+    nmcli_home = read_data('nmcli_wifi_list_home.txt')
+    wpa_dense = read_data('wpa_scan_results_dense.txt')
+    ip_addr = read_data('ip_addr_show_wlan0.txt')
+    podman_ps = read_data('podman_ps_names.txt')
+    networks = parse_wpa_scan_results(wpa_dense)
+    payload_size = max_payload_size(BENCH_MTU)
+    return {
+        'nmcli_wifi_list_home': lambda: parse_nmcli_wifi_list(nmcli_home),
+        'nmcli_wifi_list_dense': lambda: parse_nmcli_wifi_list(nmcli_dense),
+        'wpa_scan_results_dense': lambda: parse_wpa_scan_results(wpa_dense),
+        'ip_addr_show': lambda: parse_ipv4_address(ip_addr),
+        'podman_ps_names': lambda: parse_ps_names(podman_ps),
+        'scan_json_dense': lambda: encode_scan_json(networks),
+        'scan_binary_dense': lambda: encode_scan_results(networks, payload_size, 12),
+    }
+
+
+def result_summary(value):
+    """Small, stable description of a benchmark's result (checked against the baseline)"""
+    if isinstance(value, (list, bytes)):
+        return len(value)
+    return value
+
+
+def _calibration_workload():
+    # Same kind of work as the parsers: split lines, build dicts, sort
+    rows = [{'k': line.split(':')[0], 'v': int(line.split(':')[1])}
+            for line in (f'name{i}:{i * 7919 % 1000}' for i in range(500))]
+    rows.sort(key=lambda row: row['v'])
+    return rows
+
+
+def _loops_for(func) -> int:
+    """Number of calls that take at least MIN_RUN_TIME"""
+    loops = 1
+    while True:
+        started = time.perf_counter()
+        for _ in range(loops):
+            func()
+        elapsed = time.perf_counter() - started
+        if elapsed >= MIN_RUN_TIME:
+            return loops
+        loops *= 2 if elapsed <= 0 else max(2, int(MIN_RUN_TIME / elapsed * 1.2))
+
+
+def _time_loops(func, loops: int) -> float:
+    started = time.perf_counter()
+    for _ in range(loops):
+        func()
+    return (time.perf_counter() - started) / loops
+
+
+def measure(func, calibration_loops: int) -> tuple[float, float]:
+    """
+    Time a benchmark interleaved with the calibration workload, so CPU frequency
+    changes and noisy neighbours affect both sides of the ratio alike
+
+    Returns:
+        Tuple of (best per-call seconds, best cost relative to the calibration workload)
+    """
+    loops = _loops_for(func)
+    best_seconds = best_cost = float('inf')
+    for _ in range(REPEATS):
+        calibration = _time_loops(_calibration_workload, calibration_loops)
+        seconds = _time_loops(func, loops)
+        best_seconds = min(best_seconds, seconds)
+        best_cost = min(best_cost, seconds / calibration)
+    return (best_seconds, best_cost)
+
+
+def run(names=None) -> dict:
+    """
+    Returns:
+        {"calibration_us": float, "benchmarks": {name: {"us": per-call µs, "cost": normalized, "result": ...}}}
+    """
+    calibration_loops = _loops_for(_calibration_workload)
+    calibration = min(_time_loops(_calibration_workload, calibration_loops) for _ in range(REPEATS))
+    results = {}
+    for name, func in benchmarks().items():
+        if names and name not in names:
+            continue
+        seconds, cost = measure(func, calibration_loops)
+        results[name] = {
+            'us': round(seconds * 1e6, 2),
+            'cost': float(f'{cost:.4g}'),
+            'result': result_summary(func()),
+        }
+    return {'calibration_us': round(calibration * 1e6, 2), 'benchmarks': results}
+
+
+def compare(results: dict, baselines: dict) -> list:
+    """
+    Returns:
+        List of failure messages (empty if every benchmark is within tolerance)
+    """
+    tolerance = baselines.get('tolerance', DEFAULT_TOLERANCE)
+    failures = []
+    for name, result in results['benchmarks'].items():
+        baseline = baselines.get('benchmarks', {}).get(name)
+        if baseline is None:
+            failures.append(f"{name}: no baseline (run with --update)")
+            continue
+        if result['result'] != baseline['result']:
+            failures.append(f"{name}: result {result['result']!r} differs from baseline {baseline['result']!r}")
+        limit = baseline['cost'] * (1 + tolerance)
+        if result['cost'] > limit:
+            failures.append(f"{name}: cost {result['cost']:.4f} exceeds baseline {baseline['cost']:.4f} "
+                            f"+{tolerance:.0%}")
+    return failures
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('names', nargs='*', help='Benchmarks to run (default: all)')
+    parser.add_argument('--update', action='store_true', help='Write the results as new baselines')
+    parser.add_argument('--baselines', default=BASELINES_PATH, help='Baselines file')
+    args = parser.parse_args(argv)
+
+    results = run(args.names)
+    try:
+        with open(args.baselines, encoding='utf-8') as f:
+            baselines = json.load(f)
+    except FileNotFoundError:
+        baselines = {}
+
+    print(f"calibration: {results['calibration_us']:.1f} µs per call")
+    print(f"{'benchmark':<26} {'µs/call':>10} {'cost':>8} {'baseline':>9}  result")
+    for name, result in results['benchmarks'].items():
+        baseline = baselines.get('benchmarks', {}).get(name, {}).get('cost')
+        baseline_text = f"{baseline:.4f}" if baseline is not None else '-'
+        print(f"{name:<26} {result['us']:>10.2f} {result['cost']:>8.4f} {baseline_text:>9}  {result['result']}")
+
+    if args.update:
+        merged = dict(baselines.get('benchmarks', {}), **results['benchmarks'])
+        with open(args.baselines, 'w', encoding='utf-8') as f:
+            json.dump({
+                'tolerance': baselines.get('tolerance', DEFAULT_TOLERANCE),
+                'calibration_us': results['calibration_us'],
+                'benchmarks': {name: {'cost': r['cost'], 'result': r['result']} for name, r in sorted(merged.items())},
+            }, f, indent=2, ensure_ascii=False)
+            f.write('\n')
+        print(f"Baselines written to {args.baselines}")
+        return 0
+
+    failures = compare(results, baselines)
+    for failure in failures:
+        print(f"REGRESSION {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
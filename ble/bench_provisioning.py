@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+End-to-end provisioning benchmark on the scripted FakeSystem
+Runs the real provisioning flow (and, if ble_wifi_server is importable, the container
+restart and GATT handler functions) against simulated system tools for each scenario,
+and reports time-to-IP, time-to-containers-ready and handler latencies.
+
+Usage:
+    python3 bench_provisioning.py                          # all scenarios
+    python3 bench_provisioning.py nm slow_dhcp             # selected scenarios
+    python3 bench_provisioning.py --latency-scale 0.1      # quick smoke run (times not comparable)
+    python3 bench_provisioning.py --json results.json      # also write the results as JSON
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import logging
+import sys
+import time
+
+import provisioning
+import wifi_config
+from fake_system import SCENARIOS, FakeSystem
+
+BENCH_SSID = 'BenchNet'
+BENCH_PASSWORD = 'correct-horse-battery'
+HANDLER_REPEAT = 5
+
+
+def load_server():
+    """
+    Import the BLE server module for the container and GATT handler phases
+
+    Returns:
+        Tuple of (module or None, reason it is unavailable)
+    """
+    try:
+        import ble_wifi_server
+    except ImportError as e:
+        return (None, str(e))
+    return (ble_wifi_server, '')
+
+
+def handler_calls(server) -> list:
+    """(name, callable) of the functions behind the GATT read handlers"""
+    calls = [
+        ('get_current_ip_address', wifi_config.get_current_ip_address),
+        ('scan_wifi_networks', wifi_config.scan_wifi_networks),
+    ]
+    if server is not None:
+        calls += [
+            ('check_containers_status', server.check_containers_status),
+            ('get_container_logs', server.get_container_logs),
+        ]
+    return calls
+
+
+def measure_handlers(calls: list, repeat: int) -> dict:
+    """
+    Returns:
+        {name: {"median_ms": ..., "max_ms": ...}}
+    """
+    results = {}
+    for name, func in calls:
+        samples = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            func()
+            samples.append(time.perf_counter() - started)
+        samples.sort()
+        results[name] = {
+            'median_ms': round(samples[len(samples) // 2] * 1000, 1),
+            'max_ms': round(samples[-1] * 1000, 1),
+        }
+    return results
+
+
+def run_scenario(scenario, server=None, latency_scale: float = 1.0, repeat: int = HANDLER_REPEAT,
+                 verbose: bool = False) -> dict:
+    """
+    Provision once on a fresh FakeSystem, then restart containers and time the handlers
+
+    Returns:
+        Result dictionary (times in seconds, None where the phase did not complete)
+    """
+    system = FakeSystem(scenario, latency_scale)
+    output = contextlib.nullcontext() if verbose else contextlib.redirect_stdout(io.StringIO())
+    result = {'scenario': scenario.name, 'time_to_ip_s': None, 'time_to_containers_ready_s': None}
+    try:
+        with system.installed(*([server] if server else [])), output:
+            started = time.monotonic()
+            success, _ip_address = provisioning.configure_wifi(BENCH_SSID, BENCH_PASSWORD)
+            elapsed = time.monotonic() - started
+            result['success'] = success
+            if success:
+                result['time_to_ip_s'] = round(elapsed, 3)
+            else:
+                result['time_to_failure_s'] = round(elapsed, 3)
+            if success and server is not None:
+                server.WiFiConfigServer()._restart_containers()
+                if system.containers_running():
+                    result['time_to_containers_ready_s'] = round(time.monotonic() - started, 3)
+            result['handlers'] = measure_handlers(handler_calls(server), repeat)
+        result['commands'] = len(system.commands)
+        result['unknown_commands'] = sorted(set(system.unknown_commands))
+    finally:
+        system.close()
+    return result
+
+
+def _seconds(value) -> str:
+    return '-' if value is None else f'{value:.2f}s'
+
+
+def print_report(results: list, server_note: str):
+    print(f"{'scenario':<16} {'result':<16} {'to IP':>8} {'to containers':>14} {'commands':>9}")
+    for result in results:
+        outcome = 'ok' if result['success'] else f"failed ({_seconds(result.get('time_to_failure_s'))})"
+        print(f"{result['scenario']:<16} {outcome:<16} {_seconds(result['time_to_ip_s']):>8} "
+              f"{_seconds(result['time_to_containers_ready_s']):>14} {result['commands']:>9}")
+    print()
+    print("Handler latency (median / max ms):")
+    names = list(results[0]['handlers']) if results else []
+    print(f"  {'':<26}" + ''.join(f"{result['scenario']:>20}" for result in results))
+    for name in names:
+        cells = [result['handlers'][name] for result in results]
+        print(f"  {name:<26}" + ''.join(f"{cell['median_ms']:>10.1f} / {cell['max_ms']:<7.1f}" for cell in cells))
+    for result in results:
+        if result['unknown_commands']:
+            print(f"\nNot scripted in {result['scenario']}: {', '.join(result['unknown_commands'])}")
+    if server_note:
+        print(f"\nContainer and server handler phases skipped: {server_note}")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('scenarios', nargs='*', metavar='scenario',
+                        help=f"Scenarios to run: {', '.join(SCENARIOS)} (default: all)")
+    parser.add_argument('--latency-scale', type=float, default=1.0,
+                        help='Factor for all simulated delays (default: 1.0)')
+    parser.add_argument('--repeat', type=int, default=HANDLER_REPEAT,
+                        help=f'Calls per handler (default: {HANDLER_REPEAT})')
+    parser.add_argument('--json', metavar='PATH', help='Write the results as JSON')
+    parser.add_argument('--verbose', action='store_true', help='Show the output of the provisioning code')
+    args = parser.parse_args(argv)
+    unknown = [name for name in args.scenarios if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenario: {', '.join(unknown)}")
+
+    server, server_note = load_server()
+    # The provisioning code logs through the 'ble' loggers - shown only with --verbose
+    logging.basicConfig(format='%(levelname)s %(name)s: %(message)s')
+    for handler in logging.getLogger().handlers:
+        handler.setLevel(logging.INFO)
+    logging.getLogger('ble').setLevel(logging.INFO if args.verbose else logging.CRITICAL)
+    results = []
+    for name in args.scenarios or list(SCENARIOS):
+        print(f"Running scenario {name}...", file=sys.stderr)
+        results.append(run_scenario(SCENARIOS[name], server, args.latency_scale, args.repeat, args.verbose))
+
+    print_report(results, server_note)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'latency_scale': args.latency_scale, 'results': results}, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
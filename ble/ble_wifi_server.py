@@ -8,17 +8,37 @@ Requires bluez to be installed and running on the Raspberry Pi.
 """
 
 import dbus
+import dbus.bus
 import dbus.exceptions
 import dbus.mainloop.glib
 import dbus.service
 import logging
+import tracing
+import metrics
+import commands
+import timeline
+import session_recorder
 from gi.repository import GLib
-from wifi_config import configure_wifi, get_current_ip_address, scan_wifi_networks
+from wifi_config import get_current_ip_address, scan_wifi_networks
+from provisioning import configure_wifi
+from provisioning_queue import ProvisioningQueue
+from credentials_codec import MAX_RECORD_SIZE, decode_credentials, record_size
+from scan_cache import ScanCache
+from scan_codec import encode_scan_json, encode_scan_results, max_payload_size
+from podman_api import PodmanClient, PodmanError, container_names, parse_ps_names, user_socket_path
+from container_monitor import ContainerMonitor
+from log_tail import LogTail
+from journal_reader import read_unit_log
+from log_stream import LogStream, notification_payload_size
 import threading
 import subprocess
+import collections
 import time
 import json
 import os
+import functools
+import pwd
+from concurrent.futures import ThreadPoolExecutor
 
 # BLE Service and Characteristic UUIDs
 # Using custom UUIDs to avoid conflicts with standard Bluetooth services
@@ -31,9 +51,65 @@ WIFI_SCAN_CHAR_UUID = "12345678-1234-1234-1234-123456789ac1"
 CONTAINER_STATUS_CHAR_UUID = "12345678-1234-1234-1234-123456789ac2"
 START_CONTAINERS_CHAR_UUID = "12345678-1234-1234-1234-123456789ac3"
 CONTAINER_LOGS_CHAR_UUID = "12345678-1234-1234-1234-123456789ac4"
-
-logging.basicConfig(level=logging.INFO)
-logger = logging.getLogger(__name__)
+LOG_STREAM_CHAR_UUID = "12345678-1234-1234-1234-123456789ac5"
+DIAGNOSTICS_CHAR_UUID = "12345678-1234-1234-1234-123456789ac6"
+CREDENTIALS_CHAR_UUID = "12345678-1234-1234-1234-123456789ac7"
+
+# Short characteristic names (diagnostics summary, load generator)
+CHARACTERISTIC_NAMES = {
+    WIFI_SSID_CHAR_UUID: 'ssid',
+    WIFI_PASSWORD_CHAR_UUID: 'password',
+    STATUS_CHAR_UUID: 'status',
+    IP_ADDRESS_CHAR_UUID: 'ip',
+    WIFI_SCAN_CHAR_UUID: 'scan',
+    CONTAINER_STATUS_CHAR_UUID: 'container_status',
+    START_CONTAINERS_CHAR_UUID: 'start_containers',
+    CONTAINER_LOGS_CHAR_UUID: 'container_logs',
+    LOG_STREAM_CHAR_UUID: 'log_stream',
+    DIAGNOSTICS_CHAR_UUID: 'diagnostics',
+    CREDENTIALS_CHAR_UUID: 'credentials',
+}
+
+INSTALL_DIR = "/opt/scratch-albilab"
+SCRATCH_CONTAINERS = ("scratch-gui-app", "scratch-backend-app")
+
+# WiFi scan cache: results older than this (seconds) are refreshed in the background
+WIFI_SCAN_CACHE_TTL = float(os.environ.get('BLE_WIFI_SCAN_CACHE_TTL', '30'))
+# How long the very first scan read may wait for the initial scan (seconds)
+WIFI_SCAN_FIRST_READ_WAIT = 12
+# Scan result formats selectable by writing to the scan characteristic
+WIFI_SCAN_FORMAT_JSON = 'json'
+WIFI_SCAN_FORMAT_BINARY = 'binary'
+
+# Worker threads for slow GATT handlers (subprocess calls) so the GLib main loop stays responsive
+GATT_WORKER_THREADS = 2
+# Separate worker for blocking writes (starting containers can take a minute) so they never
+# hold up deferred reads
+GATT_WRITE_WORKER_THREADS = 1
+
+# Log stream: how often sources are checked for new lines, and the pause between notifications
+LOG_STREAM_POLL_INTERVAL_MS = 1000
+LOG_STREAM_SEND_INTERVAL_MS = 50
+# Journal lines sent when the log stream is subscribed (afterwards every new line is streamed)
+LOG_STREAM_INITIAL_JOURNAL_LINES = 20
+
+# Centrals whose written credentials and request status are kept (least recently used are dropped)
+MAX_CENTRAL_SESSIONS = 16
+# (central, request ID) pairs of credentials records remembered for dropping retransmissions
+RECENT_REQUEST_IDS = 32
+
+# Startup: the advertisement should be registered this soon after process start (seconds)
+STARTUP_ADVERTISE_TARGET = 1.0
+# Startup timing is logged as incomplete if milestones are still missing after this (seconds)
+STARTUP_REPORT_TIMEOUT = 30
+
+# Bus BlueZ is reached on: 'system', 'session' or a bus address (mock_bluez.py on a private bus)
+DBUS_BUS = os.environ.get('BLE_DBUS_BUS', 'system')
+
+tracing.configure()
+logger = tracing.get_tracer('server')
+# Per-request GATT traces (BLE_TRACE_LEVELS=gatt=DEBUG) - %-style args, formatted only if enabled
+gatt_trace = tracing.get_tracer('gatt')
 
 BLUEZ_SERVICE_NAME = 'org.bluez'
 ADAPTER_IFACE = 'org.bluez.Adapter1'
@@ -44,6 +120,7 @@ DBUS_OM_IFACE = 'org.freedesktop.DBus.ObjectManager'
 DBUS_PROP_IFACE = 'org.freedesktop.DBus.Properties'
 GATT_SERVICE_IFACE = 'org.bluez.GattService1'
 GATT_CHRC_IFACE = 'org.bluez.GattCharacteristic1'
+DEVICE_IFACE = 'org.bluez.Device1'
 
 
 class InvalidArgsException(dbus.exceptions.DBusException):
@@ -66,6 +143,44 @@ class FailedException(dbus.exceptions.DBusException):
     _dbus_error_name = 'org.bluez.Error.Failed'
 
 
+class InvalidOffsetException(dbus.exceptions.DBusException):
+    _dbus_error_name = 'org.bluez.Error.InvalidOffset'
+
+
+_gatt_workers = ThreadPoolExecutor(max_workers=GATT_WORKER_THREADS, thread_name_prefix='gatt-worker')
+_gatt_write_workers = ThreadPoolExecutor(max_workers=GATT_WRITE_WORKER_THREADS, thread_name_prefix='gatt-write')
+
+
+def _deliver(callback, *args):
+    """GLib idle callback: invoke callback once on the main loop"""
+    callback(*args)
+    return False
+
+
+def run_deferred(func, reply_handler, error_handler, executor=None):
+    """
+    Run a slow D-Bus handler on the worker pool and send its reply from the main loop
+    
+    Args:
+        func: Callable producing the reply value
+        reply_handler: dbus-python async reply callback (called with func's result, None for no result)
+        error_handler: dbus-python async error callback (called with the raised exception)
+        executor: Pool to run func on (default: the GATT worker pool)
+    """
+    def work():
+        try:
+            result = func()
+        except Exception as e:
+            GLib.idle_add(_deliver, error_handler, e)
+            return
+        if result is None:
+            GLib.idle_add(_deliver, reply_handler)
+        else:
+            GLib.idle_add(_deliver, reply_handler, result)
+    
+    (executor or _gatt_workers).submit(work)
+
+
 class Advertisement(dbus.service.Object):
     """LE Advertisement"""
     
@@ -123,33 +238,28 @@ class Application(dbus.service.Object):
     def add_service(self, service):
         self.services.append(service)
     
+    def forget_device(self, device):
+        """Drop per-central state of a disconnected central"""
+        for service in self.services:
+            service.forget_device(device)
+    
     @dbus.service.method(DBUS_OM_IFACE, out_signature='a{oa{sa{sv}}}')
     def GetManagedObjects(self):
         """Return all managed objects (services and characteristics)"""
-        import traceback
-        logger.info("=== GetManagedObjects CALLED ===")
-        logger.info(f"Call stack: {''.join(traceback.format_stack()[-3:-1])}")
         response = {}
+        started = time.monotonic()
         
-        # Add all services
-        for service in self.services:
-            service_props = service.get_properties()
-            response[service.get_path()] = service_props
-            logger.info(f"Added service {service.uuid} to GetManagedObjects at path {service.get_path()}")
-            
-            # Add all characteristics for each service
-            for chrc in service.characteristics:
-                chrc_props = chrc.get_properties()
-                chrc_path = chrc.get_path()
-                response[chrc_path] = chrc_props
-                logger.info(f"Added characteristic {chrc.uuid} to GetManagedObjects at path {chrc_path}")
-                # Log properties for IP address characteristic
-                if chrc.uuid == IP_ADDRESS_CHAR_UUID:
-                    logger.info(f"*** IP ADDRESS CHARACTERISTIC IN GetManagedObjects ***")
-                    logger.info(f"IP Address characteristic properties: {chrc_props}")
+        with metrics.timer('ble_gatt_request_duration_seconds', method='GetManagedObjects', uuid=''):
+            # Add all services
+            for service in self.services:
+                response[service.get_path()] = service.get_properties()
+                
+                # Add all characteristics for each service
+                for chrc in service.characteristics:
+                    response[chrc.get_path()] = chrc.get_properties()
         
-        logger.info(f"GetManagedObjects returning {len(response)} objects")
-        logger.info("=== END GetManagedObjects ===")
+        gatt_trace.debug('GetManagedObjects returning %d objects', len(response))
+        session_recorder.record('GetManagedObjects', self.path, started, objects=len(response))
         return response
 
 
@@ -164,6 +274,8 @@ class Service(dbus.service.Object):
         self.uuid = uuid
         self.primary = primary
         self.characteristics = []
+        # ATT MTU per connected central, as reported in ReadValue/WriteValue options
+        self.mtus = collections.OrderedDict()
         dbus.service.Object.__init__(self, bus, self.path)
 
     def get_properties(self):
@@ -189,33 +301,71 @@ class Service(dbus.service.Object):
             result.append(chrc.get_path())
         return result
 
+    def note_mtu(self, options):
+        """Remember the MTU a central reported in ReadValue/WriteValue options"""
+        if 'mtu' not in options:
+            return
+        device = str(options.get('device', ''))
+        self.mtus[device] = int(options['mtu'])
+        self.mtus.move_to_end(device)
+        while len(self.mtus) > MAX_CENTRAL_SESSIONS:
+            self.mtus.popitem(last=False)
+
+    def forget_device(self, device):
+        self.mtus.pop(device, None)
+        for chrc in self.characteristics:
+            chrc.forget_device(device)
+
     @dbus.service.method(DBUS_PROP_IFACE,
                          in_signature='s',
                          out_signature='a{sv}')
     def GetAll(self, interface):
         if interface != GATT_SERVICE_IFACE:
             raise InvalidArgsException()
-        logger.info(f"Service.GetAll called for interface: {interface}, UUID: {self.uuid}")
-        return self.get_properties()[GATT_SERVICE_IFACE]
+        gatt_trace.debug('Service.GetAll: %s', self.uuid)
+        started = time.monotonic()
+        properties = self.get_properties()[GATT_SERVICE_IFACE]
+        session_recorder.record('GetAll', self.path, started, uuid=self.uuid, interface=interface)
+        return properties
 
 
 class Characteristic(dbus.service.Object):
     """GATT Characteristic"""
     
+    # Set in derived classes whose read_value()/handle_write() run slow commands;
+    # those are executed on the worker pool and answered with a deferred D-Bus reply
+    blocking_read = False
+    blocking_write = False
+    # Written values are never recorded in GATT session files (only their length)
+    sensitive = False
+    
     def __init__(self, bus, index, uuid, flags, service):
         self.path = service.path + '/char' + str(index)
         self.bus = bus
         self.uuid = uuid
         self.service = service
         self.flags = flags
-        self.value = dbus.Array([], signature=dbus.Signature('y'))
+        self.value = b''
+        # Per-client value snapshots for long reads, keyed by the 'device' read option;
+        # dropped when the long read ends, on disconnect, or least recently used first
+        self.read_snapshots = collections.OrderedDict()
         dbus.service.Object.__init__(self, bus, self.path)
 
+    @property
+    def value(self):
+        """Current value as dbus.ByteArray (bytes, marshalled as 'ay' without per-byte objects)"""
+        return self._value
+
+    @value.setter
+    def value(self, data):
+        self._value = data if isinstance(data, dbus.ByteArray) else dbus.ByteArray(bytes(data))
+
+    def value_text(self):
+        """Value decoded for log messages - only call when the message is actually logged"""
+        return self._value.decode('utf-8', 'replace')
+
     def get_properties(self):
-        value_str = ''.join([chr(b) for b in self.value]) if self.value else ""
-        if self.uuid == IP_ADDRESS_CHAR_UUID:
-            logger.info(f'IPAddressCharacteristic.get_properties called: value="{value_str}", length={len(self.value)}')
-        props = {
+        return {
             GATT_CHRC_IFACE: {
                 'Service': self.service.get_path(),
                 'UUID': self.uuid,
@@ -223,80 +373,165 @@ class Characteristic(dbus.service.Object):
                 'Value': self.value
             }
         }
-        # Log for IP address characteristic
-        if self.uuid == IP_ADDRESS_CHAR_UUID:
-            logger.info(f'IPAddressCharacteristic.get_properties returning: UUID={self.uuid}, Flags={self.flags}, Value length={len(self.value)}')
-        return props
 
     def get_path(self):
         return dbus.ObjectPath(self.path)
 
+    def forget_device(self, device):
+        """Drop state kept for a central (override in derived classes that keep more)"""
+        self.read_snapshots.pop(device, None)
+
     @dbus.service.method(DBUS_PROP_IFACE,
                          in_signature='s',
                          out_signature='a{sv}')
     def GetAll(self, interface):
         if interface != GATT_CHRC_IFACE:
             raise InvalidArgsException()
-        logger.info(f"Characteristic.GetAll called for UUID: {self.uuid}, interface: {interface}")
-        if self.uuid == IP_ADDRESS_CHAR_UUID:
-            logger.info(f"*** IPAddressCharacteristic.GetAll CALLED ***")
-        result = self.get_properties()[GATT_CHRC_IFACE]
-        if self.uuid == IP_ADDRESS_CHAR_UUID:
-            logger.info(f"IPAddressCharacteristic.GetAll returning: {result}")
-        return result
+        gatt_trace.debug('Characteristic.GetAll: %s', self.uuid)
+        started = time.monotonic()
+        with metrics.timer('ble_gatt_request_duration_seconds', method='GetAll', uuid=self.uuid):
+            properties = self.get_properties()[GATT_CHRC_IFACE]
+        session_recorder.record('GetAll', self.path, started, uuid=self.uuid, interface=interface)
+        return properties
+
+    def timed_handlers(self, method, reply_handler, error_handler, options=None, value=None):
+        """
+        Wrap async D-Bus callbacks so the time until the reply and errors are recorded
+        (as metrics, and in the GATT session file when recording is on)
+        """
+        started = time.monotonic()
+        
+        def on_reply(*args):
+            metrics.observe('ble_gatt_request_duration_seconds', time.monotonic() - started,
+                            method=method, uuid=self.uuid)
+            session_recorder.record(method, self.path, started, uuid=self.uuid, options=options,
+                                    value=value, sensitive=self.sensitive,
+                                    size=len(args[0]) if args else None)
+            reply_handler(*args)
+        
+        def on_error(e):
+            metrics.observe('ble_gatt_request_duration_seconds', time.monotonic() - started,
+                            method=method, uuid=self.uuid)
+            metrics.inc('ble_gatt_request_errors_total', method=method, uuid=self.uuid)
+            session_recorder.record(method, self.path, started, uuid=self.uuid, options=options,
+                                    value=value, sensitive=self.sensitive,
+                                    error=getattr(e, '_dbus_error_name', None) or type(e).__name__)
+            error_handler(e)
+        
+        return on_reply, on_error
 
     @dbus.service.method(GATT_CHRC_IFACE,
                          in_signature='a{sv}',
-                         out_signature='ay')
-    def ReadValue(self, options):
-        logger.info(f'=== ReadValue CALLED ===')
-        logger.info(f'Characteristic UUID: {self.uuid}')
-        logger.info(f'Options: {options}')
-        value_str = ''.join([chr(b) for b in self.value]) if self.value else ""
+                         out_signature='ay',
+                         async_callbacks=('reply_handler', 'error_handler'))
+    def ReadValue(self, options, reply_handler, error_handler):
+        gatt_trace.debug('ReadValue %s options=%s', self.uuid, options)
+        reply_handler, error_handler = self.timed_handlers('ReadValue', reply_handler, error_handler, options)
+        offset = int(options.get('offset', 0))
+        device = str(options.get('device', ''))
+        self.service.note_mtu(options)
+        
+        def reply(value):
+            if offset > len(value):
+                error_handler(InvalidOffsetException())
+                return
+            if offset:
+                gatt_trace.debug('Long read continued: %s offset=%d total=%d', self.uuid, offset, len(value))
+            if len(value) - offset < max_payload_size(options.get('mtu')):
+                # A response shorter than the ATT maximum ends the client's long read
+                self.read_snapshots.pop(device, None)
+            reply_handler(dbus.ByteArray(value[offset:]) if offset else value)
+        
+        def store_and_reply(value):
+            self.read_snapshots[device] = value
+            self.read_snapshots.move_to_end(device)
+            while len(self.read_snapshots) > MAX_CENTRAL_SESSIONS:
+                self.read_snapshots.popitem(last=False)
+            reply(value)
+        
+        # Long read: BlueZ repeats ReadValue with growing offsets (ATT Read Blob).
+        # Offset 0 builds a fresh value, later offsets are served from the same client's
+        # snapshot so the client gets one consistent payload without re-running the read
+        if offset and device in self.read_snapshots:
+            reply(self.read_snapshots[device])
+        elif self.blocking_read:
+            # Slow read: answer later from the worker pool, keep serving other requests
+            run_deferred(lambda: self.read_value(options), store_and_reply, error_handler)
+        else:
+            try:
+                value = self.read_value(options)
+            except Exception as e:
+                error_handler(e)
+                return
+            store_and_reply(value)
+
+    def read_value(self, options):
+        """Build the value returned to a new read (override in derived classes)"""
         # For IP address, also try to get current value if empty
         if self.uuid == IP_ADDRESS_CHAR_UUID and len(self.value) == 0:
             current_ip = get_current_ip_address()
             if current_ip:
                 logger.info(f'IPAddressCharacteristic.ReadValue: value was empty, getting current IP: {current_ip}')
-                ip_bytes = current_ip.encode('utf-8')
-                self.value = dbus.Array([dbus.Byte(b) for b in ip_bytes], signature=dbus.Signature('y'))
-                value_str = current_ip
-        logger.info(f'ReadValue returning: UUID={self.uuid}, value length={len(self.value)}, value="{value_str}"')
-        if self.uuid == IP_ADDRESS_CHAR_UUID:
-            logger.info(f'*** IP ADDRESS ReadValue RETURNING: {value_str} ***')
+                self.value = current_ip.encode('utf-8')
+        if gatt_trace.isEnabledFor(logging.DEBUG):
+            gatt_trace.debug('ReadValue %s returning "%s"', self.uuid, self.value_text())
         return self.value
 
-    @dbus.service.method(GATT_CHRC_IFACE, in_signature='aya{sv}')
-    def WriteValue(self, value, options):
-        logger.info(f'=== WriteValue CALLED ===')
-        logger.info(f'Characteristic UUID: {self.uuid}')
-        logger.info(f'Value length: {len(value)}, options: {options}')
+    @dbus.service.method(GATT_CHRC_IFACE, in_signature='aya{sv}',
+                         async_callbacks=('reply_handler', 'error_handler'),
+                         byte_arrays=True)
+    def WriteValue(self, value, options, reply_handler, error_handler):
+        gatt_trace.debug('WriteValue %s length=%d options=%s', self.uuid, len(value), options)
+        reply_handler, error_handler = self.timed_handlers('WriteValue', reply_handler, error_handler,
+                                                           options, value)
+        self.service.note_mtu(options)
+        
+        def write():
+            try:
+                if not self.sensitive:
+                    self.value = value
+                # Handle write in derived classes
+                self.handle_write(value, options)
+                gatt_trace.debug('WriteValue completed for %s', self.uuid)
+            except Exception as e:
+                logger.error(f'Error in WriteValue for {self.uuid}: {e}', exc_info=True)
+                raise
+        
+        if self.blocking_write:
+            run_deferred(write, reply_handler, error_handler, _gatt_write_workers)
+            return
         try:
-            self.value = value
-            # Handle write in derived classes
-            self.handle_write(value)
-            logger.info(f'WriteValue completed successfully for {self.uuid}')
+            write()
         except Exception as e:
-            logger.error(f'Error in WriteValue for {self.uuid}: {e}', exc_info=True)
-            raise
+            error_handler(e)
+            return
+        reply_handler()
 
-    def handle_write(self, value):
+    def handle_write(self, value, options):
         """Override in derived classes"""
         pass
 
+    def start_notify(self):
+        """Called when the first central subscribes (override in derived classes)"""
+        pass
+
+    def stop_notify(self):
+        """Called when the last central unsubscribes (override in derived classes)"""
+        pass
+
     @dbus.service.method(GATT_CHRC_IFACE)
     def StartNotify(self):
-        logger.info(f'=== StartNotify CALLED ===')
-        logger.info(f'Characteristic UUID: {self.uuid}')
-        if self.uuid == IP_ADDRESS_CHAR_UUID:
-            logger.info(f'*** IP ADDRESS StartNotify CALLED ***')
+        gatt_trace.debug('StartNotify %s', self.uuid)
+        started = time.monotonic()
+        self.start_notify()
+        session_recorder.record('StartNotify', self.path, started, uuid=self.uuid)
 
     @dbus.service.method(GATT_CHRC_IFACE)
     def StopNotify(self):
-        logger.info(f'=== StopNotify CALLED ===')
-        logger.info(f'Characteristic UUID: {self.uuid}')
-        if self.uuid == IP_ADDRESS_CHAR_UUID:
-            logger.info(f'*** IP ADDRESS StopNotify CALLED ***')
+        gatt_trace.debug('StopNotify %s', self.uuid)
+        started = time.monotonic()
+        self.stop_notify()
+        session_recorder.record('StopNotify', self.path, started, uuid=self.uuid)
 
     @dbus.service.signal(DBUS_PROP_IFACE,
                          signature='sa{sv}as')
@@ -315,11 +550,11 @@ class WiFiSSIDCharacteristic(Characteristic):
             service)
         self.wifi_server = wifi_server
 
-    def handle_write(self, value):
+    def handle_write(self, value, options):
         try:
             ssid = bytes(value).decode('utf-8').strip()
             logger.info(f"Received SSID: {ssid}")
-            self.wifi_server.set_ssid(ssid)
+            self.wifi_server.set_ssid(ssid, str(options.get('device', '')))
         except Exception as e:
             logger.error(f"Error handling SSID write: {e}")
 
@@ -327,6 +562,8 @@ class WiFiSSIDCharacteristic(Characteristic):
 class WiFiPasswordCharacteristic(Characteristic):
     """Characteristic for WiFi Password"""
     
+    sensitive = True
+    
     def __init__(self, bus, index, service, wifi_server):
         Characteristic.__init__(
             self, bus, index,
@@ -335,11 +572,11 @@ class WiFiPasswordCharacteristic(Characteristic):
             service)
         self.wifi_server = wifi_server
 
-    def handle_write(self, value):
+    def handle_write(self, value, options):
         try:
             password = bytes(value).decode('utf-8').strip()
             logger.info("Received password")
-            self.wifi_server.set_password(password)
+            self.wifi_server.set_password(password, str(options.get('device', '')))
         except Exception as e:
             logger.error(f"Error handling password write: {e}")
 
@@ -355,12 +592,19 @@ class StatusCharacteristic(Characteristic):
             service)
         self.wifi_server = wifi_server
         idle_bytes = "idle".encode('utf-8')
-        self.value = dbus.Array([dbus.Byte(b) for b in idle_bytes], signature=dbus.Signature('y'))
+        self.value = idle_bytes
+
+    def read_value(self, options):
+        """Status of the reading central's own request; the last notified status for other centrals"""
+        status = self.wifi_server.central_status(str(options.get('device', '')))
+        if status is None:
+            return self.value
+        return status.encode('utf-8')
 
     def update_status(self, status):
         """Update status value and notify"""
         status_bytes = status.encode('utf-8')
-        self.value = dbus.Array([dbus.Byte(b) for b in status_bytes], signature=dbus.Signature('y'))
+        self.value = status_bytes
         self.PropertiesChanged(
             GATT_CHRC_IFACE,
             {'Value': self.value},
@@ -377,21 +621,14 @@ class IPAddressCharacteristic(Characteristic):
             ['read', 'notify'],
             service)
         self.wifi_server = wifi_server
-        # Try to get IP address immediately if available
-        initial_ip = get_current_ip_address()
-        if initial_ip:
-            ip_bytes = initial_ip.encode('utf-8')
-            self.value = dbus.Array([dbus.Byte(b) for b in ip_bytes], signature=dbus.Signature('y'))
-            logger.info(f'IPAddressCharacteristic initialized with IP: {initial_ip}')
-        else:
-            self.value = dbus.Array([], signature=dbus.Signature('y'))
-            logger.info(f'IPAddressCharacteristic initialized with empty value')
+        # Filled in by WiFiConfigServer.initialize_ip_address() once the server is advertising
+        self.value = b''
 
     def update_ip(self, ip):
         """Update IP address value and notify"""
         logger.info(f'IPAddressCharacteristic.update_ip called with IP: {ip}')
         ip_bytes = ip.encode('utf-8')
-        self.value = dbus.Array([dbus.Byte(b) for b in ip_bytes], signature=dbus.Signature('y'))
+        self.value = ip_bytes
         logger.info(f'IPAddressCharacteristic value updated, length: {len(self.value)}')
         self.PropertiesChanged(
             GATT_CHRC_IFACE,
@@ -407,56 +644,56 @@ class WiFiScanCharacteristic(Characteristic):
         Characteristic.__init__(
             self, bus, index,
             WIFI_SCAN_CHAR_UUID,
-            ['read'],
+            ['read', 'write'],
             service)
         self.wifi_server = wifi_server
-        self.value = dbus.Array([], signature=dbus.Signature('y'))
+        self.value = b''
+        self.scan_cache = ScanCache(scan_wifi_networks, ttl=WIFI_SCAN_CACHE_TTL)
+        # Result format per client (device path, dropped on disconnect); clients that never ask get JSON
+        self.formats = {}
+        # Start the first scan right away so the first read is answered from cache
+        self.scan_cache.refresh()
     
-    @dbus.service.method(GATT_CHRC_IFACE,
-                         in_signature='a{sv}',
-                         out_signature='ay')
-    def ReadValue(self, options):
-        """Read WiFi scan results - performs scan and returns JSON list of networks"""
-        logger.info('=== WiFiScanCharacteristic.ReadValue CALLED ===')
+    def forget_device(self, device):
+        # A reconnecting central starts with JSON again until it selects a format
+        Characteristic.forget_device(self, device)
+        self.formats.pop(device, None)
+    
+    @property
+    def blocking_read(self):
+        # Answered from the cache in milliseconds; only waiting for the first scan runs on the worker pool
+        return not self.scan_cache.has_result
+    
+    def handle_write(self, value, options):
+        """Select result format for the writing client: 'binary' or 'json'"""
+        scan_format = bytes(value).decode('utf-8').strip().lower()
+        if scan_format not in (WIFI_SCAN_FORMAT_JSON, WIFI_SCAN_FORMAT_BINARY):
+            raise InvalidArgsException(f'Unknown scan format: {scan_format}')
+        self.formats[str(options.get('device', ''))] = scan_format
+        logger.info(f'WiFi scan format set to {scan_format}')
+    
+    def read_value(self, options):
+        """Read WiFi scan results - returns cached networks (JSON or binary), refreshed in background"""
+        gatt_trace.debug('WiFiScanCharacteristic.ReadValue')
         
         try:
-            # Perform WiFi scan
-            logger.info('Starting WiFi scan...')
-            networks = scan_wifi_networks()
-            logger.info(f'WiFi scan completed, found {len(networks)} networks')
-            
-            # Limit to top 30 networks to avoid BLE size limits (512 bytes)
-            # BLE characteristic read has a limit, so we limit the number of networks
-            networks = networks[:30]
+            # Answer from the last good scan; stale results trigger a background refresh
+            networks, age = self.scan_cache.get(wait=WIFI_SCAN_FIRST_READ_WAIT)
+            networks = networks or []
+            gatt_trace.debug('WiFi scan cache returned %d networks (age: %ss)', len(networks), age)
             
-            # Simplify format - only include essential info to reduce size
-            simplified_networks = []
-            for net in networks:
-                simplified_networks.append({
-                    's': net.get('ssid', ''),  # 's' for SSID
-                    'g': net.get('signal', 0),  # 'g' for signal
-                    'c': net.get('security', '')[:10]  # 'c' for security (truncated)
-                })
+            if self.formats.get(str(options.get('device', ''))) == WIFI_SCAN_FORMAT_BINARY:
+                # Compact format sized to a single ATT read for the negotiated MTU
+                payload = encode_scan_results(networks, max_payload_size(options.get('mtu')), age)
+                self.value = payload
+                gatt_trace.debug('WiFiScanCharacteristic returning %d bytes (binary)', len(payload))
+                return self.value
             
-            # Convert to JSON
-            json_data = json.dumps(simplified_networks, ensure_ascii=False)
-            json_size = len(json_data)
-            logger.info(f'WiFi scan JSON size: {json_size} bytes, networks: {len(simplified_networks)}')
-            
-            # Check if JSON is too large (BLE limit is typically 512 bytes)
-            if json_size > 500:
-                logger.warning(f'JSON too large ({json_size} bytes), truncating networks')
-                # Further reduce if still too large
-                while json_size > 500 and len(simplified_networks) > 0:
-                    simplified_networks.pop()
-                    json_data = json.dumps(simplified_networks, ensure_ascii=False)
-                    json_size = len(json_data)
-                logger.info(f'Truncated to {len(simplified_networks)} networks, size: {json_size} bytes')
-            
-            # Convert to byte array using UTF-8 encoding
-            json_bytes = json_data.encode('utf-8')
-            self.value = dbus.Array([dbus.Byte(b) for b in json_bytes], signature=dbus.Signature('y'))
-            logger.info(f'WiFiScanCharacteristic returning {len(self.value)} bytes')
+            # Short keys and truncated security keep the JSON small; payloads larger
+            # than the MTU are fetched by the client with long reads
+            self.value = encode_scan_json(networks)
+            gatt_trace.debug('WiFiScanCharacteristic returning %d bytes (JSON, %d networks)',
+                             len(self.value), len(networks))
             
             return self.value
         except Exception as e:
@@ -464,50 +701,72 @@ class WiFiScanCharacteristic(Characteristic):
             # Return empty array on error
             error_json = json.dumps([{"error": str(e)}], ensure_ascii=False)
             error_bytes = error_json.encode('utf-8')
-            self.value = dbus.Array([dbus.Byte(b) for b in error_bytes], signature=dbus.Signature('y'))
+            self.value = error_bytes
             return self.value
 
 
 class ContainerStatusCharacteristic(Characteristic):
-    """Characteristic for checking container status"""
+    """Characteristic for checking container status (notifies on container start/stop)"""
     
     def __init__(self, bus, index, service, wifi_server):
         Characteristic.__init__(
             self, bus, index,
             CONTAINER_STATUS_CHAR_UUID,
-            ['read'],
+            ['read', 'notify'],
             service)
         self.wifi_server = wifi_server
-        self.value = dbus.Array([], signature=dbus.Signature('y'))
+        self.value = b''
+        # Container state pushed from podman events; reads fall back to polling while not in sync
+        self.monitor = ContainerMonitor(get_podman_client, SCRATCH_CONTAINERS,
+                                        on_change=self._on_containers_changed)
+        self.monitor.start()
     
-    @dbus.service.method(GATT_CHRC_IFACE,
-                         in_signature='a{sv}',
-                         out_signature='ay')
-    def ReadValue(self, options):
+    @property
+    def blocking_read(self):
+        # Answered from the in-memory model when it is in sync, otherwise runs podman
+        return not self.monitor.synced
+    
+    def _set_status(self, status):
+        status_json = json.dumps(status, ensure_ascii=False)
+        gatt_trace.debug('Container status: %s', status_json)
+        # Convert JSON string to bytes using UTF-8 encoding
+        status_bytes = status_json.encode('utf-8')
+        self.value = status_bytes
+        return self.value
+    
+    def _on_containers_changed(self, running_containers):
+        """Called from the monitor thread - notify subscribers from the main loop"""
+        def notify():
+            self.PropertiesChanged(
+                GATT_CHRC_IFACE,
+                {'Value': self._set_status(container_status_from_names(running_containers))},
+                [])
+            return False
+        GLib.idle_add(notify)
+    
+    def read_value(self, options):
         """Read container status - checks if both containers are running"""
-        logger.info('=== ContainerStatusCharacteristic.ReadValue CALLED ===')
+        gatt_trace.debug('ContainerStatusCharacteristic.ReadValue')
         
         try:
-            status = check_containers_status()
-            status_json = json.dumps(status, ensure_ascii=False)
-            logger.info(f'Container status: {status_json}')
-            
-            # Convert JSON string to bytes using UTF-8 encoding
-            status_bytes = status_json.encode('utf-8')
-            self.value = dbus.Array([dbus.Byte(b) for b in status_bytes], signature=dbus.Signature('y'))
-            return self.value
+            running_containers = self.monitor.running_containers()
+            if running_containers is not None:
+                return self._set_status(container_status_from_names(running_containers))
+            return self._set_status(check_containers_status())
         except Exception as e:
             logger.error(f'Error in ContainerStatusCharacteristic.ReadValue: {e}', exc_info=True)
             error_json = json.dumps({"error": str(e), "running": False}, ensure_ascii=False)
             # Convert JSON string to bytes using UTF-8 encoding
             error_bytes = error_json.encode('utf-8')
-            self.value = dbus.Array([dbus.Byte(b) for b in error_bytes], signature=dbus.Signature('y'))
+            self.value = error_bytes
             return self.value
 
 
 class StartContainersCharacteristic(Characteristic):
     """Characteristic for starting containers"""
     
+    blocking_write = True
+    
     def __init__(self, bus, index, service, wifi_server):
         Characteristic.__init__(
             self, bus, index,
@@ -516,7 +775,7 @@ class StartContainersCharacteristic(Characteristic):
             service)
         self.wifi_server = wifi_server
     
-    def handle_write(self, value):
+    def handle_write(self, value, options):
         """Handle write to start containers"""
         try:
             command = bytes(value).decode('utf-8').strip()
@@ -534,6 +793,8 @@ class StartContainersCharacteristic(Characteristic):
 class ContainerLogsCharacteristic(Characteristic):
     """Characteristic for reading container logs"""
     
+    blocking_read = True
+    
     def __init__(self, bus, index, service, wifi_server):
         Characteristic.__init__(
             self, bus, index,
@@ -541,36 +802,289 @@ class ContainerLogsCharacteristic(Characteristic):
             ['read'],
             service)
         self.wifi_server = wifi_server
-        self.value = dbus.Array([], signature=dbus.Signature('y'))
+        self.value = b''
+        # Journal cursor per central - repeated reads only return new service log entries
+        # (dropped on disconnect, least recently used first beyond MAX_CENTRAL_SESSIONS)
+        self.journal_cursors = collections.OrderedDict()
+        self.cursors_lock = threading.Lock()
     
-    @dbus.service.method(GATT_CHRC_IFACE,
-                         in_signature='a{sv}',
-                         out_signature='ay')
-    def ReadValue(self, options):
+    def forget_device(self, device):
+        Characteristic.forget_device(self, device)
+        with self.cursors_lock:
+            self.journal_cursors.pop(device, None)
+    
+    def read_value(self, options):
         """Read container logs from RPi"""
-        logger.info('=== ContainerLogsCharacteristic.ReadValue CALLED ===')
+        gatt_trace.debug('ContainerLogsCharacteristic.ReadValue')
         
         try:
-            logs = get_container_logs()
-            # Limit log size to avoid BLE size limits (512 bytes)
-            # Convert to bytes first to get accurate byte count
+            device = str(options.get('device', ''))
+            with self.cursors_lock:
+                cursor = self.journal_cursors.get(device)
+            logs, cursor = get_container_logs(cursor)
+            with self.cursors_lock:
+                self.journal_cursors[device] = cursor
+                self.journal_cursors.move_to_end(device)
+                while len(self.journal_cursors) > MAX_CENTRAL_SESSIONS:
+                    self.journal_cursors.popitem(last=False)
+            # Whole log snapshot - the client fetches it with long reads (offset)
             logs_bytes = logs.encode('utf-8')
-            if len(logs_bytes) > 500:
-                logs_bytes = logs_bytes[-500:]  # Take last 500 bytes
-                logger.warning(f'Logs truncated to 500 bytes')
             
-            logger.info(f'Returning {len(logs_bytes)} bytes of logs')
-            self.value = dbus.Array([dbus.Byte(b) for b in logs_bytes], signature=dbus.Signature('y'))
+            gatt_trace.debug('Returning %d bytes of logs', len(logs_bytes))
+            self.value = logs_bytes
             return self.value
         except Exception as e:
             logger.error(f'Error in ContainerLogsCharacteristic.ReadValue: {e}', exc_info=True)
             error_msg = f"Error getting logs: {str(e)}"
             # Convert error message to bytes using UTF-8 encoding
             error_bytes = error_msg.encode('utf-8')
-            self.value = dbus.Array([dbus.Byte(b) for b in error_bytes], signature=dbus.Signature('y'))
+            self.value = error_bytes
             return self.value
 
 
+class LogStreamCharacteristic(Characteristic):
+    """Characteristic streaming new monitor log and service journal lines as notifications"""
+    
+    def __init__(self, bus, index, service, wifi_server):
+        Characteristic.__init__(
+            self, bus, index,
+            LOG_STREAM_CHAR_UUID,
+            ['notify'],
+            service)
+        self.wifi_server = wifi_server
+        self.stream = LogStream()
+        self.journal_cursor = None
+        self.notifying = False
+        self.collecting = False
+        self.poll_source = None
+        self.send_source = None
+    
+    def start_notify(self):
+        if self.notifying:
+            return
+        logger.info('Log stream subscribed')
+        self.notifying = True
+        self.stream.clear()
+        self.journal_cursor = None
+        self.poll()
+        self.poll_source = GLib.timeout_add(LOG_STREAM_POLL_INTERVAL_MS, self.poll)
+        self.send_source = GLib.timeout_add(LOG_STREAM_SEND_INTERVAL_MS, self.send_next)
+    
+    def stop_notify(self):
+        if not self.notifying:
+            return
+        logger.info('Log stream unsubscribed')
+        self.notifying = False
+        for source in (self.poll_source, self.send_source):
+            if source:
+                GLib.source_remove(source)
+        self.poll_source = self.send_source = None
+    
+    def collect(self):
+        """Queue lines appended to the log files and the journal since the last poll (worker thread)"""
+        for log_file in LOG_FILES:
+            text, skipped = get_log_tail(log_file).read_new(self.stream.max_pending)
+            if skipped:
+                self.stream.note_dropped(1)
+            if text:
+                self.stream.push(text, os.path.basename(log_file))
+        # The first poll starts from the last lines; later polls read everything new, so lines
+        # beyond the stream limit are dropped (and counted) by the stream, not skipped unseen
+        limit = None if self.journal_cursor else LOG_STREAM_INITIAL_JOURNAL_LINES
+        lines, self.journal_cursor = read_unit_log('scratch-albilab.service', self.journal_cursor, limit=limit)
+        if lines:
+            self.stream.push('\n'.join(lines), 'journal')
+    
+    def poll(self):
+        if not self.notifying:
+            return False
+        if not self.collecting:
+            self.collecting = True
+            
+            def done(*args):
+                self.collecting = False
+            
+            def failed(e):
+                self.collecting = False
+                logger.warning(f'Collecting log stream lines failed: {e}')
+            
+            run_deferred(self.collect, done, failed)
+        return True
+    
+    def send_next(self):
+        """Send at most one chunk per tick - lines queued beyond the stream limit are dropped"""
+        if not self.notifying:
+            return False
+        # Notifications reach every subscribed central, so chunks fit the smallest MTU among
+        # the connected centrals (disconnected ones are dropped from service.mtus)
+        mtu = min(self.service.mtus.values()) if self.service.mtus else None
+        chunk = self.stream.next_chunk(notification_payload_size(mtu))
+        if chunk is not None:
+            self.value = chunk
+            self.PropertiesChanged(GATT_CHRC_IFACE, {'Value': self.value}, [])
+        return True
+
+
+class CredentialsCharacteristic(Characteristic):
+    """Characteristic taking SSID, password, BSSID hint and request ID as one record (credentials_codec)"""
+    
+    sensitive = True
+    
+    def __init__(self, bus, index, service, wifi_server):
+        Characteristic.__init__(
+            self, bus, index,
+            CREDENTIALS_CHAR_UUID,
+            ['write'],
+            service)
+        self.wifi_server = wifi_server
+        # Long writes in progress per central: BlueZ passes each prepared chunk with its offset
+        # (dropped on disconnect, least recently used first beyond MAX_CENTRAL_SESSIONS)
+        self.partial = collections.OrderedDict()
+    
+    def forget_device(self, device):
+        # An interrupted long write must not be continued by the next connection
+        Characteristic.forget_device(self, device)
+        self.partial.pop(device, None)
+    
+    def handle_write(self, value, options):
+        """Collect the record (single or long write) and queue it once complete"""
+        device = str(options.get('device', ''))
+        offset = int(options.get('offset', 0))
+        if offset:
+            buffer = self.partial.get(device)
+            if buffer is None or offset != len(buffer):
+                self.partial.pop(device, None)
+                raise InvalidOffsetException()
+            buffer += bytes(value)
+        else:
+            buffer = self.partial[device] = bytearray(value)
+            self.partial.move_to_end(device)
+            while len(self.partial) > MAX_CENTRAL_SESSIONS:
+                self.partial.popitem(last=False)
+        
+        try:
+            size = record_size(buffer)
+            if len(buffer) > MAX_RECORD_SIZE:
+                raise ValueError(f'Credentials record longer than {MAX_RECORD_SIZE} bytes')
+            if size is None or len(buffer) < size:
+                gatt_trace.debug('Credentials long write: %d bytes so far', len(buffer))
+                return
+            del self.partial[device]
+            credentials = decode_credentials(bytes(buffer))
+        except ValueError as e:
+            self.partial.pop(device, None)
+            logger.warning(f"Rejected credentials record: {e}")
+            raise InvalidArgsException(str(e))
+        
+        logger.info(f"Received credentials for SSID: {credentials.ssid} (request {credentials.request_id})")
+        self.wifi_server.submit_credentials(credentials, device)
+
+
+class DiagnosticsCharacteristic(Characteristic):
+    """Read-only characteristic with a compact latency/counter summary for field profiling"""
+    
+    def __init__(self, bus, index, service, wifi_server):
+        Characteristic.__init__(
+            self, bus, index,
+            DIAGNOSTICS_CHAR_UUID,
+            ['read'],
+            service)
+        self.wifi_server = wifi_server
+    
+    def read_value(self, options):
+        """
+        Metrics summary as JSON (at most metrics.SUMMARY_MAX_BYTES):
+        {"up": uptime_s, "h": {"gatt ReadValue scan": [count, avg_ms, p95_ms, max_ms]}, "c": {"err ReadValue scan": n},
+         "more": entries left out}
+        """
+        summary = metrics.summary(label_aliases=CHARACTERISTIC_NAMES)
+        self.value = json.dumps(summary, separators=(',', ':')).encode('utf-8')
+        return self.value
+
+
+@functools.lru_cache(maxsize=1)
+def get_install_user():
+    """
+    Find the user who owns the installation directory (looked up once)
+    Containers are typically run by the user who owns the install directory
+    
+    Returns:
+        User name, or None if it cannot be determined
+    """
+    try:
+        install_user = pwd.getpwuid(os.stat(INSTALL_DIR).st_uid).pw_name
+        logger.info(f"Install directory owned by user: {install_user}")
+        return install_user
+    except Exception as e:
+        logger.warning(f"Could not determine install directory owner: {e}")
+        return None
+
+
+def get_podman_user():
+    """User whose podman instance runs the containers (None = current user)"""
+    install_user = get_install_user()
+    if install_user and os.geteuid() == 0 and install_user != 'root':
+        return install_user
+    return None
+
+
+@functools.lru_cache(maxsize=4)
+def _podman_client_for(user):
+    try:
+        return PodmanClient(user_socket_path(user))
+    except KeyError:
+        # Unknown user
+        return None
+
+
+def get_podman_client(user=None):
+    """
+    Podman REST API client for a user's podman.sock
+    
+    Args:
+        user: User running rootless podman (default: owner of the install directory)
+        
+    Returns:
+        PodmanClient, or None if the API socket is not available (use podman CLI then)
+    """
+    client = _podman_client_for(user if user is not None else get_podman_user())
+    if client and client.available():
+        return client
+    return None
+
+
+def container_status_from_names(running_containers):
+    """
+    Build the container status dictionary from running container names
+    
+    Args:
+        running_containers: Names of running containers
+        
+    Returns:
+        Dictionary with status information
+    """
+    result = {
+        "running": False,
+        "gui_running": False,
+        "backend_running": False,
+        "message": ""
+    }
+    
+    # Check for both containers
+    result["gui_running"] = any("scratch-gui-app" in name for name in running_containers)
+    result["backend_running"] = any("scratch-backend-app" in name for name in running_containers)
+    result["running"] = result["gui_running"] and result["backend_running"]
+    
+    if result["running"]:
+        result["message"] = "Scratch služba funguje"
+    elif result["gui_running"] or result["backend_running"]:
+        result["message"] = "Scratch služba částečně spuštěna"
+    else:
+        result["message"] = "Scratch služba není spuštěna"
+    return result
+
+
+@metrics.timed()
 def check_containers_status():
     """
     Check if both scratch containers are running
@@ -578,7 +1092,6 @@ def check_containers_status():
     Returns:
         Dictionary with status information
     """
-    INSTALL_DIR = "/opt/scratch-albilab"
     result = {
         "running": False,
         "gui_running": False,
@@ -587,61 +1100,50 @@ def check_containers_status():
     }
     
     try:
-        # Try to find the user who owns the installation directory
-        # Containers are typically run by the user who owns the install directory
-        import pwd
-        import stat
+        running_containers = None
+        install_user = get_podman_user()
         
-        try:
-            install_stat = os.stat(INSTALL_DIR)
-            install_uid = install_stat.st_uid
-            install_user = pwd.getpwuid(install_uid).pw_name
-            logger.info(f"Install directory owned by user: {install_user}")
-        except Exception as e:
-            logger.warning(f"Could not determine install directory owner: {e}")
-            install_user = None
-        
-        # Check if containers are running using podman
-        # If we're running as root but containers run under another user,
-        # try to run podman as that user
-        if install_user and os.geteuid() == 0 and install_user != 'root':
-            # Running as root, but containers are under another user
-            # Try to run podman as that user
-            logger.info(f"Running podman as user {install_user}")
-            check_result = subprocess.run(
-                ['su', '-', install_user, '-c', 'podman ps --format "{{.Names}}"'],
-                capture_output=True,
-                text=True,
-                timeout=5
-            )
-        else:
-            # Run podman normally (as current user)
-            check_result = subprocess.run(
-                ['podman', 'ps', '--format', '{{.Names}}'],
-                capture_output=True,
-                text=True,
-                timeout=5
-            )
+        # Preferred: podman REST API over the user's podman.sock
+        client = get_podman_client()
+        if client:
+            try:
+                running_containers = container_names(client.list_containers())
+            except PodmanError as e:
+                logger.warning(f"Podman API not usable, falling back to podman CLI: {e}")
         
-        if check_result.returncode == 0:
-            # Parse output - filter out empty lines and strip whitespace
-            running_containers = [line.strip() for line in check_result.stdout.strip().split('\n') if line.strip()]
-            logger.info(f"Found running containers: {running_containers}")
+        if running_containers is None:
+            # Check if containers are running using podman
+            # If we're running as root but containers run under another user,
+            # try to run podman as that user
+            if install_user:
+                # Running as root, but containers are under another user
+                # Try to run podman as that user
+                logger.info(f"Running podman as user {install_user}")
+                check_result = commands.run(
+                    ['su', '-', install_user, '-c', 'podman ps --format "{{.Names}}"'],
+                    capture_output=True,
+                    text=True,
+                    timeout=5
+                )
+            else:
+                # Run podman normally (as current user)
+                check_result = commands.run(
+                    ['podman', 'ps', '--format', '{{.Names}}'],
+                    capture_output=True,
+                    text=True,
+                    timeout=5
+                )
             
-            # Check for both containers
-            result["gui_running"] = any("scratch-gui-app" in name for name in running_containers)
-            result["backend_running"] = any("scratch-backend-app" in name for name in running_containers)
-            result["running"] = result["gui_running"] and result["backend_running"]
+            if check_result.returncode != 0:
+                result["message"] = f"Chyba při kontrole kontejnerů: {check_result.stderr}"
+                logger.error(f"podman ps failed: returncode={check_result.returncode}, stderr={check_result.stderr}, stdout={check_result.stdout}")
+                return result
             
-            if result["running"]:
-                result["message"] = "Scratch služba funguje"
-            elif result["gui_running"] or result["backend_running"]:
-                result["message"] = "Scratch služba částečně spuštěna"
-            else:
-                result["message"] = "Scratch služba není spuštěna"
-        else:
-            result["message"] = f"Chyba při kontrole kontejnerů: {check_result.stderr}"
-            logger.error(f"podman ps failed: returncode={check_result.returncode}, stderr={check_result.stderr}, stdout={check_result.stdout}")
+            # Parse output - filter out empty lines and strip whitespace
+            running_containers = parse_ps_names(check_result.stdout)
+        
+        logger.info(f"Found running containers: {running_containers}")
+        result = container_status_from_names(running_containers)
     except Exception as e:
         result["message"] = f"Chyba při kontrole kontejnerů: {str(e)}"
         logger.error(result["message"], exc_info=True)
@@ -657,7 +1159,6 @@ def start_containers():
     Returns:
         Dictionary with result information
     """
-    INSTALL_DIR = "/opt/scratch-albilab"
     WRAPPER_SCRIPT = f"{INSTALL_DIR}/podman-compose-wrapper.sh"
     service_user = 'pi'  # Service runs under user 'pi'
     result = {
@@ -676,7 +1177,7 @@ def start_containers():
         # Start containers using wrapper script as user 'pi' (not root!)
         # Wrapper script internally calls podman-compose, which must run as non-root
         logger.info(f"Starting containers as user: {service_user}")
-        start_result = subprocess.run(
+        start_result = commands.run(
             ['su', '-', service_user, '-c', f'{WRAPPER_SCRIPT} start'],
             capture_output=True,
             text=True,
@@ -702,82 +1203,136 @@ def start_containers():
     return result
 
 
-def get_container_logs():
+LOG_FILES = [
+    f"{INSTALL_DIR}/container-monitor.log",
+    f"{INSTALL_DIR}/update-check.log"
+]
+LOG_TAIL_LINES = 50
+
+# Tail indexes of LOG_FILES, kept current via inotify between reads
+_log_tails = {}
+
+
+def get_log_tail(log_file):
+    """Shared LogTail for a log file (created on first use)"""
+    tail = _log_tails.get(log_file)
+    if tail is None:
+        tail = _log_tails.setdefault(log_file, LogTail(log_file, LOG_TAIL_LINES))
+    return tail
+
+
+@metrics.timed()
+def get_container_logs(journal_cursor=None):
     """
     Get logs from container monitoring and wrapper script
     
+    Args:
+        journal_cursor: Journal cursor returned by the previous call for the same client
+                        (None to include the last 20 service log lines)
+    
     Returns:
-        String with logs
+        Tuple of (string with logs, journal cursor for the next call)
     """
-    INSTALL_DIR = "/opt/scratch-albilab"
-    LOG_FILES = [
-        f"{INSTALL_DIR}/container-monitor.log",
-        f"{INSTALL_DIR}/update-check.log"
-    ]
-    
     logs = []
     logs.append(f"=== Container Logs from RPi ===\n")
     logs.append(f"Timestamp: {time.strftime('%Y-%m-%d %H:%M:%S')}\n\n")
     
-    # Get container status
-    try:
-        status_result = subprocess.run(
-            ['podman', 'ps', '-a', '--format', '{{.Names}}: {{.Status}}'],
-            capture_output=True,
-            text=True,
-            timeout=5
-        )
-        if status_result.returncode == 0:
+    # Get container status (podman API first, then CLI)
+    client = get_podman_client()
+    if client:
+        try:
+            containers = client.list_containers(all=True)
             logs.append("Container Status:\n")
-            logs.append(status_result.stdout)
+            for container in containers:
+                status = container.get('Status') or container.get('State', '')
+                for name in container.get('Names') or []:
+                    logs.append(f"{name}: {status}\n")
             logs.append("\n")
-    except Exception as e:
-        logs.append(f"Error getting container status: {str(e)}\n")
+        except PodmanError as e:
+            logger.warning(f"Podman API not usable for logs, falling back to podman CLI: {e}")
+            client = None
+    
+    if client:
+        # Recent output of the scratch containers themselves
+        for name in SCRATCH_CONTAINERS:
+            if name in container_names(containers):
+                try:
+                    container_output = client.container_logs(name, tail=10)
+                    logs.append(f"=== {name} (last 10 lines) ===\n")
+                    logs.append(container_output)
+                    logs.append("\n")
+                except PodmanError as e:
+                    logs.append(f"Error getting logs of {name}: {str(e)}\n")
+    
+    if client is None:
+        try:
+            status_result = commands.run(
+                ['podman', 'ps', '-a', '--format', '{{.Names}}: {{.Status}}'],
+                capture_output=True,
+                text=True,
+                timeout=5
+            )
+            if status_result.returncode == 0:
+                logs.append("Container Status:\n")
+                logs.append(status_result.stdout)
+                logs.append("\n")
+        except Exception as e:
+            logs.append(f"Error getting container status: {str(e)}\n")
     
     # Read log files
     for log_file in LOG_FILES:
-        if os.path.exists(log_file):
+        tail = get_log_tail(log_file)
+        if tail.exists():
             try:
-                with open(log_file, 'r', encoding='utf-8') as f:
-                    file_content = f.read()
-                    # Get last 50 lines
-                    lines = file_content.split('\n')
-                    last_lines = '\n'.join(lines[-50:])
-                    logs.append(f"=== {os.path.basename(log_file)} (last 50 lines) ===\n")
-                    logs.append(last_lines)
-                    logs.append("\n")
+                # Only the last lines are read, however large the log has grown
+                last_lines = tail.text()
+                logs.append(f"=== {os.path.basename(log_file)} (last {LOG_TAIL_LINES} lines) ===\n")
+                logs.append(last_lines)
+                logs.append("\n")
             except Exception as e:
                 logs.append(f"Error reading {log_file}: {str(e)}\n")
     
-    # Get recent journalctl logs for scratch services
+    # Get recent journal logs for scratch services (only entries since the client's last read)
     try:
-        journal_result = subprocess.run(
-            ['journalctl', '-u', 'scratch-albilab.service', '-n', '20', '--no-pager'],
-            capture_output=True,
-            text=True,
-            timeout=5
-        )
-        if journal_result.returncode == 0:
+        journal_lines, new_cursor = read_unit_log('scratch-albilab.service', journal_cursor, limit=20)
+        if journal_cursor:
+            logs.append(f"=== Systemd Service Logs ({len(journal_lines)} new lines) ===\n")
+        else:
             logs.append("=== Systemd Service Logs (last 20 lines) ===\n")
-            logs.append(journal_result.stdout)
-            logs.append("\n")
+        logs.append(''.join(line + '\n' for line in journal_lines))
+        logs.append("\n")
+        journal_cursor = new_cursor
     except Exception as e:
         logs.append(f"Error getting journalctl logs: {str(e)}\n")
     
-    return ''.join(logs)
+    return (''.join(logs), journal_cursor)
 
 
-class WiFiConfigServer:
-    """BLE Server for WiFi configuration"""
+class CentralSession:
+    """Credentials written by one central and the status of its provisioning request"""
     
-    def __init__(self):
+    def __init__(self, device):
+        self.device = device
         self.ssid = ""
         self.password = ""
         self.status = "idle"
+
+
+class WiFiConfigServer:
+    """BLE Server for WiFi configuration"""
+    
+    def __init__(self):
         self.ip_address = ""
         self.status_char = None
         self.ip_char = None
-        self.config_thread = None
+        # Per-central state keyed by the BlueZ device path from the write options
+        self.sessions = collections.OrderedDict()
+        self.sessions_lock = threading.Lock()
+        # Provisioning requests run one at a time in submission order
+        self.provisioning = ProvisioningQueue(self._run_request)
+        # {(device, request ID): ProvisioningRequest} of recent credentials records - IDs are
+        # chosen by the clients, so two phones may well use the same one
+        self.recent_requests = collections.OrderedDict()
         
     def initialize_ip_address(self):
         """Initialize IP address from current network connection"""
@@ -787,8 +1342,8 @@ class WiFiConfigServer:
             logger.info(f"Found existing IP address: {current_ip}")
             if self.ip_char:
                 logger.info(f"Updating IP address characteristic with: {current_ip}")
-                self.ip_char.update_ip(current_ip)
-                logger.info(f"IP address characteristic updated")
+                # Called from the startup thread - PropertiesChanged is emitted from the main loop
+                GLib.idle_add(_deliver, self.ip_char.update_ip, current_ip)
             else:
                 logger.warning("ip_char is None, cannot update IP address characteristic")
             return True
@@ -796,61 +1351,177 @@ class WiFiConfigServer:
             logger.info("No IP address found on any interface")
             return False
 
-    def set_ssid(self, ssid):
-        """Set SSID and trigger configuration if password is also set"""
-        self.ssid = ssid
-        if self.ssid and self.password:
-            self._configure_wifi()
-
-    def set_password(self, password):
-        """Set password and trigger configuration if SSID is also set"""
-        self.password = password
-        if self.ssid and self.password:
-            self._configure_wifi()
-
-    def _configure_wifi(self):
-        """Configure WiFi in a separate thread"""
-        if self.config_thread and self.config_thread.is_alive():
-            return
+    def _session(self, device):
+        """Session of a central (created on first use; call with sessions_lock held)"""
+        session = self.sessions.get(device)
+        if session is None:
+            session = self.sessions[device] = CentralSession(device)
+            while len(self.sessions) > MAX_CENTRAL_SESSIONS:
+                self.sessions.popitem(last=False)
+        else:
+            self.sessions.move_to_end(device)
+        return session
+
+    def central_status(self, device):
+        """Status of a central's own provisioning request, or None if it never sent credentials"""
+        with self.sessions_lock:
+            session = self.sessions.get(device)
+            if session is None or session.status == "idle":
+                return None
+            return session.status
+
+    def set_ssid(self, ssid, device=''):
+        """Set a central's SSID and queue configuration if its password is also set"""
+        with self.sessions_lock:
+            session = self._session(device)
+            session.ssid = ssid
+            ready = bool(session.ssid and session.password)
+        if ready:
+            self._configure_wifi(session)
+
+    def set_password(self, password, device=''):
+        """Set a central's password and queue configuration if its SSID is also set"""
+        with self.sessions_lock:
+            session = self._session(device)
+            session.password = password
+            ready = bool(session.ssid and session.password)
+        if ready:
+            self._configure_wifi(session)
+
+    def submit_credentials(self, credentials, device=''):
+        """
+        Queue a single-write credentials record - once per central and request ID
         
-        self.config_thread = threading.Thread(target=self._do_configure_wifi)
-        self.config_thread.start()
-
-    def _do_configure_wifi(self):
-        """Actually configure WiFi (runs in thread)"""
+        A record is a retransmission only if the same central sent the same request ID with
+        the same SSID, password and BSSID hint; anything else is queued as a new request.
+        
+        Args:
+            credentials: credentials_codec.Credentials
+            device: BlueZ device path of the writing central
+        """
+        key = (device, credentials.request_id)
+        with self.sessions_lock:
+            session = self._session(device)
+            # The record is the whole intent - never combine it with earlier separate writes
+            session.ssid = session.password = ""
+            previous = self.recent_requests.get(key) if credentials.request_id else None
+            if (previous is not None and previous.status in ("success", "error") and
+                    previous.has_credentials(credentials.ssid, credentials.password, credentials.bssid)):
+                # Retransmission (e.g. after a reconnect) of an attempt that already finished
+                session.status = previous.status
+                logger.info(f"Credentials request {credentials.request_id} already finished: {previous.status}")
+                return
+        request = self._configure_wifi(session, credentials.ssid, credentials.password,
+                                       credentials.bssid, credentials.request_id)
+        if credentials.request_id:
+            with self.sessions_lock:
+                self.recent_requests[key] = request
+                self.recent_requests.move_to_end(key)
+                while len(self.recent_requests) > RECENT_REQUEST_IDS:
+                    self.recent_requests.popitem(last=False)
+
+    def _configure_wifi(self, session, ssid=None, password=None, bssid=None, request_id=0):
+        """
+        Queue credentials for a central (default: its separately written SSID and password);
+        its running or queued request is replaced
+        
+        Returns:
+            The ProvisioningRequest the central waits for
+        """
+        request = self.provisioning.submit(session.device, ssid or session.ssid, password or session.password,
+                                           bssid, request_id)
+        with self.sessions_lock:
+            session.status = request.status
+            # A later write must not pair with a leftover SSID or password from this attempt
+            session.ssid = session.password = ""
+        logger.info(f"WiFi configuration for {session.device or 'unknown central'}: {request!r}, "
+                    f"{self.provisioning.position(request)} ahead")
+        return request
+
+    def _set_request_status(self, request, status):
+        """
+        Record a request's status for each of its centrals and notify it
+        
+        BlueZ delivers a characteristic's notifications to every subscribed central, so only
+        the running request notifies; a queued central reads its own status on demand
+        """
+        request.status = status
+        with self.sessions_lock:
+            for device in request.devices:
+                if device in self.sessions:
+                    self.sessions[device].status = status
         if self.status_char:
-            self.status_char.update_status("configuring")
+            # PropertiesChanged is emitted from the main loop, not the provisioning thread
+            GLib.idle_add(_deliver, self.status_char.update_status, status)
+
+    def _run_request(self, request):
+        """Configure WiFi for one queued request (provisioning thread), recorded as a timeline"""
+        with timeline.run('provisioning') as run:
+            run.args['centrals'] = len(request.devices)
+            run.args['success'] = self._provision(request)
+
+    def _provision(self, request):
+        """Configure WiFi, then restart the containers - returns True if WiFi connected"""
+        self._set_request_status(request, "configuring")
         
-        success, ip_address = configure_wifi(self.ssid, self.password)
+        success, ip_address = configure_wifi(request.ssid, request.password, request.cancel, request.bssid)
         
         if success:
             self.ip_address = ip_address
-            if self.status_char:
-                self.status_char.update_status("success")
+            self._set_request_status(request, "success")
             if self.ip_char:
-                self.ip_char.update_ip(ip_address)
+                GLib.idle_add(_deliver, self.ip_char.update_ip, ip_address)
             logger.info(f"WiFi configured successfully. IP: {ip_address}")
             
             # After successful WiFi configuration, restart containers
             # This is important because on first boot, containers may not have started
             # due to missing network connection
             logger.info("WiFi configured - restarting containers to ensure they're running...")
-            try:
-                # Wait a moment for network to stabilize
-                time.sleep(3)
-                
-                # Service runs under user 'pi' (not root!)
-                # Podman must run as non-root user
-                service_user = 'pi'
-                
-                # First, clean up broken pods and containers (like install.sh does)
-                # This is important because podman-compose can leave broken pods
-                # But we must run podman commands as the service user, not root!
-                logger.info("Cleaning up broken pods and containers...")
+            self._restart_containers()
+        elif request.cancel.is_set():
+            # The central's new request reports the status
+            logger.info("WiFi configuration cancelled")
+        else:
+            self._set_request_status(request, "error")
+            logger.error("WiFi configuration failed")
+        return success
+
+    @timeline.traced
+    def _restart_containers(self):
+        """Clean up pods/containers and restart the scratch service after WiFi came up"""
+        try:
+            # Wait a moment for network to stabilize
+            timeline.sleep(3, "network to stabilize")
+            
+            # Service runs under user 'pi' (not root!)
+            # Podman must run as non-root user
+            service_user = 'pi'
+            
+            # First, clean up broken pods and containers (like install.sh does)
+            # This is important because podman-compose can leave broken pods
+            # But we must run podman commands as the service user, not root!
+            logger.info("Cleaning up broken pods and containers...")
+            client = get_podman_client(service_user)
+            if client:
+                try:
+                    # Remove all pods (podman-compose creates pods that can cause issues)
+                    for pod in client.list_pods():
+                        logger.info(f"Removing pod: {pod.get('Id')}")
+                        client.remove_pod(pod.get('Id'), force=True)
+                    
+                    # Remove any existing containers
+                    for name in SCRATCH_CONTAINERS:
+                        client.remove_container(name, force=True)
+                    logger.info("Cleanup completed (podman API)")
+                except PodmanError as api_error:
+                    logger.warning(f"Podman API cleanup failed, falling back to podman CLI: {api_error}")
+                    client = None
+            
+            if client is None:
                 try:
                     # Remove all pods (podman-compose creates pods that can cause issues)
                     # Run as service user 'pi', not root
-                    pod_list_result = subprocess.run(
+                    pod_list_result = commands.run(
                         ['su', '-', service_user, '-c', 'podman pod ls -q'],
                         capture_output=True,
                         text=True,
@@ -860,14 +1531,14 @@ class WiFiConfigServer:
                         for pod_id in pod_list_result.stdout.strip().split('\n'):
                             if pod_id.strip():
                                 logger.info(f"Removing pod: {pod_id}")
-                                subprocess.run(
+                                commands.run(
                                     ['su', '-', service_user, '-c', f'podman pod rm -f {pod_id.strip()}'],
                                     capture_output=True,
                                     timeout=10
                                 )
                     
                     # Remove any existing containers (as service user 'pi')
-                    subprocess.run(
+                    commands.run(
                         ['su', '-', service_user, '-c', 'podman rm -f scratch-gui-app scratch-backend-app'],
                         capture_output=True,
                         timeout=10
@@ -875,52 +1546,194 @@ class WiFiConfigServer:
                     logger.info("Cleanup completed")
                 except Exception as cleanup_error:
                     logger.warning(f"Cleanup warning (non-fatal): {cleanup_error}")
-                
-                # Stop any existing compose setup (as service user 'pi')
-                logger.info("Stopping existing compose setup...")
-                subprocess.run(
-                    ['su', '-', service_user, '-c', 'cd /opt/scratch-albilab && podman-compose down'],
-                    capture_output=True,
-                    timeout=30
-                )
-                
-                # Restart systemd service (which will restart containers with clean state)
-                # This is the safest way - systemd service runs under user 'pi'
-                logger.info("Restarting systemd service...")
-                restart_result = subprocess.run(
-                    ['systemctl', 'restart', 'scratch-albilab.service'],
-                    capture_output=True,
-                    text=True,
-                    timeout=30
-                )
-                
-                if restart_result.returncode == 0:
-                    logger.info("Containers restarted successfully after WiFi configuration")
-                    # Wait a bit and verify containers are running
-                    time.sleep(5)
-                    # Check as service user 'pi'
-                    verify_result = subprocess.run(
+            
+            # Stop any existing compose setup (as service user 'pi')
+            logger.info("Stopping existing compose setup...")
+            commands.run(
+                ['su', '-', service_user, '-c', 'cd /opt/scratch-albilab && podman-compose down'],
+                capture_output=True,
+                timeout=30
+            )
+            
+            # Restart systemd service (which will restart containers with clean state)
+            # This is the safest way - systemd service runs under user 'pi'
+            logger.info("Restarting systemd service...")
+            restart_result = commands.run(
+                ['systemctl', 'restart', 'scratch-albilab.service'],
+                capture_output=True,
+                text=True,
+                timeout=30
+            )
+            
+            if restart_result.returncode == 0:
+                logger.info("Containers restarted successfully after WiFi configuration")
+                # Wait a bit and verify containers are running
+                timeline.sleep(5, "containers to start")
+                # Check as service user 'pi'
+                running_containers = None
+                client = get_podman_client(service_user)
+                if client:
+                    try:
+                        running_containers = container_names(client.list_containers())
+                    except PodmanError as api_error:
+                        logger.warning(f"Podman API check failed, falling back to podman CLI: {api_error}")
+                if running_containers is None:
+                    verify_result = commands.run(
                         ['su', '-', service_user, '-c', 'podman ps --format "{{.Names}}"'],
                         capture_output=True,
                         text=True,
                         timeout=10
                     )
-                    
                     if verify_result.returncode == 0:
-                        running_containers = [line.strip() for line in verify_result.stdout.strip().split('\n') if line.strip()]
-                        if any('scratch-gui-app' in name or 'scratch-backend-app' in name for name in running_containers):
-                            logger.info(f"Verified: Containers are running: {running_containers}")
-                        else:
-                            logger.warning("Containers may not be running after restart")
-                else:
-                    logger.warning(f"Failed to restart containers via systemctl: {restart_result.stderr}")
-                    logger.error("Systemctl restart failed - manual intervention may be required")
-            except Exception as e:
-                logger.error(f"Error restarting containers after WiFi configuration: {e}", exc_info=True)
+                        running_containers = parse_ps_names(verify_result.stdout)
+                
+                if running_containers is not None:
+                    if any('scratch-gui-app' in name or 'scratch-backend-app' in name for name in running_containers):
+                        logger.info(f"Verified: Containers are running: {running_containers}")
+                    else:
+                        logger.warning("Containers may not be running after restart")
+            else:
+                logger.warning(f"Failed to restart containers via systemctl: {restart_result.stderr}")
+                logger.error("Systemctl restart failed - manual intervention may be required")
+        except Exception as e:
+            logger.error(f"Error restarting containers after WiFi configuration: {e}", exc_info=True)
+
+
+def process_uptime():
+    """Seconds since this process was started (from /proc, 0.0 if unavailable)"""
+    try:
+        with open('/proc/self/stat') as f:
+            # Fields after the parenthesized command name; starttime is field 22 (clock ticks after boot)
+            start_ticks = int(f.read().rsplit(')', 1)[1].split()[19])
+        with open('/proc/uptime') as f:
+            uptime = float(f.read().split()[0])
+        return max(0.0, uptime - start_ticks / os.sysconf('SC_CLK_TCK'))
+    except (OSError, ValueError, IndexError):
+        return 0.0
+
+
+class StartupReport:
+    """
+    Time from process start to each startup milestone, logged once all expected ones are
+    reached - or as incomplete when registration fails or startup times out
+    """
+
+    def __init__(self, expected):
+        self.started = time.monotonic() - process_uptime()
+        self.pending = set(expected)
+        self.marks = []
+        self.reported_incomplete = False
+        self._lock = threading.Lock()
+
+    def mark(self, milestone):
+        """Record a milestone (thread-safe)"""
+        elapsed = time.monotonic() - self.started
+        with self._lock:
+            self.marks.append((milestone, elapsed))
+            self.pending.discard(milestone)
+            complete = not self.pending
+        if complete:
+            self.log()
+
+    def discard(self, milestone):
+        """Stop waiting for a milestone that will not be reached"""
+        with self._lock:
+            self.pending.discard(milestone)
+
+    def report_incomplete(self, reason):
+        """Log the milestones reached so far (once) if some are still missing"""
+        with self._lock:
+            if not self.pending or self.reported_incomplete:
+                return
+            self.reported_incomplete = True
+            marks = list(self.marks)
+            missing = sorted(self.pending)
+        logger.warning(f"Startup incomplete ({reason}), missing: {', '.join(missing)}\n" +
+                       '\n'.join(f"  {milestone}: {elapsed * 1000:.0f} ms" for milestone, elapsed in marks))
+
+    def log(self):
+        with self._lock:
+            marks = list(self.marks)
+        logger.info("Startup timing (since process start):\n" +
+                    '\n'.join(f"  {milestone}: {elapsed * 1000:.0f} ms" for milestone, elapsed in marks))
+        advertised = dict(marks).get('advertisement registered')
+        if advertised is not None and advertised > STARTUP_ADVERTISE_TARGET:
+            logger.warning(f"Advertisement registered {advertised:.2f}s after process start "
+                           f"(target {STARTUP_ADVERTISE_TARGET:g}s)")
+
+
+class AdapterPowerWatch:
+    """Adapter Powered state, kept current by PropertiesChanged signals (delivered on the main loop)"""
+
+    def __init__(self, bus, adapter_path, on_powered=None):
+        self.powered = threading.Event()
+        self.on_powered = on_powered
+        self._match = bus.add_signal_receiver(
+            self._on_properties_changed, 'PropertiesChanged', DBUS_PROP_IFACE, BLUEZ_SERVICE_NAME, adapter_path)
+
+    def _on_properties_changed(self, interface, changed, invalidated):
+        if interface != ADAPTER_IFACE or 'Powered' not in changed:
+            return
+        if changed['Powered']:
+            logger.info("Bluetooth adapter powered on")
+            self.powered.set()
+            if self.on_powered:
+                self.on_powered()
         else:
-            if self.status_char:
-                self.status_char.update_status("error")
-            logger.error("WiFi configuration failed")
+            self.powered.clear()
+
+    def wait(self, timeout):
+        """Wait until the adapter is powered - returns True if it is"""
+        return self.powered.wait(timeout)
+
+
+class CentralDisconnectWatch:
+    """Drops per-central GATT state when BlueZ reports a central disconnected"""
+
+    def __init__(self, bus, app):
+        self.app = app
+        self._match = bus.add_signal_receiver(
+            self._on_properties_changed, 'PropertiesChanged', DBUS_PROP_IFACE, BLUEZ_SERVICE_NAME,
+            path_keyword='path')
+
+    def _on_properties_changed(self, interface, changed, invalidated, path=None):
+        if interface != DEVICE_IFACE or changed.get('Connected', True):
+            return
+        gatt_trace.debug('Central disconnected: %s', path)
+        self.app.forget_device(str(path))
+
+
+class AdvertisementRegistration:
+    """Asynchronous RegisterAdvertisement, retried once the adapter powers on if BlueZ rejected it"""
+
+    def __init__(self, ad_manager, advertisement, startup=None):
+        self.ad_manager = ad_manager
+        self.advertisement = advertisement
+        self.startup = startup
+        self.failed = False
+
+    def register(self):
+        self.failed = False
+        self.ad_manager.RegisterAdvertisement(self.advertisement.get_path(), {},
+                                              reply_handler=self._on_reply,
+                                              error_handler=self._on_error)
+
+    def _on_reply(self):
+        logger.info('Advertisement registered')
+        if self.startup:
+            self.startup.mark('advertisement registered')
+
+    def _on_error(self, error):
+        # Older BlueZ versions refuse advertisements while the adapter is powered off
+        logger.warning(f'Failed to register advertisement (retrying when the adapter powers on): {error}')
+        self.failed = True
+        if self.startup:
+            self.startup.report_incomplete(f'advertisement registration failed: {error}')
+
+    def on_powered(self):
+        """Main loop callback for the adapter's power-on"""
+        if self.failed:
+            self.register()
 
 
 def register_app_cb():
@@ -934,24 +1747,30 @@ def register_app_error_cb(error):
     mainloop.quit()
 
 
-def register_ad_cb():
-    """Callback for advertisement registration"""
-    logger.info('Advertisement registered')
-
-
-def register_ad_error_cb(error):
-    """Error callback for advertisement registration"""
-    logger.error(f'Failed to register advertisement: {error}')
-
-
-def ensure_bluetooth_powered(bus, adapter_path):
-    """Ensure Bluetooth adapter is powered on"""
+def ensure_bluetooth_powered(bus, adapter_path, power=None):
+    """
+    Ensure Bluetooth adapter is powered on
+    
+    Args:
+        bus: System bus
+        adapter_path: D-Bus path of the adapter
+        power: AdapterPowerWatch - waits end as soon as the Powered signal arrives
+               (without one, each step waits its full time)
+    """
+    def wait_powered(seconds):
+        if power is None:
+            time.sleep(seconds)
+            return False
+        return power.wait(seconds)
+    
     try:
         adapter_props = dbus.Interface(
             bus.get_object(BLUEZ_SERVICE_NAME, adapter_path),
             DBUS_PROP_IFACE)
         
         powered = adapter_props.Get(ADAPTER_IFACE, 'Powered')
+        if powered and power is not None:
+            power.powered.set()
         
         if not powered:
             logger.info("Bluetooth adapter is powered off. Attempting to power on...")
@@ -959,7 +1778,7 @@ def ensure_bluetooth_powered(bus, adapter_path):
             # First, try to unblock with rfkill (in case it's soft-blocked)
             try:
                 logger.info("Unblocking Bluetooth with rfkill...")
-                result = subprocess.run(
+                result = commands.run(
                     ['rfkill', 'unblock', 'all'],
                     capture_output=True,
                     text=True,
@@ -967,7 +1786,8 @@ def ensure_bluetooth_powered(bus, adapter_path):
                 )
                 if result.returncode == 0:
                     logger.info("rfkill unblock successful")
-                    time.sleep(1)
+                    # bluetoothd powers the adapter itself if AutoEnable is set
+                    powered = wait_powered(1)
                 else:
                     logger.warning(f"rfkill unblock failed: {result.stderr}")
             except FileNotFoundError:
@@ -977,16 +1797,17 @@ def ensure_bluetooth_powered(bus, adapter_path):
             
             # Try D-Bus method
             try:
-                adapter_props.Set(ADAPTER_IFACE, 'Powered', dbus.Boolean(True))
-                logger.info("Bluetooth adapter powered on via D-Bus")
-                time.sleep(2)
+                if not powered:
+                    adapter_props.Set(ADAPTER_IFACE, 'Powered', dbus.Boolean(True))
+                    logger.info("Bluetooth adapter powered on via D-Bus")
+                    wait_powered(2)
             except Exception as dbus_error:
                 logger.warning(f"D-Bus method failed: {dbus_error}")
                 logger.info("Trying alternative method using hciconfig...")
                 
                 # Try hciconfig as fallback
                 try:
-                    result = subprocess.run(
+                    result = commands.run(
                         ['hciconfig', 'hci0', 'up'],
                         capture_output=True,
                         text=True,
@@ -994,12 +1815,12 @@ def ensure_bluetooth_powered(bus, adapter_path):
                     )
                     if result.returncode == 0:
                         logger.info("Bluetooth adapter powered on via hciconfig")
-                        time.sleep(2)
+                        wait_powered(2)
                     else:
                         logger.warning(f"hciconfig failed: {result.stderr}")
                         # Try bluetoothctl as last resort
                         logger.info("Trying bluetoothctl...")
-                        result = subprocess.run(
+                        result = commands.run(
                             ['bluetoothctl', 'power', 'on'],
                             capture_output=True,
                             text=True,
@@ -1007,7 +1828,7 @@ def ensure_bluetooth_powered(bus, adapter_path):
                         )
                         if result.returncode == 0:
                             logger.info("Bluetooth adapter powered on via bluetoothctl")
-                            time.sleep(2)
+                            wait_powered(2)
                         else:
                             logger.error(f"bluetoothctl failed: {result.stderr}")
                             logger.error("Could not power on Bluetooth adapter. Please run manually:")
@@ -1057,13 +1878,49 @@ def ensure_bluetooth_powered(bus, adapter_path):
         return False
 
 
-def main():
-    """Main function"""
+def complete_startup(bus, adapter, power, wifi_server, startup):
+    """Resolve the IP address and power the adapter (runs in a thread once registration was requested)"""
+    # Initialize IP address if already connected
+    wifi_server.initialize_ip_address()
+    startup.mark('IP address resolved')
+    
+    # Ensure Bluetooth is powered on
+    if ensure_bluetooth_powered(bus, adapter, power):
+        startup.mark('adapter powered')
+    startup.mark('startup complete')
+
+
+def open_bus(spec):
+    """
+    Connect to the bus BlueZ is on
+    
+    Args:
+        spec: 'system', 'session' or a D-Bus address (e.g. unix:path=/tmp/mock-bus)
+    """
+    if spec == 'system':
+        return dbus.SystemBus()
+    if spec == 'session':
+        return dbus.SessionBus()
+    return dbus.bus.BusConnection(spec)
+
+
+def main(bus_spec=None):
+    """
+    Main function
+    
+    Args:
+        bus_spec: Bus to register on (default: BLE_DBUS_BUS, i.e. the system bus)
+    """
     global mainloop
     
+    startup = StartupReport(('application registered', 'advertisement registered', 'startup complete'))
+    
     dbus.mainloop.glib.DBusGMainLoop(set_as_default=True)
     
-    bus = dbus.SystemBus()
+    bus_spec = bus_spec or DBUS_BUS
+    bus = open_bus(bus_spec)
+    if bus_spec != 'system':
+        logger.warning(f"Registering on D-Bus '{bus_spec}' instead of the system bus")
     
     # Get adapter
     adapter = None
@@ -1080,13 +1937,11 @@ def main():
         if not adapter:
             logger.error("No GATT Manager found")
             return
-            
-        # Ensure Bluetooth is powered on
-        ensure_bluetooth_powered(bus, adapter)
         
     except Exception as e:
         logger.error(f"Error finding adapter: {e}")
         return
+    startup.mark('adapter found')
     
     # Create WiFi config server
     wifi_server = WiFiConfigServer()
@@ -1103,6 +1958,9 @@ def main():
     container_status_char = ContainerStatusCharacteristic(bus, 5, service, wifi_server)
     start_containers_char = StartContainersCharacteristic(bus, 6, service, wifi_server)
     container_logs_char = ContainerLogsCharacteristic(bus, 7, service, wifi_server)
+    log_stream_char = LogStreamCharacteristic(bus, 8, service, wifi_server)
+    diagnostics_char = DiagnosticsCharacteristic(bus, 9, service, wifi_server)
+    credentials_char = CredentialsCharacteristic(bus, 10, service, wifi_server)
     
     logger.info(f"Created characteristics:")
     logger.info(f"  SSID: {WIFI_SSID_CHAR_UUID}")
@@ -1113,6 +1971,9 @@ def main():
     logger.info(f"  Container Status: {CONTAINER_STATUS_CHAR_UUID}")
     logger.info(f"  Start Containers: {START_CONTAINERS_CHAR_UUID}")
     logger.info(f"  Container Logs: {CONTAINER_LOGS_CHAR_UUID}")
+    logger.info(f"  Log Stream: {LOG_STREAM_CHAR_UUID}")
+    logger.info(f"  Diagnostics: {DIAGNOSTICS_CHAR_UUID}")
+    logger.info(f"  Credentials: {CREDENTIALS_CHAR_UUID}")
     
     wifi_server.status_char = status_char
     wifi_server.ip_char = ip_char
@@ -1125,38 +1986,66 @@ def main():
     service.add_characteristic(container_status_char)
     service.add_characteristic(start_containers_char)
     service.add_characteristic(container_logs_char)
+    service.add_characteristic(log_stream_char)
+    service.add_characteristic(diagnostics_char)
+    service.add_characteristic(credentials_char)
     
     logger.info(f"Added {len(service.characteristics)} characteristics to service")
     
-    # Initialize IP address if already connected
-    wifi_server.initialize_ip_address()
-    
     # Create application
     app = Application(bus)
     app.add_service(service)
+    disconnect_watch = CentralDisconnectWatch(bus, app)
+    startup.mark('GATT objects created')
     
-    # Register application
+    # Register application and advertisement first - power state and IP address
+    # are resolved afterwards, so the phone can find the Pi as early as possible
     service_manager = dbus.Interface(
         bus.get_object(BLUEZ_SERVICE_NAME, adapter),
         GATT_MANAGER_IFACE)
     
+    def on_app_registered():
+        register_app_cb()
+        startup.mark('application registered')
+    
+    def on_app_error(error):
+        startup.report_incomplete(f'application registration failed: {error}')
+        register_app_error_cb(error)
+    
     service_manager.RegisterApplication(app.get_path(), {},
-                                       reply_handler=register_app_cb,
-                                       error_handler=register_app_error_cb)
+                                       reply_handler=on_app_registered,
+                                       error_handler=on_app_error)
     
     # Register advertisement
+    ad_registration = None
     try:
         ad_manager = dbus.Interface(
             bus.get_object(BLUEZ_SERVICE_NAME, adapter),
             LE_ADVERTISING_MANAGER_IFACE)
         
         advertisement = Advertisement(bus, 0, WIFI_CONFIG_SERVICE_UUID)
-        ad_manager.RegisterAdvertisement(advertisement.get_path(), {},
-                                        reply_handler=register_ad_cb,
-                                        error_handler=register_ad_error_cb)
-        logger.info('Advertisement registered')
+        ad_registration = AdvertisementRegistration(ad_manager, advertisement, startup)
+        ad_registration.register()
     except Exception as e:
         logger.warning(f'Failed to register advertisement (may not be critical): {e}')
+        startup.discard('advertisement registered')
+    startup.mark('registration requested')
+    
+    def startup_timed_out():
+        startup.report_incomplete(f'not complete after {STARTUP_REPORT_TIMEOUT}s')
+        return False
+    GLib.timeout_add_seconds(STARTUP_REPORT_TIMEOUT, startup_timed_out)
+    
+    power = AdapterPowerWatch(bus, adapter, on_powered=ad_registration.on_powered if ad_registration else None)
+    threading.Thread(target=complete_startup, args=(bus, adapter, power, wifi_server, startup),
+                     name='startup', daemon=True).start()
+    
+    # kill -USR1 <pid> writes the trace ring buffer to a file
+    tracing.install_dump_signal()
+    # GATT calls for gatt_replay.py (BLE_SESSION_RECORD_DIR)
+    session_recorder.start()
+    # Latency histograms for node_exporter's textfile collector
+    metrics.start_textfile_exporter()
     
     logger.info("BLE WiFi Config Server started")
     logger.info(f"Service UUID: {WIFI_CONFIG_SERVICE_UUID}")
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+External command execution for the BLE server
+Single entry point for subprocess calls so every command's duration and failures
+are recorded in the metrics registry and the provisioning timeline. The runner
+that actually executes commands can be replaced (see fake_system.py).
+"""
+
+import os
+import shlex
+import subprocess
+
+import metrics
+import timeline
+
+_runner = subprocess.run
+
+
+def command_label(args) -> str:
+    """
+    Metric label for a command: the program that does the work
+
+    Examples:
+        ['sudo', 'nmcli', 'dev', 'wifi'] -> 'nmcli'
+        ['su', '-', 'pi', '-c', 'podman ps'] -> 'podman'
+    """
+    if isinstance(args, str):
+        args = shlex.split(args)
+    args = list(args)
+    if not args:
+        return ''
+    program = os.path.basename(args[0])
+    if program == 'sudo' and len(args) > 1:
+        return command_label(args[1:])
+    if program == 'su' and '-c' in args[:-1]:
+        try:
+            return command_label(args[args.index('-c') + 1])
+        except ValueError:
+            return program
+    return program
+
+
+def set_runner(runner):
+    """
+    Replace the function that executes commands (default: subprocess.run)
+
+    Args:
+        runner: Callable with subprocess.run's signature, results and exceptions
+
+    Returns:
+        The previous runner, to restore it later
+    """
+    global _runner
+    previous, _runner = _runner, runner
+    return previous
+
+
+def run(args, **kwargs) -> subprocess.CompletedProcess:
+    """
+    subprocess.run() with duration and failure metrics (same arguments and exceptions)
+    """
+    label = command_label(args)
+    try:
+        with metrics.timer('ble_command_duration_seconds', command=label), timeline.span(label, 'command'):
+            result = _runner(args, **kwargs)
+    except (OSError, subprocess.SubprocessError):
+        metrics.inc('ble_command_failures_total', command=label)
+        raise
+    if result.returncode != 0:
+        metrics.inc('ble_command_failures_total', command=label)
+    return result
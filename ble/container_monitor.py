@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Push-based container state for the BLE server
+Follows the podman event stream and keeps an in-memory model of which scratch
+containers are running, so status reads are O(1) and changes can be notified
+"""
+
+import logging
+import threading
+import time
+
+from podman_api import PodmanError, container_names
+
+logger = logging.getLogger('ble.podman')
+
+# Container event actions that change the running state
+RUNNING_ACTIONS = {'start', 'restart', 'unpause'}
+STOPPED_ACTIONS = {'died', 'stop', 'kill', 'pause', 'remove', 'cleanup'}
+
+# Seconds without events after which the stream is reopened and state re-read
+EVENT_STREAM_TIMEOUT = 300
+# Delay before retrying when the podman API is not available
+RETRY_DELAY = 30
+
+
+def event_container_state(event: dict):
+    """
+    Extract (container name, running) from a podman container event
+
+    Returns:
+        Tuple of (name, running bool), or None if the event does not change the running state
+    """
+    if event.get('Type', event.get('type')) != 'container':
+        return None
+    action = event.get('Action') or event.get('Status') or event.get('status') or ''
+    actor = event.get('Actor') or {}
+    name = (actor.get('Attributes') or {}).get('name') or event.get('Name') or event.get('name')
+    if not name:
+        return None
+    if action in RUNNING_ACTIONS:
+        return (name, True)
+    if action in STOPPED_ACTIONS:
+        return (name, False)
+    return None
+
+
+def is_tracked(name: str, names) -> bool:
+    """
+    True if a container belongs to one of the tracked names - matched as a substring, as
+    compose adds prefixes/suffixes (e.g. scratch-gui-app-dev for scratch-gui-app)
+    """
+    return any(tracked in name for tracked in names)
+
+
+class ContainerMonitor:
+    """In-memory model of the scratch containers, updated from podman events"""
+
+    def __init__(self, client_factory, names, on_change=None):
+        """
+        Args:
+            client_factory: Callable returning a PodmanClient, or None if the API is unavailable
+            names: Container names to track
+            on_change: Called (from the monitor thread) with the running names after every change
+        """
+        self.client_factory = client_factory
+        self.names = tuple(names)
+        self.on_change = on_change
+        self._lock = threading.Lock()
+        # Running container names that match a tracked name
+        self._running = frozenset()
+        self._synced = False
+        self._thread = None
+
+    def start(self):
+        """Start following events in a daemon thread"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='container-monitor', daemon=True)
+            self._thread.start()
+
+    @property
+    def synced(self) -> bool:
+        """True while the model mirrors podman (initial list done and event stream open)"""
+        return self._synced
+
+    def running_containers(self):
+        """
+        Returns:
+            Sorted names of running tracked containers, or None if the model is not in sync
+        """
+        with self._lock:
+            if not self._synced:
+                return None
+            return sorted(self._running)
+
+    def _set(self, running: frozenset, synced: bool = True):
+        with self._lock:
+            changed = running != self._running or synced != self._synced
+            self._running = running
+            self._synced = synced
+        if changed and synced and self.on_change:
+            self.on_change(self.running_containers())
+
+    def _run(self):
+        while True:
+            client = self.client_factory()
+            if client is None:
+                self._set(frozenset(), synced=False)
+                time.sleep(RETRY_DELAY)
+                continue
+            try:
+                # Open the stream first, then read the current state, so no event is missed
+                events = client.stream_events({'type': ['container']}, timeout=EVENT_STREAM_TIMEOUT)
+                running_names = container_names(client.list_containers())
+                # The initial list and the events use the same name matching
+                self._set(frozenset(name for name in running_names if is_tracked(name, self.names)))
+                logger.info(f'Container monitor synced: {self.running_containers()}')
+                for event in events:
+                    state = event_container_state(event)
+                    if state is None or not is_tracked(state[0], self.names):
+                        continue
+                    name, is_running = state
+                    with self._lock:
+                        running = self._running | {name} if is_running else self._running - {name}
+                    self._set(running)
+                # Stream ended (idle timeout or podman service restart) - reopen shortly and resync
+                time.sleep(1)
+            except PodmanError as e:
+                logger.warning(f'Container event stream interrupted: {e}')
+                self._set(frozenset(), synced=False)
+                time.sleep(RETRY_DELAY)
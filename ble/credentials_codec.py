@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Framed WiFi credentials record written to the credentials characteristic in one write
+
+Format version 1 (all integers little endian):
+
+    offset  size  field
+    0       1     version (1)
+    1       1     flags (bit 0: BSSID hint present)
+    2       4     request ID (unchanged when the client retransmits the same attempt, 0 = none)
+    6       1     SSID length (1-32)
+    7       ...   SSID (UTF-8)
+    ...     1     passphrase length (8-63)
+    ...     ...   passphrase (UTF-8)
+    ...     6     BSSID hint (only with flag bit 0)
+
+Records longer than one ATT write (MTU - 3 bytes) are sent as a long write; the server
+joins the chunks by offset and decodes once record_size() bytes have arrived.
+"""
+
+import collections
+import struct
+
+FORMAT_VERSION = 1
+FLAG_BSSID = 0x01
+
+HEADER = struct.Struct('<BBIB')
+BSSID_SIZE = 6
+MAX_SSID_LEN = 32
+MIN_PASSPHRASE_LEN = 8
+MAX_PASSPHRASE_LEN = 63
+MAX_RECORD_SIZE = HEADER.size + MAX_SSID_LEN + 1 + MAX_PASSPHRASE_LEN + BSSID_SIZE
+
+Credentials = collections.namedtuple('Credentials', 'ssid password bssid request_id')
+
+
+def format_bssid(data: bytes) -> str:
+    """6 bytes as aa:bb:cc:dd:ee:ff"""
+    return ':'.join(f'{byte:02x}' for byte in data)
+
+
+def parse_bssid(text: str) -> bytes:
+    """
+    Raises:
+        ValueError: Not six colon-separated hex bytes
+    """
+    parts = text.split(':')
+    if len(parts) != BSSID_SIZE:
+        raise ValueError(f"Invalid BSSID {text!r}")
+    return bytes(int(part, 16) for part in parts)
+
+
+def record_size(data: bytes):
+    """
+    Total size of the record whose beginning is `data`
+
+    Returns:
+        Size in bytes, or None if the length fields have not arrived yet
+
+    Raises:
+        ValueError: On unknown version
+    """
+    if not data:
+        return None
+    if data[0] != FORMAT_VERSION:
+        raise ValueError(f"Unsupported credentials format version {data[0]}")
+    if len(data) < HEADER.size:
+        return None
+    _version, flags, _request_id, ssid_len = HEADER.unpack_from(data, 0)
+    passphrase_len_offset = HEADER.size + ssid_len
+    if len(data) <= passphrase_len_offset:
+        return None
+    size = passphrase_len_offset + 1 + data[passphrase_len_offset]
+    return size + BSSID_SIZE if flags & FLAG_BSSID else size
+
+
+def decode_credentials(data: bytes) -> Credentials:
+    """
+    Decode a complete record
+
+    Returns:
+        Credentials (bssid as aa:bb:cc:dd:ee:ff or None, request_id 0 if none)
+
+    Raises:
+        ValueError: On unknown version, malformed record or invalid SSID/passphrase length
+    """
+    size = record_size(data)
+    if size is None or len(data) != size:
+        raise ValueError(f"Credentials record has {len(data)} bytes, expected {size or 'more'}")
+    _version, flags, request_id, ssid_len = HEADER.unpack_from(data, 0)
+    if not 1 <= ssid_len <= MAX_SSID_LEN:
+        raise ValueError(f"Invalid SSID length {ssid_len}")
+    offset = HEADER.size
+    ssid = data[offset:offset + ssid_len].decode('utf-8')
+    offset += ssid_len
+    passphrase_len = data[offset]
+    password = data[offset + 1:offset + 1 + passphrase_len].decode('utf-8')
+    if not MIN_PASSPHRASE_LEN <= len(password) <= MAX_PASSPHRASE_LEN:
+        raise ValueError(f"Passphrase must have {MIN_PASSPHRASE_LEN}-{MAX_PASSPHRASE_LEN} characters")
+    offset += 1 + passphrase_len
+    bssid = format_bssid(data[offset:offset + BSSID_SIZE]) if flags & FLAG_BSSID else None
+    return Credentials(ssid, password, bssid, request_id)
+
+
+def encode_credentials(ssid: str, password: str, request_id: int = 0, bssid: str = None) -> bytes:
+    """
+    Encode a record as a client sends it
+
+    Args:
+        ssid: WiFi network SSID
+        password: WPA passphrase
+        request_id: Identifier of this provisioning attempt (0 = none)
+        bssid: Optional access point hint (aa:bb:cc:dd:ee:ff)
+    """
+    ssid_bytes = ssid.encode('utf-8')
+    password_bytes = password.encode('utf-8')
+    record = HEADER.pack(FORMAT_VERSION, FLAG_BSSID if bssid else 0, request_id, len(ssid_bytes))
+    record += ssid_bytes + bytes((len(password_bytes),)) + password_bytes
+    if bssid:
+        record += parse_bssid(bssid)
+    return record
@@ -0,0 +1,429 @@
+#!/usr/bin/env python3
+"""
+Scripted stand-in for the Raspberry Pi's system tools
+FakeSystem answers the commands the BLE server runs (nmcli, wpa_cli, ip, systemctl,
+podman, su, rfkill, journalctl, ...) with recorded-style output after realistic
+latencies, and simulates the in-process paths (wpa_supplicant control socket,
+rtnetlink address waits, sysfs link state) on the same timeline. Installed with
+FakeSystem.installed(), the provisioning flow runs unchanged on a dev machine
+without touching its real network configuration.
+"""
+
+import contextlib
+import os
+import shlex
+import subprocess
+import tempfile
+import threading
+import time
+from collections import namedtuple
+
+import commands
+import wpa_ctrl
+
+# Simulated network behavior; delays are in seconds from the moment the credentials are applied
+Scenario = namedtuple('Scenario', [
+    'name',
+    'networkmanager',         # NetworkManager manages wlan0 (else plain wpa_supplicant)
+    'password_ok',            # False: wpa_supplicant reports WRONG_KEY, nmcli fails activation
+    'association_delay',      # Until CTRL-EVENT-CONNECTED (or the WRONG_KEY rejection)
+    'dhcp_delay',             # From association until the IPv4 address appears
+    'container_start_delay',  # From `systemctl restart scratch-albilab` until containers run
+])
+
+SCENARIOS = {
+    'nm': Scenario('nm', True, True, 2.5, 1.5, 4.0),
+    'wpa_supplicant': Scenario('wpa_supplicant', False, True, 3.0, 1.5, 4.0),
+    'wrong_password': Scenario('wrong_password', False, False, 3.0, 0.0, 4.0),
+    'slow_dhcp': Scenario('slow_dhcp', False, True, 3.0, 15.0, 4.0),
+}
+
+# Typical duration of each program on a Raspberry Pi 4 (seconds)
+COMMAND_LATENCY = {
+    'ip': 0.004,
+    'rfkill': 0.005,
+    'systemctl': 0.03,
+    'wpa_cli': 0.01,
+    'nmcli': 0.08,
+    'podman': 0.35,
+    'podman-compose': 1.5,
+    'journalctl': 0.12,
+    'hciconfig': 0.02,
+    'bluetoothctl': 0.3,
+}
+SERVICE_RESTART_LATENCY = {
+    'wpa_supplicant': 0.4,
+    'NetworkManager': 1.0,
+    'scratch-albilab.service': 1.2,
+}
+SCAN_DURATION = 2.5
+WPA_CTRL_LATENCY = 0.001
+
+SCAN_RESULTS = [
+    ('b8:27:eb:11:22:33', 2437, -48, '[WPA2-PSK-CCMP][ESS]', 'BenchNet'),
+    ('b8:27:eb:11:22:34', 5180, -61, '[WPA2-PSK-CCMP][ESS]', 'BenchNet'),
+    ('9c:53:22:aa:bb:cc', 2412, -67, '[WPA2-PSK-CCMP][WPS][ESS]', 'Skola-Ucebna'),
+    ('00:1a:2b:3c:4d:5e', 2462, -79, '[ESS]', 'Hoste'),
+]
+CONTAINERS = ('scratch-gui-app', 'scratch-backend-app')
+BENCH_IP = '192.168.1.57'
+
+
+def _unwrap(args: list) -> list:
+    """Command that actually runs: strips sudo, `su - user -c "..."` and leading `cd dir &&`"""
+    while args and os.path.basename(args[0]) == 'sudo':
+        args = args[1:]
+    if args and args[0] == 'su' and '-c' in args[:-1]:
+        args = shlex.split(args[args.index('-c') + 1])
+    while '&&' in args:
+        args = args[args.index('&&') + 1:]
+    return args
+
+
+class FakeSystem:
+    """Simulated Raspberry Pi for one scenario (use installed() to route the server's I/O here)"""
+
+    def __init__(self, scenario: Scenario, latency_scale: float = 1.0):
+        """
+        Args:
+            scenario: Network behavior to simulate
+            latency_scale: Factor applied to every simulated delay (e.g. 0.1 for quick smoke runs)
+        """
+        self.scenario = scenario
+        self.latency_scale = latency_scale
+        self.commands = []
+        self.unknown_commands = []
+        self._lock = threading.Lock()
+        self._tmpdir = tempfile.TemporaryDirectory(prefix='ble-fake-')
+        self.wpa_supplicant_conf = os.path.join(self._tmpdir.name, 'wpa_supplicant.conf')
+        self.ctrl_socket = os.path.join(self._tmpdir.name, 'wlan0')
+        open(self.ctrl_socket, 'w').close()
+        self.connect_started = None
+        self.scan_started = None
+        self.containers_started = None
+
+    def close(self):
+        self._tmpdir.cleanup()
+
+    # Simulated timeline
+
+    def _delay(self, seconds: float) -> float:
+        return seconds * self.latency_scale
+
+    def _sleep(self, seconds: float):
+        if seconds > 0:
+            time.sleep(seconds)
+
+    def start_connecting(self):
+        """Credentials were applied: association (or rejection) and DHCP follow"""
+        with self._lock:
+            self.connect_started = time.monotonic()
+
+    def association_time(self):
+        if self.connect_started is None:
+            return None
+        return self.connect_started + self._delay(self.scenario.association_delay)
+
+    def address_time(self):
+        associated = self.association_time()
+        if associated is None or not self.scenario.password_ok:
+            return None
+        return associated + self._delay(self.scenario.dhcp_delay)
+
+    def associated(self) -> bool:
+        at = self.association_time()
+        return self.scenario.password_ok and at is not None and time.monotonic() >= at
+
+    def ip_address(self) -> str:
+        at = self.address_time()
+        return BENCH_IP if at is not None and time.monotonic() >= at else ''
+
+    def containers_running(self) -> bool:
+        return (self.containers_started is not None and
+                time.monotonic() >= self.containers_started + self._delay(self.scenario.container_start_delay))
+
+    # Command runner (commands.set_runner)
+
+    def run(self, args, capture_output=False, text=False, timeout=None, check=False, **kwargs):
+        """subprocess.run() replacement answering from the scenario"""
+        if isinstance(args, str):
+            args = shlex.split(args)
+        argv = _unwrap(list(args))
+        program = os.path.basename(argv[0]) if argv else ''
+        latency = COMMAND_LATENCY.get(program, 0.01)
+        handler = getattr(self, '_cmd_' + program.replace('-', '_'), None)
+        with self._lock:
+            self.commands.append(' '.join(argv))
+            if handler is None:
+                self.unknown_commands.append(' '.join(argv))
+        if handler is None:
+            returncode, stdout, stderr = 127, '', f'{program}: command not found\n'
+        else:
+            extra, returncode, stdout, stderr = handler(argv[1:])
+            latency += extra
+
+        latency = self._delay(latency)
+        if timeout is not None and latency > timeout:
+            self._sleep(timeout)
+            raise subprocess.TimeoutExpired(args, timeout)
+        self._sleep(latency)
+        if handler is not None:
+            self._after_command(program, argv[1:], returncode)
+
+        if not text:
+            stdout, stderr = stdout.encode(), stderr.encode()
+        captured = capture_output or kwargs.get('stdout') == subprocess.PIPE
+        result = subprocess.CompletedProcess(args, returncode,
+                                             stdout if captured else None, stderr if captured else None)
+        if check and returncode != 0:
+            raise subprocess.CalledProcessError(returncode, args, result.stdout, result.stderr)
+        return result
+
+    def _after_command(self, program, args, returncode):
+        # State changes that take effect once the command has completed
+        if returncode != 0:
+            return
+        if program == 'systemctl' and args[:1] in (['restart'], ['start']):
+            if args[1] == 'wpa_supplicant':
+                self.start_connecting()
+            elif args[1].startswith('scratch-albilab'):
+                self.containers_started = time.monotonic()
+
+    def _cmd_ip(self, args):
+        if args[:2] == ['link', 'show']:
+            name = args[2]
+            if name != 'wlan0':
+                return (0, 1, '', f'Device "{name}" does not exist.\n')
+            return (0, 0, '3: wlan0: <BROADCAST,MULTICAST,UP,LOWER_UP> mtu 1500 qdisc pfifo_fast state UP '
+                          'mode DORMANT group default qlen 1000\n'
+                          '    link/ether b8:27:eb:01:02:03 brd ff:ff:ff:ff:ff:ff\n', '')
+        if args[:2] == ['link', 'set']:
+            return (0, 0, '', '')
+        if args[:2] == ['addr', 'show']:
+            name = args[2]
+            if name != 'wlan0':
+                return (0, 1, '', f'Device "{name}" does not exist.\n')
+            text = ('3: wlan0: <BROADCAST,MULTICAST,UP,LOWER_UP> mtu 1500 qdisc pfifo_fast state UP group default\n'
+                    '    link/ether b8:27:eb:01:02:03 brd ff:ff:ff:ff:ff:ff\n')
+            ip = self.ip_address()
+            if ip:
+                text += f'    inet {ip}/24 brd 192.168.1.255 scope global dynamic noprefixroute wlan0\n'
+            return (0, 0, text, '')
+        return (0, 1, '', 'Command line is not complete.\n')
+
+    def _cmd_rfkill(self, args):
+        if args[:1] == ['list']:
+            return (0, 0, '0: phy0: Wireless LAN\n\tSoft blocked: no\n\tHard blocked: no\n', '')
+        return (0, 0, '', '')
+
+    def _cmd_systemctl(self, args):
+        action = args[0] if args else ''
+        names = [arg for arg in args[1:] if not arg.startswith('-')]
+        name = names[0] if names else ''
+        if action == 'is-active':
+            active = name != 'NetworkManager' or self.scenario.networkmanager
+            return (0, 0 if active else 3, '' if '--quiet' in args else ('active\n' if active else 'inactive\n'), '')
+        if action in ('restart', 'start', 'stop'):
+            return (SERVICE_RESTART_LATENCY.get(name, 0.2), 0, '', '')
+        if action == 'status':
+            state = 'active (running)' if name != 'NetworkManager' or self.scenario.networkmanager else 'inactive (dead)'
+            return (0, 0, f'● {name} - {name}\n     Active: {state}\n', '')
+        return (0, 1, '', f'Unknown command verb {action}.\n')
+
+    def _cmd_nmcli(self, args):
+        if not self.scenario.networkmanager:
+            return (0, 8, '', 'Error: NetworkManager is not running.\n')
+        if args[:3] == ['device', 'wifi', 'connect'] or args[:2] == ['connection', 'up']:
+            # nmcli blocks until the connection is activated, i.e. until DHCP is done
+            self.start_connecting()
+            if not self.scenario.password_ok:
+                return (self.scenario.association_delay, 4, '',
+                        'Error: Connection activation failed: (7) Secrets were required, but not provided.\n')
+            return (self.scenario.association_delay + self.scenario.dhcp_delay, 0,
+                    "Device 'wlan0' successfully activated with 'f0e1d2c3-0000-4000-8000-000000000001'.\n", '')
+        if args[:2] == ['connection', 'delete']:
+            return (0, 10, '', f"Error: unknown connection '{args[2]}'.\n")
+        if args[:2] == ['connection', 'add']:
+            return (0, 0, "Connection 'BenchNet' (f0e1d2c3-0000-4000-8000-000000000001) successfully added.\n", '')
+        if args[:2] == ['connection', 'show']:
+            return (0, 0, 'NAME                UUID                                  TYPE      DEVICE\n'
+                          'preconfigured       0d2e1a9c-5b8e-4a5e-9d5c-3f1e2d3c4b5a  wifi      --\n', '')
+        if args[-3:] == ['device', 'wifi', 'list'] or args[-3:] == ['dev', 'wifi', 'list']:
+            lines = []
+            for _bssid, _frequency, level, flags, ssid in SCAN_RESULTS:
+                security = 'WPA2' if 'WPA2' in flags else ''
+                lines.append(f'{ssid}:{min(100, 2 * (level + 100))}:{security}')
+            return (SCAN_DURATION, 0, '\n'.join(lines) + '\n', '')
+        if args[:2] == ['device', 'status']:
+            state = 'connected' if self.ip_address() else 'disconnected'
+            return (0, 0, f'DEVICE  TYPE      STATE         CONNECTION\nwlan0   wifi      {state:<13} BenchNet\n', '')
+        return (0, 0, '', '')
+
+    def _cmd_wpa_cli(self, args):
+        if args[:1] == ['-i']:
+            args = args[2:]
+        command = ' '.join([args[0].upper()] + args[1:]) if args else ''
+        reply = self.wpa_request(command)
+        return (0, 255 if reply.startswith('FAIL') else 0, reply, '')
+
+    def _cmd_podman(self, args):
+        if args[:1] == ['ps']:
+            running = CONTAINERS if self.containers_running() else ()
+            if '-a' in args:
+                status = 'Up 2 minutes' if running else 'Exited (0) 1 minute ago'
+                return (0, 0, ''.join(f'{name}: {status}\n' for name in CONTAINERS), '')
+            return (0, 0, ''.join(f'{name}\n' for name in running), '')
+        if args[:2] == ['pod', 'ls']:
+            return (0, 0, '', '')
+        return (0, 0, '', '')
+
+    def _cmd_podman_compose(self, args):
+        return (0, 0, '', '')
+
+    def _cmd_journalctl(self, args):
+        lines = [f'Jan 01 12:00:{i:02d} raspberrypi podman-compose-wrapper.sh[812]: container check {i}'
+                 for i in range(20)]
+        return (0, 0, '\n'.join(lines) + '\n-- cursor: s=bench;i=14\n', '')
+
+    def _cmd_hciconfig(self, args):
+        return (0, 0, '', '')
+
+    def _cmd_bluetoothctl(self, args):
+        return (0, 0, 'Changing power on succeeded\n', '')
+
+    # wpa_supplicant control interface
+
+    def wpa_request(self, command: str) -> str:
+        """Reply of the simulated wpa_supplicant to a control command"""
+        name = command.split(' ', 1)[0]
+        if name == 'RECONFIGURE':
+            self.start_connecting()
+            return 'OK\n'
+        if name == 'STATUS':
+            if self.associated():
+                return f'bssid={SCAN_RESULTS[0][0]}\nssid=BenchNet\nwpa_state=COMPLETED\nip_address={self.ip_address()}\n'
+            return 'wpa_state=SCANNING\n'
+        if name == 'SCAN':
+            self.scan_started = time.monotonic()
+            return 'OK\n'
+        if name == 'SCAN_RESULTS':
+            lines = ['bssid / frequency / signal level / flags / ssid']
+            lines += ['\t'.join(str(field) for field in entry) for entry in SCAN_RESULTS]
+            return '\n'.join(lines) + '\n'
+        if name == 'LIST_NETWORKS':
+            return 'network id / ssid / bssid / flags\n0\tBenchNet\tany\t[CURRENT]\n'
+        if name in ('ATTACH', 'DETACH', 'REMOVE_NETWORK', 'SAVE_CONFIG', 'DISCONNECT', 'RECONNECT'):
+            return 'OK\n'
+        return 'UNKNOWN COMMAND\n'
+
+    def wait_wpa_event(self, events, timeout: float):
+        """Block like WpaCtrl.wait_event() until the next simulated event in events"""
+        due = []
+        if wpa_ctrl.EVENT_SCAN_RESULTS in events and self.scan_started is not None:
+            due.append((self.scan_started + self._delay(SCAN_DURATION), wpa_ctrl.EVENT_SCAN_RESULTS, {}))
+        association = self.association_time()
+        if association is not None:
+            if self.scenario.password_ok and wpa_ctrl.EVENT_CONNECTED in events:
+                due.append((association, wpa_ctrl.EVENT_CONNECTED, {}))
+            elif not self.scenario.password_ok and wpa_ctrl.EVENT_SSID_TEMP_DISABLED in events:
+                due.append((association, wpa_ctrl.EVENT_SSID_TEMP_DISABLED,
+                            {'id': '0', 'ssid': 'BenchNet', 'auth_failures': '1', 'reason': 'WRONG_KEY'}))
+        deadline = time.monotonic() + timeout
+        if not due or min(event[0] for event in due) > deadline:
+            self._sleep(deadline - time.monotonic())
+            return None
+        at, name, fields = min(due, key=lambda event: event[0])
+        self._sleep(at - time.monotonic())
+        if name == wpa_ctrl.EVENT_SCAN_RESULTS:
+            self.scan_started = None
+        return (name, fields)
+
+    # In-process probes
+
+    def wait_for_interface_up(self, interface: str = "wlan0", timeout: float = 5, cancel=None) -> bool:
+        return interface == 'wlan0'
+
+    def wait_for_ipv4_address(self, interface: str = "wlan0", timeout: float = 60, cancel=None) -> str:
+        at = self.address_time()
+        deadline = time.monotonic() + timeout
+        wake = deadline if at is None else min(at, deadline)
+        if cancel is not None:
+            if cancel.wait(max(0.0, wake - time.monotonic())):
+                return ''
+        else:
+            self._sleep(wake - time.monotonic())
+        return self.ip_address()
+
+    def interface_addresses(self) -> dict:
+        ip = self.ip_address()
+        return {'lo': ['127.0.0.1'], 'wlan0': [ip]} if ip else {'lo': ['127.0.0.1']}
+
+    @contextlib.contextmanager
+    def installed(self, *modules):
+        """
+        Route commands, wpa_supplicant, rtnetlink and sysfs access of the server modules here
+
+        Args:
+            *modules: Extra modules to patch (e.g. ble_wifi_server: podman API and journal are
+                      redirected to the CLI paths, which this fake answers)
+        """
+        import provisioning
+        import wifi_config
+
+        system = self
+        patches = [
+            (wifi_config, 'WPA_SUPPLICANT_CONF', self.wpa_supplicant_conf),
+            (wifi_config, '_get_networkmanager_client', lambda: None),
+            (wifi_config, 'wait_for_ipv4_address', self.wait_for_ipv4_address),
+            (wifi_config, 'wait_for_interface_up', self.wait_for_interface_up),
+            (wifi_config, 'interface_addresses', self.interface_addresses),
+            (provisioning, 'wait_for_ipv4_address', self.wait_for_ipv4_address),
+            (provisioning, 'wait_for_interface_up', self.wait_for_interface_up),
+            (wpa_ctrl, 'ctrl_path', lambda interface='wlan0': system.ctrl_socket),
+            (wpa_ctrl, 'WpaCtrl', lambda path=None, local_dir=None: FakeWpaCtrl(system)),
+        ]
+        for module in modules:
+            if hasattr(module, 'get_podman_client'):
+                patches.append((module, 'get_podman_client', lambda user=None: None))
+            if hasattr(module, 'read_unit_log'):
+                import journal_reader
+                patches.append((module, 'read_unit_log', journal_reader.journalctl_unit_log))
+
+        saved = [(obj, name, getattr(obj, name)) for obj, name, _value in patches]
+        for obj, name, value in patches:
+            setattr(obj, name, value)
+        previous_runner = commands.set_runner(self.run)
+        try:
+            yield self
+        finally:
+            commands.set_runner(previous_runner)
+            for obj, name, value in reversed(saved):
+                setattr(obj, name, value)
+
+
+class FakeWpaCtrl:
+    """WpaCtrl replacement talking to a FakeSystem"""
+
+    def __init__(self, system: FakeSystem):
+        self.system = system
+        self.attached = False
+        self.pending_events = []
+
+    def close(self):
+        self.attached = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def request(self, command: str, timeout: float = 5) -> str:
+        time.sleep(self.system._delay(WPA_CTRL_LATENCY))
+        return self.system.wpa_request(command)
+
+    def attach(self):
+        self.attached = True
+
+    def wait_event(self, events, timeout: float):
+        return self.system.wait_wpa_event(tuple(events), timeout)
@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""
+Stand-in wpa_supplicant control socket replaying recorded supplicant output
+FakeWpaSupplicant binds a UNIX datagram socket like /var/run/wpa_supplicant/wlan0 and
+answers wpa_ctrl commands from a transcript: STATUS replies change as the transcript's
+events are sent to ATTACHed clients, at their recorded offsets. Unlike
+fake_system.FakeWpaCtrl, which replaces WpaCtrl in-process, this exercises the real
+datagram framing, ATTACH/DETACH and event parsing of wpa_ctrl.py.
+
+Running the module checks wpa_ctrl.wait_for_connection() against the recorded
+transcripts below and exits non-zero if any outcome differs.
+
+Usage:
+    python3 fake_wpa_supplicant.py            # all transcripts
+    python3 fake_wpa_supplicant.py -v other_network_wrong_key
+"""
+
+import argparse
+import os
+import select
+import socket
+import sys
+import tempfile
+import threading
+import time
+from collections import namedtuple
+
+import wpa_ctrl
+
+# events: (seconds after ATTACH, unsolicited message, STATUS reply from then on or None)
+Transcript = namedtuple('Transcript', ['name', 'ssid', 'status', 'events', 'expected'])
+
+STATUS_SCANNING = 'wpa_state=SCANNING\naddress=b8:27:eb:aa:bb:cc\n'
+
+
+def status_completed(ssid: str, bssid: str = 'f4:f2:6d:10:20:30') -> str:
+    """STATUS reply of an associated wpa_supplicant (`ssid` as wpa_supplicant prints it)"""
+    return (f'bssid={bssid}\nfreq=2437\nssid={ssid}\nid=0\nmode=station\npairwise_cipher=CCMP\n'
+            f'group_cipher=CCMP\nkey_mgmt=WPA2-PSK\nwpa_state=COMPLETED\naddress=b8:27:eb:aa:bb:cc\n')
+
+
+# Messages as wpa_supplicant 2.9/2.10 sends them on Raspberry Pi OS (addresses and SSIDs replaced)
+TRANSCRIPTS = {
+    'connects': Transcript(
+        'connects', 'Home Net', STATUS_SCANNING, [
+            (0.05, '<3>CTRL-EVENT-SCAN-RESULTS ', None),
+            (0.10, '<3>Trying to associate with f4:f2:6d:10:20:30 (SSID=\'Home Net\' freq=2437 MHz)', None),
+            (0.15, '<3>CTRL-EVENT-CONNECTED - Connection to f4:f2:6d:10:20:30 completed [id=0 id_str=]',
+             status_completed('Home Net')),
+        ],
+        (True, '')),
+    'wrong_key': Transcript(
+        'wrong_key', 'Home Net', STATUS_SCANNING, [
+            (0.10, '<3>CTRL-EVENT-DISCONNECTED bssid=f4:f2:6d:10:20:30 reason=15', None),
+            (0.12, '<3>CTRL-EVENT-SSID-TEMP-DISABLED id=0 ssid="Home Net" auth_failures=1 duration=10 '
+                   'reason=WRONG_KEY', None),
+        ],
+        (False, 'WRONG_KEY')),
+    # An older saved network is still associated when the wait starts, then the new one connects
+    'old_network_connected': Transcript(
+        'old_network_connected', 'Home Net', status_completed('Old Net', 'a0:63:91:01:02:03'), [
+            (0.05, '<3>CTRL-EVENT-DISCONNECTED bssid=a0:63:91:01:02:03 reason=3 locally_generated=1',
+             STATUS_SCANNING),
+            (0.10, '<3>CTRL-EVENT-CONNECTED - Connection to a0:63:91:01:02:03 completed [id=1 id_str=]',
+             status_completed('Old Net', 'a0:63:91:01:02:03')),
+            (0.20, '<3>CTRL-EVENT-CONNECTED - Connection to f4:f2:6d:10:20:30 completed [id=0 id_str=]',
+             status_completed('Home Net')),
+        ],
+        (True, '')),
+    # Another saved network rejects its key; the provisioned one connects afterwards
+    'other_network_wrong_key': Transcript(
+        'other_network_wrong_key', 'Home Net', STATUS_SCANNING, [
+            (0.05, '<3>CTRL-EVENT-SSID-TEMP-DISABLED id=1 ssid="Old Net" auth_failures=1 duration=10 '
+                   'reason=WRONG_KEY', None),
+            (0.15, '<3>CTRL-EVENT-CONNECTED - Connection to f4:f2:6d:10:20:30 completed [id=0 id_str=]',
+             status_completed('Home Net')),
+        ],
+        (True, '')),
+    # Only the old network ever connects
+    'only_old_network': Transcript(
+        'only_old_network', 'Home Net', STATUS_SCANNING, [
+            (0.05, '<3>CTRL-EVENT-CONNECTED - Connection to a0:63:91:01:02:03 completed [id=1 id_str=]',
+             status_completed('Old Net', 'a0:63:91:01:02:03')),
+        ],
+        (False, 'timeout')),
+    # SSID with a space, a quote and a non-ASCII character (escaped by wpa_supplicant)
+    'escaped_ssid': Transcript(
+        'escaped_ssid', 'Kavárna "U Lípy"', STATUS_SCANNING, [
+            (0.05, '<3>CTRL-EVENT-SSID-TEMP-DISABLED id=0 ssid="Kav\\xc3\\xa1rna \\"U L\\xc3\\xadpy\\"" '
+                   'auth_failures=1 duration=10 reason=WRONG_KEY', None),
+        ],
+        (False, 'WRONG_KEY')),
+}
+WAIT_TIMEOUT = 0.6
+
+
+class FakeWpaSupplicant:
+    """UNIX datagram server speaking the wpa_ctrl protocol from a Transcript"""
+
+    def __init__(self, path: str, transcript: Transcript, verbose: bool = False):
+        self.path = path
+        self.transcript = transcript
+        self.verbose = verbose
+        self.status = transcript.status
+        self.commands = []
+        self._attached = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self.sock.bind(path)
+        self._thread = threading.Thread(target=self._serve, name='fake-wpa-supplicant', daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._stop.set()
+        self._thread.join()
+        self.sock.close()
+        os.unlink(self.path)
+
+    def _log(self, text: str):
+        if self.verbose:
+            print(f'  [wpa_supplicant] {text}', file=sys.stderr)
+
+    def _reply(self, command: str, client: str) -> str:
+        name = command.split(' ', 1)[0]
+        if name == 'ATTACH':
+            with self._lock:
+                first = not self._attached
+                self._attached.add(client)
+            if first:
+                threading.Thread(target=self._send_events, daemon=True).start()
+            return 'OK\n'
+        if name == 'DETACH':
+            with self._lock:
+                self._attached.discard(client)
+            return 'OK\n'
+        if name == 'STATUS':
+            with self._lock:
+                return self.status
+        if name == 'PING':
+            return 'PONG\n'
+        return 'UNKNOWN COMMAND\n'
+
+    def _serve(self):
+        while not self._stop.is_set():
+            readable, _, _ = select.select([self.sock], [], [], 0.05)
+            if not readable:
+                continue
+            data, client = self.sock.recvfrom(4096)
+            command = data.decode('utf-8', 'replace')
+            self.commands.append(command)
+            reply = self._reply(command, client)
+            self._log(f'{command} -> {reply.strip()!r}')
+            try:
+                self.sock.sendto(reply.encode('utf-8'), client)
+            except OSError:
+                pass
+
+    def _send_events(self):
+        started = time.monotonic()
+        for offset, message, status in self.transcript.events:
+            if self._stop.wait(max(0.0, started + offset - time.monotonic())):
+                return
+            with self._lock:
+                if status is not None:
+                    self.status = status
+                clients = list(self._attached)
+            self._log(f'event {message}')
+            for client in clients:
+                try:
+                    self.sock.sendto(message.encode('utf-8'), client)
+                except OSError:
+                    pass
+
+
+def run_transcript(transcript: Transcript, verbose: bool = False) -> tuple:
+    """
+    Returns:
+        Outcome of wait_for_connection() against the transcript
+    """
+    with tempfile.TemporaryDirectory(prefix='fake-wpa-') as directory:
+        path = os.path.join(directory, 'wlan0')
+        with FakeWpaSupplicant(path, transcript, verbose):
+            return wpa_ctrl.wait_for_connection(timeout=WAIT_TIMEOUT, path=path, ssid=transcript.ssid)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('transcripts', nargs='*', metavar='transcript',
+                        help=f"Transcripts to replay: {', '.join(TRANSCRIPTS)} (default: all)")
+    parser.add_argument('-v', '--verbose', action='store_true', help='Show the datagrams exchanged')
+    args = parser.parse_args(argv)
+    unknown = [name for name in args.transcripts if name not in TRANSCRIPTS]
+    if unknown:
+        parser.error(f"unknown transcript: {', '.join(unknown)}")
+
+    failures = 0
+    for name in args.transcripts or list(TRANSCRIPTS):
+        transcript = TRANSCRIPTS[name]
+        outcome = run_transcript(transcript, args.verbose)
+        ok = tuple(outcome) == transcript.expected
+        failures += not ok
+        print(f"{'ok  ' if ok else 'FAIL'} {name:<26} {outcome}" +
+              ('' if ok else f' (expected {transcript.expected})'))
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,372 @@
+#!/usr/bin/env python3
+"""
+Concurrent GATT load generator for the BLE server
+Finds the application registered with mock_bluez.py and acts as BlueZ on behalf of several
+centrals: each keeps one ReadValue/WriteValue/StartNotify call in flight, cycling through
+all characteristics (long values are fetched with offset reads like ATT Read Blob). A probe
+meanwhile reads one characteristic's properties at a fixed interval; as GetAll is answered
+directly on the server's main loop, its latency shows how long other requests keep the
+main loop busy. Reports throughput and latency percentiles per operation.
+
+Writes that change the system (SSID/password, start containers) are skipped unless
+--allow-side-effects is given.
+
+Usage:
+    python3 gatt_load.py                                   # 30 s, 4 centrals, all characteristics
+    python3 gatt_load.py --centrals 8 --chars container_status,status
+    python3 gatt_load.py --bus unix:path=/tmp/bus --json load.json
+"""
+
+import argparse
+import json
+import math
+import sys
+import time
+
+import dbus
+import dbus.exceptions
+import dbus.mainloop.glib
+from gi.repository import GLib
+
+from ble_wifi_server import (
+    CHARACTERISTIC_NAMES,
+    CREDENTIALS_CHAR_UUID,
+    START_CONTAINERS_CHAR_UUID,
+    STATUS_CHAR_UUID,
+    WIFI_PASSWORD_CHAR_UUID,
+    WIFI_SCAN_CHAR_UUID,
+    WIFI_SSID_CHAR_UUID,
+)
+from credentials_codec import encode_credentials
+from mock_bluez import (
+    ADAPTER_PATH,
+    BLUEZ_SERVICE_NAME,
+    DBUS_OM_IFACE,
+    DBUS_PROP_IFACE,
+    GATT_CHRC_IFACE,
+    MOCK_IFACE,
+    open_bus,
+)
+
+# Values written by the load; characteristics without an entry are not written
+WRITE_VALUES = {
+    WIFI_SCAN_CHAR_UUID: (b'json', b'binary'),
+    WIFI_SSID_CHAR_UUID: (b'LoadTestNet',),
+    WIFI_PASSWORD_CHAR_UUID: (b'load-test-password',),
+    START_CONTAINERS_CHAR_UUID: (b'start',),
+    CREDENTIALS_CHAR_UUID: (encode_credentials('LoadTestNet', 'load-test-password', request_id=1),),
+}
+SIDE_EFFECT_WRITES = {WIFI_SSID_CHAR_UUID, WIFI_PASSWORD_CHAR_UUID, START_CONTAINERS_CHAR_UUID,
+                      CREDENTIALS_CHAR_UUID}
+
+DEFAULT_DURATION = 30.0
+DEFAULT_CENTRALS = 4
+DEFAULT_MTU = 185
+PROBE_INTERVAL_MS = 50
+IDLE_PROBE_TIME = 3.0
+CALL_TIMEOUT = 30.0
+REGISTRATION_WAIT = 20.0
+
+
+def percentiles(samples: list) -> dict:
+    """
+    Returns:
+        {"count", "p50_ms", "p90_ms", "p99_ms", "max_ms"} (nearest-rank, None without samples)
+    """
+    ordered = sorted(samples)
+    result = {'count': len(ordered)}
+    for name, fraction in (('p50_ms', 0.5), ('p90_ms', 0.9), ('p99_ms', 0.99), ('max_ms', 1.0)):
+        if not ordered:
+            result[name] = None
+            continue
+        index = max(0, math.ceil(fraction * len(ordered)) - 1)
+        result[name] = round(ordered[index] * 1000, 2)
+    return result
+
+
+def find_application(bus, wait: float):
+    """
+    Wait until mock_bluez has a registered application
+
+    Returns:
+        Tuple of (bus name, object path)
+
+    Raises:
+        RuntimeError: Nothing was registered within `wait` seconds
+    """
+    mock = dbus.Interface(bus.get_object(BLUEZ_SERVICE_NAME, '/'), MOCK_IFACE)
+    deadline = time.monotonic() + wait
+    while True:
+        applications = mock.GetApplications()
+        if applications:
+            owner, path = applications[0]
+            return (str(owner), str(path))
+        if time.monotonic() >= deadline:
+            raise RuntimeError(f'No GATT application registered with {BLUEZ_SERVICE_NAME} after {wait:g}s')
+        time.sleep(0.2)
+
+
+def list_characteristics(bus, owner: str, app_path: str) -> list:
+    """
+    Returns:
+        List of (object path, uuid, flags) of the application's characteristics
+    """
+    app = dbus.Interface(bus.get_object(owner, app_path, introspect=False), DBUS_OM_IFACE)
+    characteristics = []
+    for path, interfaces in sorted(app.GetManagedObjects().items()):
+        chrc = interfaces.get(GATT_CHRC_IFACE)
+        if chrc is not None:
+            characteristics.append((str(path), str(chrc['UUID']), [str(flag) for flag in chrc['Flags']]))
+    return characteristics
+
+
+def build_operations(characteristics: list, names=None, allow_side_effects: bool = False) -> list:
+    """
+    Returns:
+        List of (label, method, object path, uuid) covering every selected characteristic
+    """
+    operations = []
+    for path, uuid, flags in characteristics:
+        name = CHARACTERISTIC_NAMES.get(uuid, uuid)
+        if names and name not in names:
+            continue
+        if 'read' in flags:
+            operations.append((f'{name}.read', 'ReadValue', path, uuid))
+        if ('write' in flags or 'write-without-response' in flags) and uuid in WRITE_VALUES:
+            if allow_side_effects or uuid not in SIDE_EFFECT_WRITES:
+                operations.append((f'{name}.write', 'WriteValue', path, uuid))
+        if 'notify' in flags:
+            operations.append((f'{name}.notify', 'StartNotify', path, uuid))
+    return operations
+
+
+class LoadGenerator:
+    """Keeps one GATT call in flight per simulated central and probes main-loop latency"""
+
+    def __init__(self, bus, owner: str, operations: list, probe_path: str, centrals: int = DEFAULT_CENTRALS,
+                 mtu: int = DEFAULT_MTU, probe_interval_ms: int = PROBE_INTERVAL_MS):
+        self.bus = bus
+        self.owner = owner
+        self.operations = operations
+        self.centrals = centrals
+        self.mtu = mtu
+        self.probe_interval_ms = probe_interval_ms
+        self.probe_target = bus.get_object(owner, probe_path, introspect=False)
+        self.objects = {path: bus.get_object(owner, path, introspect=False) for _, _, path, _ in operations}
+        self.latencies = {label: [] for label, _, _, _ in operations}
+        self.errors = {label: {} for label, _, _, _ in operations}
+        self.probe_samples = []
+        self.probes_skipped = 0
+        self.notifications = 0
+        self.in_flight = 0
+        self.loading = False
+        self.probing = False
+        self._probe_pending = False
+        self._writes = 0
+        bus.add_signal_receiver(self._on_notification, 'PropertiesChanged', DBUS_PROP_IFACE, owner)
+
+    def _on_notification(self, interface, changed, invalidated):
+        if interface == GATT_CHRC_IFACE and 'Value' in changed:
+            self.notifications += 1
+
+    def _options(self, central: int, offset: int = 0) -> dict:
+        return {
+            'device': dbus.ObjectPath(f'{ADAPTER_PATH}/dev_00_00_5E_00_53_{central + 16:02X}'),
+            'mtu': dbus.UInt16(self.mtu),
+            'offset': dbus.UInt16(offset),
+        }
+
+    def _record_error(self, label: str, error):
+        name = error.get_dbus_name() if isinstance(error, dbus.exceptions.DBusException) else type(error).__name__
+        self.errors[label][name] = self.errors[label].get(name, 0) + 1
+
+    def start_probe(self):
+        self.probing = True
+        GLib.timeout_add(self.probe_interval_ms, self._probe)
+
+    def _probe(self):
+        if not self.probing:
+            return False
+        if self._probe_pending:
+            # The previous probe is still unanswered - the main loop is blocked
+            self.probes_skipped += 1
+            return True
+        self._probe_pending = True
+        started = time.monotonic()
+
+        def done(*args):
+            self._probe_pending = False
+            self.probe_samples.append(time.monotonic() - started)
+
+        def failed(error):
+            self._probe_pending = False
+
+        self.probe_target.GetAll(GATT_CHRC_IFACE, dbus_interface=DBUS_PROP_IFACE,
+                                 reply_handler=done, error_handler=failed, timeout=CALL_TIMEOUT)
+        return True
+
+    def start_load(self):
+        self.loading = True
+        for central in range(self.centrals):
+            # Spread the centrals over the operation cycle
+            self._next(central, central * len(self.operations) // max(1, self.centrals))
+
+    def _next(self, central: int, index: int):
+        if not self.loading:
+            return
+        label, method, path, uuid = self.operations[index % len(self.operations)]
+        obj = self.objects[path]
+        started = time.monotonic()
+        self.in_flight += 1
+
+        def finish(error=None):
+            self.in_flight -= 1
+            if error is None:
+                self.latencies[label].append(time.monotonic() - started)
+            else:
+                self._record_error(label, error)
+            self._next(central, index + 1)
+
+        def on_read(value, offset=0):
+            # An ATT response carries MTU - 1 bytes of the value; a full response is
+            # followed by a Read Blob at the next offset, which BlueZ passes on as ReadValue
+            if len(value) >= self.mtu - 1:
+                offset += self.mtu - 1
+                obj.ReadValue(self._options(central, offset), dbus_interface=GATT_CHRC_IFACE, byte_arrays=True,
+                              reply_handler=lambda more: on_read(more, offset), error_handler=finish,
+                              timeout=CALL_TIMEOUT)
+                return
+            finish()
+
+        if method == 'ReadValue':
+            obj.ReadValue(self._options(central), dbus_interface=GATT_CHRC_IFACE, byte_arrays=True,
+                          reply_handler=on_read, error_handler=finish, timeout=CALL_TIMEOUT)
+        elif method == 'WriteValue':
+            values = WRITE_VALUES[uuid]
+            self._writes += 1
+            value = dbus.ByteArray(values[self._writes % len(values)])
+            obj.WriteValue(value, self._options(central), dbus_interface=GATT_CHRC_IFACE,
+                           reply_handler=lambda: finish(), error_handler=finish, timeout=CALL_TIMEOUT)
+        else:
+            # Subscribe and unsubscribe again, as a central reconnecting would
+            def stop():
+                obj.StopNotify(dbus_interface=GATT_CHRC_IFACE,
+                               reply_handler=lambda: finish(), error_handler=finish, timeout=CALL_TIMEOUT)
+            obj.StartNotify(dbus_interface=GATT_CHRC_IFACE,
+                            reply_handler=stop, error_handler=finish, timeout=CALL_TIMEOUT)
+
+    def run(self, duration: float, idle: float = IDLE_PROBE_TIME) -> dict:
+        """
+        Probe the idle server, then run the load for `duration` seconds and drain in-flight calls
+
+        Returns:
+            Result dictionary (see report())
+        """
+        mainloop = GLib.MainLoop()
+        phases = {}
+
+        def begin_load():
+            phases['idle'] = self.probe_samples
+            self.probe_samples = []
+            phases['started'] = time.monotonic()
+            self.start_load()
+            GLib.timeout_add(int(duration * 1000), end_load)
+            return False
+
+        def end_load():
+            self.loading = False
+            phases['elapsed'] = time.monotonic() - phases['started']
+            GLib.timeout_add(50, drain, time.monotonic() + CALL_TIMEOUT)
+            return False
+
+        def drain(deadline):
+            if self.in_flight and time.monotonic() < deadline:
+                return True
+            self.probing = False
+            mainloop.quit()
+            return False
+
+        self.start_probe()
+        GLib.timeout_add(int(idle * 1000), begin_load)
+        mainloop.run()
+        return self.report(phases['idle'], phases['elapsed'])
+
+    def report(self, idle_probes: list, elapsed: float) -> dict:
+        completed = sum(len(samples) for samples in self.latencies.values())
+        return {
+            'centrals': self.centrals,
+            'duration_s': round(elapsed, 3),
+            'completed': completed,
+            'throughput_per_s': round(completed / elapsed, 1) if elapsed > 0 else 0.0,
+            'notifications': self.notifications,
+            'main_loop_idle': percentiles(idle_probes),
+            'main_loop_load': dict(percentiles(self.probe_samples), skipped=self.probes_skipped),
+            'operations': {label: dict(percentiles(samples), errors=self.errors[label])
+                           for label, samples in self.latencies.items()},
+        }
+
+
+def _ms(value) -> str:
+    return '-' if value is None else f'{value:.1f}'
+
+
+def print_report(result: dict):
+    print(f"{result['completed']} calls in {result['duration_s']:.1f}s from {result['centrals']} centrals: "
+          f"{result['throughput_per_s']:.1f} calls/s, {result['notifications']} notifications")
+    print()
+    print(f"{'':<26} {'count':>7} {'p50 ms':>8} {'p90 ms':>8} {'p99 ms':>8} {'max ms':>8}  errors")
+    rows = [('main loop (idle)', result['main_loop_idle'], {}),
+            ('main loop (load)', result['main_loop_load'], {})]
+    rows += [(label, stats, stats['errors']) for label, stats in result['operations'].items()]
+    for label, stats, errors in rows:
+        error_text = ', '.join(f'{name}: {count}' for name, count in errors.items())
+        print(f"{label:<26} {stats['count']:>7} {_ms(stats['p50_ms']):>8} {_ms(stats['p90_ms']):>8} "
+              f"{_ms(stats['p99_ms']):>8} {_ms(stats['max_ms']):>8}  {error_text}")
+    if result['main_loop_load']['skipped']:
+        print(f"\n{result['main_loop_load']['skipped']} probes skipped while the previous one was unanswered")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--bus', default='session', help="'session' (default), 'system' or a bus address")
+    parser.add_argument('--duration', type=float, default=DEFAULT_DURATION, help='Load phase in seconds')
+    parser.add_argument('--idle', type=float, default=IDLE_PROBE_TIME,
+                        help='Main-loop probing before the load starts, in seconds')
+    parser.add_argument('--centrals', type=int, default=DEFAULT_CENTRALS, help='Concurrent simulated centrals')
+    parser.add_argument('--mtu', type=int, default=DEFAULT_MTU, help='ATT MTU reported to the server')
+    parser.add_argument('--chars', help=f"Comma-separated characteristics ({', '.join(CHARACTERISTIC_NAMES.values())})")
+    parser.add_argument('--probe-interval', type=int, default=PROBE_INTERVAL_MS, help='Probe interval in ms')
+    parser.add_argument('--allow-side-effects', action='store_true',
+                        help='Also write SSID/password and start containers')
+    parser.add_argument('--json', metavar='PATH', help='Write the results as JSON')
+    args = parser.parse_args(argv)
+
+    dbus.mainloop.glib.DBusGMainLoop(set_as_default=True)
+    bus = open_bus(args.bus)
+    try:
+        owner, app_path = find_application(bus, REGISTRATION_WAIT)
+    except (RuntimeError, dbus.exceptions.DBusException) as e:
+        print(f"ERROR: {e}", file=sys.stderr)
+        return 1
+    characteristics = list_characteristics(bus, owner, app_path)
+    names = set(args.chars.split(',')) if args.chars else None
+    operations = build_operations(characteristics, names, args.allow_side_effects)
+    if not operations:
+        print("ERROR: no operations selected", file=sys.stderr)
+        return 1
+    # Probe a characteristic whose GetAll is answered on the main loop without other work
+    probe_path = next((path for path, uuid, _ in characteristics if uuid == STATUS_CHAR_UUID),
+                      characteristics[0][0])
+
+    print(f"Loading {app_path} on {owner}: {', '.join(label for label, _, _, _ in operations)}", file=sys.stderr)
+    generator = LoadGenerator(bus, owner, operations, probe_path, args.centrals, args.mtu, args.probe_interval)
+    result = generator.run(args.duration, args.idle)
+    print_report(result)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(result, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+"""
+Replay a recorded GATT session against the BLE server
+Reads a session file written by session_recorder.py and repeats its calls against the
+application registered with mock_bluez.py, at the recorded pace or accelerated. Calls of
+one central (the 'device' option) stay in order and never overlap, as on an ATT bearer;
+different centrals and BlueZ's own calls run concurrently. Reports recorded and replayed
+latency per call type.
+
+Recorded password writes carry only their length - the replay writes --password, or a
+placeholder of the recorded length. Writes that change the system (SSID/password, start
+containers) can be left out with --skip-side-effects.
+
+Usage:
+    python3 gatt_replay.py session-20240501-101500.jsonl               # recorded pace
+    python3 gatt_replay.py session.jsonl --speed 10                    # 10x faster
+    python3 gatt_replay.py session.jsonl --speed 0 --json replay.json  # back to back
+"""
+
+import argparse
+import collections
+import json
+import sys
+import time
+
+import dbus
+import dbus.exceptions
+import dbus.mainloop.glib
+from gi.repository import GLib
+
+from gatt_load import (
+    CALL_TIMEOUT,
+    CHARACTERISTIC_NAMES,
+    REGISTRATION_WAIT,
+    SIDE_EFFECT_WRITES,
+    find_application,
+    list_characteristics,
+    percentiles,
+)
+from mock_bluez import DBUS_OM_IFACE, DBUS_PROP_IFACE, GATT_CHRC_IFACE, open_bus
+from session_recorder import FORMAT_VERSION
+
+# Channel of calls made by BlueZ itself rather than on behalf of a central
+BLUEZ_CHANNEL = ''
+
+
+def load_session(path: str) -> list:
+    """
+    Returns:
+        Recorded call events ordered by time
+
+    Raises:
+        ValueError: Not a session file, or a newer format version
+    """
+    events = []
+    with open(path, encoding='utf-8') as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            event = json.loads(line)
+            if event.get('type') == 'session':
+                if event.get('version', 0) > FORMAT_VERSION:
+                    raise ValueError(f"{path}: session format {event['version']} is newer than {FORMAT_VERSION}")
+            elif event.get('type') == 'call':
+                events.append(event)
+            elif line_number == 1:
+                raise ValueError(f"{path}: not a GATT session file")
+    events.sort(key=lambda event: event['t'])
+    return events
+
+
+def call_label(event: dict) -> str:
+    uuid = event.get('uuid')
+    if not uuid:
+        return event['method']
+    return f"{CHARACTERISTIC_NAMES.get(uuid, uuid)}.{event['method']}"
+
+
+class Replayer:
+    """Issues recorded calls per channel at their (scaled) recorded times"""
+
+    def __init__(self, bus, owner: str, app_path: str, events: list, speed: float = 1.0,
+                 password: str = None, skip_side_effects: bool = False):
+        self.bus = bus
+        self.owner = owner
+        self.app_path = app_path
+        self.speed = speed
+        self.password = password
+        # Characteristic paths of the running server by UUID - recorded paths may differ
+        self.paths = {uuid: path for path, uuid, _ in list_characteristics(bus, owner, app_path)}
+        self.channels = {}
+        self.skipped = 0
+        for event in events:
+            if skip_side_effects and event['method'] == 'WriteValue' and event.get('uuid') in SIDE_EFFECT_WRITES:
+                self.skipped += 1
+                continue
+            channel = event.get('options', {}).get('device', BLUEZ_CHANNEL)
+            self.channels.setdefault(channel, collections.deque()).append(event)
+        self.latencies = {}
+        self.recorded = {}
+        self.errors = {}
+        self.lag = []
+        self.pending = 0
+        self.started = 0.0
+        self.mainloop = None
+
+    def _object(self, event: dict):
+        if event['method'] == 'GetManagedObjects':
+            path = self.app_path
+        else:
+            path = self.paths.get(event.get('uuid'), event['path'])
+        return self.bus.get_object(self.owner, path, introspect=False)
+
+    def _write_value(self, event: dict) -> bytes:
+        if not event.get('redacted'):
+            return bytes.fromhex(event.get('value', ''))
+        if self.password is not None:
+            return self.password.encode('utf-8')
+        return b'x' * event.get('size', 8)
+
+    def _issue(self, channel: str, event: dict):
+        label = call_label(event)
+        obj = self._object(event)
+        self.recorded.setdefault(label, []).append(event.get('duration', 0.0))
+        started = time.monotonic()
+        if self.speed > 0:
+            self.lag.append(max(0.0, started - (self.started + event['t'] / self.speed)))
+
+        def done(*args):
+            self.latencies.setdefault(label, []).append(time.monotonic() - started)
+            self._next(channel)
+
+        def failed(error):
+            name = error.get_dbus_name() if isinstance(error, dbus.exceptions.DBusException) else type(error).__name__
+            self.errors.setdefault(label, {})
+            self.errors[label][name] = self.errors[label].get(name, 0) + 1
+            self._next(channel)
+
+        handlers = {'reply_handler': done, 'error_handler': failed, 'timeout': CALL_TIMEOUT}
+        method = event['method']
+        options = {key: (dbus.ObjectPath(value) if key == 'device' else
+                         dbus.UInt16(value) if key in ('offset', 'mtu') else value)
+                   for key, value in event.get('options', {}).items()}
+        if method == 'GetManagedObjects':
+            obj.GetManagedObjects(dbus_interface=DBUS_OM_IFACE, **handlers)
+        elif method == 'GetAll':
+            obj.GetAll(event.get('interface', GATT_CHRC_IFACE), dbus_interface=DBUS_PROP_IFACE, **handlers)
+        elif method == 'ReadValue':
+            obj.ReadValue(options, dbus_interface=GATT_CHRC_IFACE, byte_arrays=True, **handlers)
+        elif method == 'WriteValue':
+            obj.WriteValue(dbus.ByteArray(self._write_value(event)), options,
+                           dbus_interface=GATT_CHRC_IFACE, **handlers)
+        elif method in ('StartNotify', 'StopNotify'):
+            getattr(obj, method)(dbus_interface=GATT_CHRC_IFACE, **handlers)
+        else:
+            self.skipped += 1
+            GLib.idle_add(self._deliver_next, channel)
+
+    def _deliver_next(self, channel: str):
+        self._next(channel)
+        return False
+
+    def _fire(self, channel: str, event: dict):
+        self._issue(channel, event)
+        return False
+
+    def _next(self, channel: str):
+        """Issue the channel's next call at its scheduled time, or now if the channel is behind"""
+        queue = self.channels[channel]
+        if not queue:
+            self.pending -= 1
+            if self.pending == 0:
+                self.mainloop.quit()
+            return
+        event = queue.popleft()
+        delay = self.started + event['t'] / self.speed - time.monotonic() if self.speed > 0 else 0
+        if delay > 0:
+            GLib.timeout_add(int(delay * 1000), self._fire, channel, event)
+        else:
+            GLib.idle_add(self._fire, channel, event)
+
+    def run(self) -> dict:
+        """
+        Returns:
+            Result dictionary (see report())
+        """
+        self.mainloop = GLib.MainLoop()
+        self.pending = len(self.channels)
+        if not self.pending:
+            return self.report(0.0)
+        self.started = time.monotonic()
+        for channel in list(self.channels):
+            self._next(channel)
+        self.mainloop.run()
+        return self.report(time.monotonic() - self.started)
+
+    def report(self, elapsed: float) -> dict:
+        labels = sorted(set(self.recorded) | set(self.errors))
+        return {
+            'speed': self.speed,
+            'duration_s': round(elapsed, 3),
+            'channels': len(self.channels),
+            'skipped': self.skipped,
+            'schedule_lag': percentiles(self.lag),
+            'calls': {label: {
+                'recorded': percentiles(self.recorded.get(label, [])),
+                'replayed': percentiles(self.latencies.get(label, [])),
+                'errors': self.errors.get(label, {}),
+            } for label in labels},
+        }
+
+
+def _ms(value) -> str:
+    return '-' if value is None else f'{value:.1f}'
+
+
+def print_report(result: dict, recorded_duration: float):
+    print(f"Replayed {recorded_duration:.1f}s of recorded traffic in {result['duration_s']:.1f}s "
+          f"(speed {result['speed']:g}, {result['channels']} channels, {result['skipped']} calls skipped)")
+    lag = result['schedule_lag']
+    if lag['count']:
+        print(f"Calls issued behind schedule: p50 {_ms(lag['p50_ms'])} ms, max {_ms(lag['max_ms'])} ms")
+    print()
+    print(f"{'call':<34} {'count':>6} {'recorded p50/p99 ms':>20} {'replayed p50/p99 ms':>20}  errors")
+    for label, stats in result['calls'].items():
+        recorded, replayed = stats['recorded'], stats['replayed']
+        error_text = ', '.join(f'{name}: {count}' for name, count in stats['errors'].items())
+        print(f"{label:<34} {recorded['count']:>6} "
+              f"{_ms(recorded['p50_ms']) + ' / ' + _ms(recorded['p99_ms']):>20} "
+              f"{_ms(replayed['p50_ms']) + ' / ' + _ms(replayed['p99_ms']):>20}  {error_text}")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('session', help='Session file from BLE_SESSION_RECORD_DIR')
+    parser.add_argument('--bus', default='session', help="'session' (default), 'system' or a bus address")
+    parser.add_argument('--speed', type=float, default=1.0,
+                        help='Time scale: 1 = recorded pace, 10 = ten times faster, 0 = back to back')
+    parser.add_argument('--password', help='Password written in place of recorded (redacted) password writes')
+    parser.add_argument('--skip-side-effects', action='store_true',
+                        help='Leave out SSID/password writes and container starts')
+    parser.add_argument('--json', metavar='PATH', help='Write the results as JSON')
+    args = parser.parse_args(argv)
+
+    try:
+        events = load_session(args.session)
+    except (OSError, ValueError) as e:
+        print(f"ERROR: {e}", file=sys.stderr)
+        return 1
+    recorded_duration = max((event['t'] + event.get('duration', 0.0) for event in events), default=0.0)
+
+    dbus.mainloop.glib.DBusGMainLoop(set_as_default=True)
+    bus = open_bus(args.bus)
+    try:
+        owner, app_path = find_application(bus, REGISTRATION_WAIT)
+    except (RuntimeError, dbus.exceptions.DBusException) as e:
+        print(f"ERROR: {e}", file=sys.stderr)
+        return 1
+
+    replayer = Replayer(bus, owner, app_path, events, args.speed, args.password, args.skip_side_effects)
+    result = replayer.run()
+    print_report(result, recorded_duration)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(dict(result, session=args.session, recorded_duration_s=round(recorded_duration, 3)), f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+"""
+In-process systemd journal reader for the BLE server
+Reads service logs through libsystemd (sd-journal via ctypes) instead of spawning
+`journalctl`, and returns a cursor with every read so a client can ask for
+only the entries added since its last read.
+"""
+
+import collections
+import ctypes
+import ctypes.util
+import logging
+import os
+import threading
+import time
+
+import commands
+
+logger = logging.getLogger('ble.logs')
+
+SD_JOURNAL_LOCAL_ONLY = 1
+
+JournalEntry = collections.namedtuple('JournalEntry', ['timestamp', 'hostname', 'identifier', 'pid', 'message'])
+
+
+class JournalError(OSError):
+    """Raised when libsystemd is missing or a journal call fails"""
+
+
+_libsystemd = None
+_libc = None
+
+
+def _load_libraries():
+    global _libsystemd, _libc
+    if _libsystemd is None:
+        name = ctypes.util.find_library('systemd') or 'libsystemd.so.0'
+        try:
+            lib = ctypes.CDLL(name)
+        except OSError as e:
+            raise JournalError(f"libsystemd not available: {e}")
+        j = ctypes.c_void_p
+        lib.sd_journal_open.argtypes = [ctypes.POINTER(j), ctypes.c_int]
+        lib.sd_journal_open_directory.argtypes = [ctypes.POINTER(j), ctypes.c_char_p, ctypes.c_int]
+        lib.sd_journal_open_files.argtypes = [ctypes.POINTER(j), ctypes.POINTER(ctypes.c_char_p), ctypes.c_int]
+        lib.sd_journal_close.argtypes = [j]
+        lib.sd_journal_close.restype = None
+        lib.sd_journal_add_match.argtypes = [j, ctypes.c_void_p, ctypes.c_size_t]
+        lib.sd_journal_add_disjunction.argtypes = [j]
+        lib.sd_journal_process.argtypes = [j]
+        lib.sd_journal_seek_tail.argtypes = [j]
+        lib.sd_journal_seek_cursor.argtypes = [j, ctypes.c_char_p]
+        lib.sd_journal_test_cursor.argtypes = [j, ctypes.c_char_p]
+        lib.sd_journal_previous_skip.argtypes = [j, ctypes.c_uint64]
+        lib.sd_journal_next.argtypes = [j]
+        lib.sd_journal_get_cursor.argtypes = [j, ctypes.POINTER(ctypes.c_void_p)]
+        lib.sd_journal_get_realtime_usec.argtypes = [j, ctypes.POINTER(ctypes.c_uint64)]
+        lib.sd_journal_get_data.argtypes = [j, ctypes.c_char_p, ctypes.POINTER(ctypes.c_void_p),
+                                            ctypes.POINTER(ctypes.c_size_t)]
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6')
+        libc.free.argtypes = [ctypes.c_void_p]
+        libc.free.restype = None
+        _libsystemd, _libc = lib, libc
+    return _libsystemd
+
+
+def _check(result: int, call: str) -> int:
+    if result < 0:
+        raise JournalError(-result, f"{call}: {os.strerror(-result)}")
+    return result
+
+
+def format_entry(entry: JournalEntry) -> str:
+    """Format an entry like `journalctl -o short`"""
+    stamp = time.strftime('%b %d %H:%M:%S', time.localtime(entry.timestamp))
+    source = entry.identifier or 'unknown'
+    if entry.pid:
+        source += f"[{entry.pid}]"
+    return f"{stamp} {entry.hostname} {source}: {entry.message}"
+
+
+class JournalReader:
+    """sd-journal handle filtered to one systemd unit (thread-safe)"""
+
+    def __init__(self, unit: str, directory: str = None, files: list = None):
+        """
+        Args:
+            unit: Unit name, e.g. "scratch-albilab.service"
+            directory: Read journal files from this directory instead of the system journal
+            files: Read exactly these journal files (e.g. generated locally for testing)
+
+        Raises:
+            JournalError: If libsystemd is missing or the journal cannot be opened
+        """
+        self.unit = unit
+        self._lib = _load_libraries()
+        self._lock = threading.Lock()
+        self._j = ctypes.c_void_p()
+        if files:
+            paths = (ctypes.c_char_p * (len(files) + 1))(*[os.fsencode(f) for f in files], None)
+            _check(self._lib.sd_journal_open_files(ctypes.byref(self._j), paths, 0), 'sd_journal_open_files')
+        elif directory:
+            _check(self._lib.sd_journal_open_directory(ctypes.byref(self._j), os.fsencode(directory), 0),
+                   'sd_journal_open_directory')
+        else:
+            _check(self._lib.sd_journal_open(ctypes.byref(self._j), SD_JOURNAL_LOCAL_ONLY), 'sd_journal_open')
+        # Same selection as `journalctl -u`: the unit's own output, or systemd's messages about it
+        self._add_match(f"_SYSTEMD_UNIT={unit}")
+        _check(self._lib.sd_journal_add_disjunction(self._j), 'sd_journal_add_disjunction')
+        self._add_match(f"UNIT={unit}")
+        self._add_match("_PID=1")
+
+    def _add_match(self, match: str):
+        data = match.encode('utf-8')
+        _check(self._lib.sd_journal_add_match(self._j, data, len(data)), 'sd_journal_add_match')
+
+    def close(self):
+        with self._lock:
+            if self._j:
+                self._lib.sd_journal_close(self._j)
+                self._j = ctypes.c_void_p()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def _field(self, name: bytes) -> str:
+        data = ctypes.c_void_p()
+        length = ctypes.c_size_t()
+        if self._lib.sd_journal_get_data(self._j, name, ctypes.byref(data), ctypes.byref(length)) < 0:
+            return ''
+        # Data is "FIELD=value"
+        raw = ctypes.string_at(data, length.value)
+        return raw[len(name) + 1:].decode('utf-8', 'replace')
+
+    def _entry(self) -> JournalEntry:
+        usec = ctypes.c_uint64()
+        self._lib.sd_journal_get_realtime_usec(self._j, ctypes.byref(usec))
+        return JournalEntry(
+            usec.value / 1000000,
+            self._field(b'_HOSTNAME'),
+            self._field(b'SYSLOG_IDENTIFIER') or self._field(b'_COMM'),
+            self._field(b'_PID'),
+            self._field(b'MESSAGE'))
+
+    def _cursor(self) -> str:
+        raw = ctypes.c_void_p()
+        _check(self._lib.sd_journal_get_cursor(self._j, ctypes.byref(raw)), 'sd_journal_get_cursor')
+        try:
+            return ctypes.string_at(raw).decode('ascii')
+        finally:
+            _libc.free(raw)
+
+    def read(self, cursor: str = None, limit: int = 20) -> tuple:
+        """
+        Read the newest entries of the unit
+
+        Args:
+            cursor: Cursor returned by a previous read - only newer entries are returned
+            limit: Maximum number of entries (the newest ones are kept); None returns every
+                   entry after the cursor
+
+        Returns:
+            Tuple of (list of JournalEntry, cursor for the next read)
+            The cursor is unchanged if there are no new entries.
+
+        Raises:
+            ValueError: limit is None without a cursor
+        """
+        if limit is None and not cursor:
+            raise ValueError("A limit is required when reading without a cursor")
+        with self._lock:
+            # Pick up journal files that were rotated or created since the last read
+            self._lib.sd_journal_process(self._j)
+            entries = collections.deque(maxlen=limit)
+            if cursor:
+                _check(self._lib.sd_journal_seek_cursor(self._j, cursor.encode('ascii')), 'sd_journal_seek_cursor')
+                if _check(self._lib.sd_journal_next(self._j), 'sd_journal_next') == 0:
+                    return ([], cursor)
+                # Seeking lands on the cursor entry itself unless it was vacuumed away
+                if self._lib.sd_journal_test_cursor(self._j, cursor.encode('ascii')) <= 0:
+                    entries.append(self._entry())
+            else:
+                _check(self._lib.sd_journal_seek_tail(self._j), 'sd_journal_seek_tail')
+                if _check(self._lib.sd_journal_previous_skip(self._j, limit), 'sd_journal_previous_skip') == 0:
+                    return ([], cursor)
+                entries.append(self._entry())
+            while _check(self._lib.sd_journal_next(self._j), 'sd_journal_next') > 0:
+                entries.append(self._entry())
+            if entries or not cursor:
+                # After the loop the read position is still on the last entry
+                cursor = self._cursor()
+            return (list(entries), cursor)
+
+
+def journalctl_unit_log(unit: str, cursor: str = None, limit: int = 20) -> tuple:
+    """
+    Same as JournalReader.read() but through the journalctl binary
+
+    Returns:
+        Tuple of (formatted lines list, cursor for the next read)
+    """
+    args = ['journalctl', '-u', unit, '--no-pager', '--show-cursor', '-q']
+    if limit is not None:
+        args[3:3] = ['-n', str(limit)]
+    if cursor:
+        args.append(f'--after-cursor={cursor}')
+    result = commands.run(args, capture_output=True, text=True, timeout=5)
+    if result.returncode != 0:
+        raise JournalError(f"journalctl failed: {result.stderr.strip()}")
+    lines = []
+    for line in result.stdout.splitlines():
+        if line.startswith('-- cursor: '):
+            cursor = line[len('-- cursor: '):]
+        elif line:
+            lines.append(line)
+    return (lines, cursor)
+
+
+_readers = {}
+_readers_lock = threading.Lock()
+
+
+def read_unit_log(unit: str, cursor: str = None, limit: int = 20) -> tuple:
+    """
+    Newest log lines of a unit, in-process if libsystemd is usable, else via journalctl
+
+    Args:
+        unit: systemd unit name
+        cursor: Cursor from the previous call for this client (None for the last `limit` lines)
+        limit: Maximum number of lines (None: every line after the cursor)
+
+    Returns:
+        Tuple of (formatted lines list, cursor for the next read)
+    """
+    with _readers_lock:
+        reader = _readers.get(unit)
+        if reader is None and unit not in _readers:
+            try:
+                reader = JournalReader(unit)
+            except JournalError as e:
+                logger.warning(f"Journal not readable in-process, using journalctl: {e}")
+            _readers[unit] = reader
+    if reader is not None:
+        try:
+            entries, cursor = reader.read(cursor, limit)
+            return ([format_entry(entry) for entry in entries], cursor)
+        except JournalError as e:
+            logger.warning(f"Reading journal of {unit} failed, using journalctl: {e}")
+    return journalctl_unit_log(unit, cursor, limit)
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Framing and flow control for the BLE log stream characteristic
+
+New log lines are queued and cut into notification-sized chunks:
+
+    offset  size  field
+    0       2     sequence number (little endian, wraps at 65536)
+    2       ...   UTF-8 log text; lines end with '\\n' and may span chunks
+
+A gap in sequence numbers means notifications were lost over the air. When lines
+arrive faster than the link drains them, the oldest queued lines are dropped and
+replaced by a single "[log stream: N lines dropped]" line.
+"""
+
+import collections
+import struct
+import threading
+
+SEQUENCE = struct.Struct('<H')
+
+# ATT Handle Value Notification carries at most MTU - 3 bytes
+NOTIFICATION_OVERHEAD = 3
+DEFAULT_ATT_MTU = 23
+MAX_PENDING_BYTES = 4096
+
+
+def notification_payload_size(mtu) -> int:
+    """Bytes of one notification for the negotiated MTU"""
+    try:
+        mtu = int(mtu)
+    except (TypeError, ValueError):
+        mtu = DEFAULT_ATT_MTU
+    return max(SEQUENCE.size + 1, min(mtu, 512) - NOTIFICATION_OVERHEAD)
+
+
+class LogStream:
+    """Bounded queue of log lines, emitted as sequence-numbered chunks (thread-safe)"""
+
+    def __init__(self, max_pending: int = MAX_PENDING_BYTES):
+        """
+        Args:
+            max_pending: Queued bytes beyond which the oldest lines are dropped
+        """
+        self.max_pending = max_pending
+        self.sequence = 0
+        self.dropped_lines = 0
+        self._lines = collections.deque()
+        self._pending = 0
+        self._partial = b''
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        with self._lock:
+            return self._pending + len(self._partial)
+
+    def clear(self):
+        with self._lock:
+            self._lines.clear()
+            self._pending = 0
+            self._partial = b''
+            self.dropped_lines = 0
+
+    def push(self, text: str, source: str = None):
+        """
+        Queue complete lines of text
+
+        Args:
+            text: One or more lines
+            source: Optional prefix, e.g. the log file name
+        """
+        prefix = f"[{source}] " if source else ''
+        with self._lock:
+            for line in text.splitlines():
+                data = (prefix + line + '\n').encode('utf-8')
+                self._lines.append(data)
+                self._pending += len(data)
+            while self._pending > self.max_pending and self._lines:
+                self._pending -= len(self._lines.popleft())
+                self.dropped_lines += 1
+
+    def note_dropped(self, count: int):
+        """Account for lines skipped before they were queued (e.g. by the source reader)"""
+        with self._lock:
+            self.dropped_lines += count
+
+    def next_chunk(self, payload_size: int):
+        """
+        Next notification payload
+
+        Args:
+            payload_size: Total notification size including the sequence header
+
+        Returns:
+            Bytes, or None if nothing is queued
+        """
+        budget = payload_size - SEQUENCE.size
+        with self._lock:
+            data = self._partial
+            if self.dropped_lines and not data:
+                data = f"[log stream: {self.dropped_lines} lines dropped]\n".encode('utf-8')
+                self.dropped_lines = 0
+            while len(data) < budget and self._lines:
+                line = self._lines.popleft()
+                self._pending -= len(line)
+                data += line
+            if not data:
+                return None
+            self._partial = data[budget:]
+            chunk = SEQUENCE.pack(self.sequence) + data[:budget]
+            self.sequence = (self.sequence + 1) & 0xFFFF
+            return chunk
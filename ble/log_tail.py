@@ -0,0 +1,306 @@
+#!/usr/bin/env python3
+"""
+Bounded-memory tail of growing log files for the BLE server
+Finds the last N lines by seeking backwards from the end of the file and keeps a
+small index of line offsets up to date via inotify, so reading the tail costs
+O(N lines) no matter how large the log has grown. Handles logrotate (rename or
+copytruncate) and files that do not exist yet.
+"""
+
+import collections
+import ctypes
+import ctypes.util
+import errno
+import logging
+import os
+import select
+import struct
+import threading
+
+logger = logging.getLogger('ble.logs')
+
+BLOCK_SIZE = 8192
+
+# inotify(7) constants
+IN_MODIFY = 0x00000002
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = os.O_CLOEXEC
+
+_INOTIFY_EVENT = struct.Struct('iIII')
+_WATCH_MASK = IN_MODIFY | IN_CREATE | IN_DELETE | IN_MOVED_FROM | IN_MOVED_TO
+
+_libc = None
+
+
+def _get_libc():
+    global _libc
+    if _libc is None:
+        _libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+    return _libc
+
+
+def tail_offset(f, lines: int, size: int, block_size: int = BLOCK_SIZE) -> int:
+    """
+    Offset where the last `lines` lines of a binary file start, reading backwards in blocks
+
+    A trailing newline does not count as an empty last line.
+
+    Args:
+        f: File opened in binary mode
+        lines: Number of lines wanted
+        size: Number of bytes of the file to consider
+    """
+    if lines <= 0 or size <= 0:
+        return size
+    end = size
+    f.seek(size - 1)
+    if f.read(1) == b'\n':
+        end -= 1
+    remaining = lines
+    pos = end
+    while pos > 0:
+        start = max(0, pos - block_size)
+        f.seek(start)
+        block = f.read(pos - start)
+        index = len(block)
+        while True:
+            index = block.rfind(b'\n', 0, index)
+            if index < 0:
+                break
+            remaining -= 1
+            if remaining == 0:
+                return start + index + 1
+        pos = start
+    return 0
+
+
+def tail_lines(path: str, lines: int = 50) -> str:
+    """One-shot tail: text of the last `lines` lines of a file without reading the rest"""
+    with open(path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        start = tail_offset(f, lines, size)
+        f.seek(start)
+        return f.read(size - start).decode('utf-8', 'replace')
+
+
+class LogTail:
+    """Last N lines of a log file, kept current from inotify events (thread-safe)"""
+
+    def __init__(self, path: str, lines: int = 50):
+        """
+        Args:
+            path: Log file (may not exist yet)
+            lines: Number of lines to keep indexed
+        """
+        self.path = path
+        self.lines = lines
+        self._file = None
+        self._inode = None
+        self._starts = collections.deque(maxlen=lines)
+        self._next_start = 0
+        self._size = 0
+        self._dirty = True
+        self._inotify_fd = None
+        self._watch_name = os.path.basename(path).encode()
+        self._lock = threading.RLock()
+        # Bumped whenever the file is replaced or truncated (follow positions become invalid)
+        self._generation = 0
+        self._follow_pos = None
+        self._follow_generation = 0
+        self._open_inotify()
+
+    def _open_inotify(self):
+        libc = _get_libc()
+        fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if fd < 0:
+            logger.debug(f'inotify not available for {self.path}, checking file on every read')
+            return
+        # Watch the directory so rotation (rename + create) is seen as well
+        directory = os.path.dirname(os.path.abspath(self.path))
+        if libc.inotify_add_watch(fd, directory.encode(), _WATCH_MASK) < 0:
+            logger.debug(f'Cannot watch {directory}: {os.strerror(ctypes.get_errno())}')
+            os.close(fd)
+            return
+        self._inotify_fd = fd
+
+    def fileno(self):
+        """inotify descriptor (for select/GLib watches), or None without inotify"""
+        return self._inotify_fd
+
+    def close(self):
+        with self._lock:
+            self._close()
+
+    def _close(self):
+        if self._file:
+            self._file.close()
+            self._file = None
+        if self._inotify_fd is not None:
+            os.close(self._inotify_fd)
+            self._inotify_fd = None
+
+    def _drain_events(self):
+        """Read pending inotify events; mark the index dirty if any concerns our file"""
+        if self._inotify_fd is None:
+            self._dirty = True
+            return
+        while True:
+            try:
+                data = os.read(self._inotify_fd, 4096)
+            except BlockingIOError:
+                return
+            except OSError as e:
+                if e.errno == errno.EINTR:
+                    continue
+                raise
+            offset = 0
+            while offset + _INOTIFY_EVENT.size <= len(data):
+                _wd, mask, _cookie, name_len = _INOTIFY_EVENT.unpack_from(data, offset)
+                name = data[offset + _INOTIFY_EVENT.size:offset + _INOTIFY_EVENT.size + name_len].rstrip(b'\0')
+                offset += _INOTIFY_EVENT.size + name_len
+                if mask & IN_Q_OVERFLOW or name == self._watch_name:
+                    self._dirty = True
+
+    def _reset(self):
+        if self._file:
+            self._file.close()
+        self._file = None
+        self._inode = None
+        self._starts.clear()
+        self._next_start = 0
+        self._size = 0
+        self._generation += 1
+
+    def _index(self, start: int, end: int):
+        """Record line starts for bytes [start, end) of the current file"""
+        self._file.seek(start)
+        base = start
+        while base < end:
+            chunk = self._file.read(min(BLOCK_SIZE, end - base))
+            if not chunk:
+                break
+            pos = 0
+            while pos < len(chunk):
+                if self._next_start is not None:
+                    self._starts.append(self._next_start)
+                    self._next_start = None
+                newline = chunk.find(b'\n', pos)
+                if newline < 0:
+                    break
+                self._next_start = base + newline + 1
+                pos = newline + 1
+            base += len(chunk)
+        self._size = base
+
+    def _rebuild(self, size: int):
+        """Index the last N lines from scratch by seeking backwards from size"""
+        start = tail_offset(self._file, self.lines, size)
+        self._generation += 1
+        self._starts.clear()
+        self._next_start = start
+        self._index(start, size)
+
+    def _update(self):
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            self._reset()
+            return
+        if self._file is None or st.st_ino != self._inode:
+            # First read or rotated by rename: index the tail of the new file
+            self._reset()
+            self._file = open(self.path, 'rb')
+            self._inode = os.fstat(self._file.fileno()).st_ino
+            self._rebuild(os.fstat(self._file.fileno()).st_size)
+            return
+        size = os.fstat(self._file.fileno()).st_size
+        if size < self._size:
+            # Truncated in place (copytruncate) - index what is there now
+            self._rebuild(size)
+        elif size > self._size:
+            self._index(self._size, size)
+
+    def refresh(self):
+        """Bring the index up to date if inotify reported changes"""
+        with self._lock:
+            self._drain_events()
+            if self._dirty:
+                self._dirty = self._inotify_fd is None
+                self._update()
+
+    def wait(self, timeout: float) -> bool:
+        """
+        Block until the file changes or timeout expires
+
+        Returns:
+            True if an inotify event arrived (always True without inotify)
+        """
+        if self._inotify_fd is None:
+            return True
+        readable, _, _ = select.select([self._inotify_fd], [], [], timeout)
+        return bool(readable)
+
+    def exists(self) -> bool:
+        self.refresh()
+        return self._file is not None
+
+    def text(self) -> str:
+        """
+        Text of the last N lines
+
+        Raises:
+            FileNotFoundError: If the log file does not exist
+        """
+        with self._lock:
+            self.refresh()
+            if self._file is None:
+                raise FileNotFoundError(errno.ENOENT, os.strerror(errno.ENOENT), self.path)
+            start = self._starts[0] if self._starts else self._size
+            self._file.seek(start)
+            return self._file.read(self._size - start).decode('utf-8', 'replace')
+
+    def read_new(self, max_bytes: int = 4096) -> tuple:
+        """
+        Complete lines appended since the previous call (the first call only marks the position)
+
+        After rotation or truncation the new file is followed from its beginning.
+
+        Args:
+            max_bytes: Upper bound of text returned; older lines beyond it are skipped
+
+        Returns:
+            Tuple of (text, number of skipped bytes)
+        """
+        with self._lock:
+            self.refresh()
+            if self._file is None:
+                return ('', 0)
+            if self._follow_pos is None:
+                self._follow_pos = self._size
+                self._follow_generation = self._generation
+                return ('', 0)
+            if self._follow_generation != self._generation:
+                self._follow_pos = 0
+                self._follow_generation = self._generation
+            start = self._follow_pos
+            skipped = 0
+            if self._size - start > max_bytes:
+                skipped = self._size - max_bytes - start
+                start = self._size - max_bytes
+            self._file.seek(start)
+            data = self._file.read(self._size - start)
+            if skipped:
+                # Resume at the next line boundary
+                cut = data.find(b'\n') + 1
+                skipped += cut
+                start += cut
+                data = data[cut:]
+            # Hold back a trailing partial line until it is complete
+            complete = data.rfind(b'\n') + 1
+            self._follow_pos = start + complete
+            return (data[:complete].decode('utf-8', 'replace'), skipped)
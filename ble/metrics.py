@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+"""
+Latency histograms and counters for the BLE server
+Metrics are kept in memory, written periodically in Prometheus text format for
+node_exporter's textfile collector, and summarized for the diagnostics characteristic.
+"""
+
+import functools
+import json
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger('ble.metrics')
+
+# Histogram bucket upper bounds in seconds (GATT handlers up to slow WiFi/podman commands)
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+TEXTFILE_PATH = os.environ.get('BLE_METRICS_TEXTFILE', '/var/lib/prometheus/node-exporter/ble_wifi.prom')
+EXPORT_INTERVAL = 60
+
+_HELP = {
+    'ble_gatt_request_duration_seconds': 'Time from a GATT D-Bus call to its reply',
+    'ble_gatt_request_errors_total': 'GATT D-Bus calls answered with an error',
+    'ble_operation_duration_seconds': 'Duration of internal operations (scans, status checks)',
+    'ble_command_duration_seconds': 'Duration of external commands',
+    'ble_command_failures_total': 'External commands that failed or exited non-zero',
+    'ble_provisioning_state_duration_seconds': 'Time spent in each WiFi provisioning state',
+}
+
+# Metric names in the diagnostics summary (it has to fit a few BLE reads)
+_SUMMARY_NAMES = {
+    'ble_gatt_request_duration_seconds': 'gatt',
+    'ble_gatt_request_errors_total': 'err',
+    'ble_operation_duration_seconds': 'op',
+    'ble_command_duration_seconds': 'cmd',
+    'ble_command_failures_total': 'cmdfail',
+    'ble_provisioning_state_duration_seconds': 'prov',
+}
+SUMMARY_MAX_BYTES = 512
+
+
+class Histogram:
+    """Cumulative-bucket latency histogram"""
+
+    __slots__ = ('counts', 'count', 'sum', 'max')
+
+    def __init__(self):
+        self.counts = [0] * len(BUCKETS)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds: float):
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                self.counts[i] += 1
+                break
+        self.count += 1
+        self.sum += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def quantile(self, q: float) -> float:
+        """Upper bucket bound containing quantile q (max if beyond the last bucket)"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(BUCKETS, self.counts):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _label_text(labels: tuple) -> str:
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in labels) + '}'
+
+
+class Registry:
+    """Thread-safe collection of histograms and counters keyed by name and labels"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms = {}
+        self._counters = {}
+        self.started = time.time()
+
+    def observe(self, name: str, seconds: float, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram()
+            histogram.observe(seconds)
+
+    def inc(self, name: str, value: float = 1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def timer(self, name: str, **labels):
+        """Context manager observing the duration of its block"""
+        return _Timer(self, name, labels)
+
+    def timed(self, name: str = 'ble_operation_duration_seconds', **labels):
+        """Decorator observing each call of a function (operation label = function name)"""
+        def decorator(func):
+            operation = labels or {'operation': func.__name__}
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.timer(name, **operation):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def render_prometheus(self) -> str:
+        """All metrics in the Prometheus text exposition format"""
+        with self._lock:
+            histograms = sorted(self._histograms.items())
+            counters = sorted(self._counters.items())
+            snapshots = [(key, list(h.counts), h.count, h.sum) for key, h in histograms]
+        lines = []
+        typed = set()
+        for (name, labels), counts, count, total in snapshots:
+            if name not in typed:
+                typed.add(name)
+                lines.append(f'# HELP {name} {_HELP.get(name, name)}')
+                lines.append(f'# TYPE {name} histogram')
+            cumulative = 0
+            for bound, bucket_count in zip(BUCKETS, counts):
+                cumulative += bucket_count
+                lines.append(f'{name}_bucket{_label_text(labels + (("le", repr(bound)),))} {cumulative}')
+            lines.append(f'{name}_bucket{_label_text(labels + (("le", "+Inf"),))} {count}')
+            lines.append(f'{name}_sum{_label_text(labels)} {total:.6f}')
+            lines.append(f'{name}_count{_label_text(labels)} {count}')
+        for (name, labels), value in counters:
+            if name not in typed:
+                typed.add(name)
+                lines.append(f'# HELP {name} {_HELP.get(name, name)}')
+                lines.append(f'# TYPE {name} counter')
+            lines.append(f'{name}{_label_text(labels)} {value:g}')
+        lines.append('# TYPE ble_process_start_time_seconds gauge')
+        lines.append(f'ble_process_start_time_seconds {self.started:.0f}')
+        return '\n'.join(lines) + '\n'
+
+    def write_textfile(self, path: str = TEXTFILE_PATH):
+        """Atomically replace the node_exporter textfile (rename, so it is never read half-written)"""
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(self.render_prometheus())
+        os.replace(tmp_path, path)
+
+    def summary(self, label_aliases: dict = None, max_bytes: int = SUMMARY_MAX_BYTES) -> dict:
+        """
+        Compact summary for the diagnostics characteristic
+
+        Entries are keyed by a short metric alias and the label values. If the JSON would
+        exceed max_bytes, the least used entries are left out and counted in "more".
+
+        Args:
+            label_aliases: Replacements for label values, e.g. characteristic UUID -> short name
+            max_bytes: Size limit of the JSON-encoded summary (None: no limit)
+
+        Returns:
+            {"up": uptime_s, "h": {"alias label": [count, avg_ms, p95_ms, max_ms]}, "c": {...}, "more": n}
+        """
+        label_aliases = label_aliases or {}
+
+        def key_text(name, labels):
+            values = [str(label_aliases.get(v, v)) for _, v in labels if v != '']
+            return ' '.join([_SUMMARY_NAMES.get(name, name)] + values)
+
+        with self._lock:
+            histograms = [
+                (h.count, 'h', key_text(*key),
+                 [h.count, round(h.sum / h.count * 1000, 1) if h.count else 0,
+                  round(h.quantile(0.95) * 1000, 1), round(h.max * 1000, 1)])
+                for key, h in self._histograms.items()]
+            counters = [(value, 'c', key_text(*key), value) for key, value in self._counters.items()]
+        result = {'up': int(time.time() - self.started), 'h': {}, 'c': {}}
+        entries = sorted(counters, key=lambda entry: entry[0], reverse=True) + \
+            sorted(histograms, key=lambda entry: entry[0], reverse=True)
+        size = len(json.dumps(result, separators=(',', ':'))) + len(',"more":999')
+        for index, (_, kind, key, value) in enumerate(entries):
+            entry_size = len(json.dumps({key: value}, separators=(',', ':'))) - 1
+            if max_bytes is not None and size + entry_size > max_bytes:
+                result['more'] = len(entries) - index
+                break
+            result[kind][key] = value
+            size += entry_size
+        return result
+
+
+class _Timer:
+    __slots__ = ('registry', 'name', 'labels', 'started')
+
+    def __init__(self, registry, name, labels):
+        self.registry = registry
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.monotonic()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.registry.observe(self.name, time.monotonic() - self.started, **self.labels)
+        return False
+
+
+REGISTRY = Registry()
+observe = REGISTRY.observe
+inc = REGISTRY.inc
+timer = REGISTRY.timer
+timed = REGISTRY.timed
+summary = REGISTRY.summary
+
+
+def start_textfile_exporter(path: str = TEXTFILE_PATH, interval: float = EXPORT_INTERVAL, registry: Registry = REGISTRY):
+    """
+    Write the textfile every interval seconds from a daemon thread
+
+    Returns:
+        The thread, or None if the textfile directory does not exist (node_exporter not installed)
+    """
+    if not os.path.isdir(os.path.dirname(path)):
+        logger.info('Metrics textfile directory %s not found, export disabled', os.path.dirname(path))
+        return None
+
+    def export_loop():
+        while True:
+            time.sleep(interval)
+            try:
+                registry.write_textfile(path)
+            except OSError as e:
+                logger.warning('Writing metrics textfile %s failed: %s', path, e)
+
+    thread = threading.Thread(target=export_loop, name='metrics-exporter', daemon=True)
+    thread.start()
+    return thread
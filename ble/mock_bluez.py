@@ -0,0 +1,340 @@
+#!/usr/bin/env python3
+"""
+Stand-in org.bluez service for running the BLE server without Bluetooth hardware
+Exports one adapter (/org/bluez/hci0) with Adapter1, GattManager1 and LEAdvertisingManager1
+on a session or private bus. Registered applications are read back with GetManagedObjects
+and advertisements with GetAll, as bluetoothd does, and are listed through
+org.bluez.Mock1.GetApplications for the load generator (gatt_load.py).
+
+Usage:
+    eval $(dbus-launch --sh-syntax)              # private session bus for this shell
+    python3 mock_bluez.py &
+    BLE_DBUS_BUS=session python3 ble_wifi_server.py &
+    python3 gatt_load.py --duration 30
+"""
+
+import argparse
+import logging
+import sys
+import time
+
+import dbus
+import dbus.bus
+import dbus.exceptions
+import dbus.mainloop.glib
+import dbus.service
+from gi.repository import GLib
+
+logger = logging.getLogger('ble.mock_bluez')
+
+BLUEZ_SERVICE_NAME = 'org.bluez'
+ADAPTER_PATH = '/org/bluez/hci0'
+ADAPTER_IFACE = 'org.bluez.Adapter1'
+GATT_MANAGER_IFACE = 'org.bluez.GattManager1'
+LE_ADVERTISING_MANAGER_IFACE = 'org.bluez.LEAdvertisingManager1'
+LE_ADVERTISEMENT_IFACE = 'org.bluez.LEAdvertisement1'
+GATT_SERVICE_IFACE = 'org.bluez.GattService1'
+GATT_CHRC_IFACE = 'org.bluez.GattCharacteristic1'
+MOCK_IFACE = 'org.bluez.Mock1'
+DBUS_OM_IFACE = 'org.freedesktop.DBus.ObjectManager'
+DBUS_PROP_IFACE = 'org.freedesktop.DBus.Properties'
+
+MOCK_ADDRESS = '00:00:5E:00:53:01'
+SUPPORTED_ADVERTISEMENTS = 5
+
+
+class InvalidArgumentsException(dbus.exceptions.DBusException):
+    _dbus_error_name = 'org.bluez.Error.InvalidArguments'
+
+
+class AlreadyExistsException(dbus.exceptions.DBusException):
+    _dbus_error_name = 'org.bluez.Error.AlreadyExists'
+
+
+class DoesNotExistException(dbus.exceptions.DBusException):
+    _dbus_error_name = 'org.bluez.Error.DoesNotExist'
+
+
+class FailedException(dbus.exceptions.DBusException):
+    _dbus_error_name = 'org.bluez.Error.Failed'
+
+
+class NotReadyException(dbus.exceptions.DBusException):
+    _dbus_error_name = 'org.bluez.Error.NotReady'
+
+
+def open_bus(spec: str):
+    """
+    Connect to a bus by name ('system', 'session') or address (same values as BLE_DBUS_BUS)
+    """
+    if spec == 'system':
+        return dbus.SystemBus()
+    if spec == 'session':
+        return dbus.SessionBus()
+    return dbus.bus.BusConnection(spec)
+
+
+def validate_application(objects: dict) -> list:
+    """
+    Check a GATT application the way bluetoothd does before accepting it
+
+    Args:
+        objects: Result of the application's GetManagedObjects
+
+    Returns:
+        List of (uuid, flags) of the exported characteristics
+
+    Raises:
+        FailedException: No service, or a characteristic without UUID/Flags or with an unknown service
+    """
+    services = {path for path, interfaces in objects.items() if GATT_SERVICE_IFACE in interfaces}
+    if not services:
+        raise FailedException('No GATT service in application')
+    characteristics = []
+    for path, interfaces in sorted(objects.items()):
+        chrc = interfaces.get(GATT_CHRC_IFACE)
+        if chrc is None:
+            continue
+        if 'UUID' not in chrc or 'Flags' not in chrc:
+            raise FailedException(f'Characteristic {path} lacks UUID or Flags')
+        if chrc.get('Service') not in services:
+            raise FailedException(f'Characteristic {path} refers to unknown service {chrc.get("Service")}')
+        characteristics.append((str(chrc['UUID']), [str(flag) for flag in chrc['Flags']]))
+    return characteristics
+
+
+class MockAdapter(dbus.service.Object):
+    """hci0 with the adapter, GATT manager and advertising manager interfaces"""
+
+    def __init__(self, bus, powered: bool = True, power_delay: float = 0.0,
+                 reject_ads_when_off: bool = False):
+        """
+        Args:
+            bus: Bus the org.bluez name is owned on
+            powered: Initial Powered state
+            power_delay: Seconds between Set(Powered=True) and the adapter reporting it
+            reject_ads_when_off: Refuse RegisterAdvertisement while unpowered (older BlueZ)
+        """
+        self.bus = bus
+        self.power_delay = power_delay
+        self.reject_ads_when_off = reject_ads_when_off
+        self.properties = {
+            'Address': MOCK_ADDRESS,
+            'Name': 'mock-bluez',
+            'Alias': 'mock-bluez',
+            'Powered': dbus.Boolean(powered),
+            'Discoverable': dbus.Boolean(False),
+            'Pairable': dbus.Boolean(True),
+        }
+        # {(owner, path): [(uuid, flags), ...]}
+        self.applications = {}
+        # {(owner, path): LEAdvertisement1 properties}
+        self.advertisements = {}
+        self.started = time.monotonic()
+        self._owner_watches = {}
+        dbus.service.Object.__init__(self, bus, ADAPTER_PATH)
+
+    def get_interfaces(self) -> dict:
+        return {
+            ADAPTER_IFACE: dict(self.properties),
+            GATT_MANAGER_IFACE: {},
+            LE_ADVERTISING_MANAGER_IFACE: {
+                'ActiveInstances': dbus.Byte(len(self.advertisements)),
+                'SupportedInstances': dbus.Byte(SUPPORTED_ADVERTISEMENTS - len(self.advertisements)),
+                'SupportedIncludes': dbus.Array(['tx-power', 'local-name'], signature='s'),
+            },
+        }
+
+    def _since_start(self) -> str:
+        return f'{time.monotonic() - self.started:.3f}s'
+
+    def _watch_owner(self, owner: str):
+        """Drop an owner's registrations when it leaves the bus, like bluetoothd does"""
+        if owner in self._owner_watches:
+            return
+
+        def owner_changed(new_owner):
+            if new_owner:
+                return
+            self._owner_watches.pop(owner).cancel()
+            for registry in (self.applications, self.advertisements):
+                for key in [key for key in registry if key[0] == owner]:
+                    del registry[key]
+                    logger.info('Dropped %s %s (client left the bus)', key[1], owner)
+
+        self._owner_watches[owner] = self.bus.watch_name_owner(owner, owner_changed)
+
+    def _set_powered(self, powered: bool):
+        self.properties['Powered'] = dbus.Boolean(powered)
+        logger.info('Adapter powered %s (%s)', 'on' if powered else 'off', self._since_start())
+        self.PropertiesChanged(ADAPTER_IFACE, {'Powered': self.properties['Powered']}, [])
+        return False
+
+    @dbus.service.method(DBUS_PROP_IFACE, in_signature='ss', out_signature='v')
+    def Get(self, interface, name):
+        properties = self.get_interfaces().get(interface)
+        if properties is None or name not in properties:
+            raise InvalidArgumentsException(f'No property {interface}.{name}')
+        return properties[name]
+
+    @dbus.service.method(DBUS_PROP_IFACE, in_signature='s', out_signature='a{sv}')
+    def GetAll(self, interface):
+        if interface not in self.get_interfaces():
+            raise InvalidArgumentsException(f'No interface {interface}')
+        return self.get_interfaces()[interface]
+
+    @dbus.service.method(DBUS_PROP_IFACE, in_signature='ssv')
+    def Set(self, interface, name, value):
+        if interface != ADAPTER_IFACE or name not in ('Powered', 'Discoverable', 'Pairable', 'Alias'):
+            raise InvalidArgumentsException(f'Property {interface}.{name} is not writable')
+        if name == 'Powered':
+            if bool(value) == bool(self.properties['Powered']):
+                return
+            if value and self.power_delay > 0:
+                GLib.timeout_add(int(self.power_delay * 1000), self._set_powered, True)
+            else:
+                self._set_powered(bool(value))
+            return
+        self.properties[name] = value
+        self.PropertiesChanged(ADAPTER_IFACE, {name: value}, [])
+
+    @dbus.service.signal(DBUS_PROP_IFACE, signature='sa{sv}as')
+    def PropertiesChanged(self, interface, changed, invalidated):
+        pass
+
+    @dbus.service.method(GATT_MANAGER_IFACE, in_signature='oa{sv}', sender_keyword='sender',
+                         async_callbacks=('reply_handler', 'error_handler'))
+    def RegisterApplication(self, path, options, sender, reply_handler, error_handler):
+        key = (str(sender), str(path))
+        if key in self.applications:
+            error_handler(AlreadyExistsException('Application already registered'))
+            return
+        requested = time.monotonic()
+
+        def on_objects(objects):
+            try:
+                self.applications[key] = validate_application(objects)
+            except dbus.exceptions.DBusException as e:
+                logger.warning('Rejected application %s from %s: %s', path, sender, e)
+                error_handler(e)
+                return
+            self._watch_owner(key[0])
+            logger.info('Registered application %s from %s: %d characteristics, '
+                        'GetManagedObjects %.1f ms (%s)', path, sender, len(self.applications[key]),
+                        (time.monotonic() - requested) * 1000, self._since_start())
+            reply_handler()
+
+        def on_error(e):
+            logger.warning('GetManagedObjects of %s from %s failed: %s', path, sender, e)
+            error_handler(FailedException(f'Failed to read application objects: {e}'))
+
+        app = self.bus.get_object(sender, path, introspect=False)
+        app.GetManagedObjects(dbus_interface=DBUS_OM_IFACE,
+                              reply_handler=on_objects, error_handler=on_error)
+
+    @dbus.service.method(GATT_MANAGER_IFACE, in_signature='o', sender_keyword='sender')
+    def UnregisterApplication(self, path, sender):
+        if self.applications.pop((str(sender), str(path)), None) is None:
+            raise DoesNotExistException('Application not registered')
+        logger.info('Unregistered application %s from %s', path, sender)
+
+    @dbus.service.method(LE_ADVERTISING_MANAGER_IFACE, in_signature='oa{sv}', sender_keyword='sender',
+                         async_callbacks=('reply_handler', 'error_handler'))
+    def RegisterAdvertisement(self, path, options, sender, reply_handler, error_handler):
+        key = (str(sender), str(path))
+        if key in self.advertisements:
+            error_handler(AlreadyExistsException('Advertisement already registered'))
+            return
+        if self.reject_ads_when_off and not self.properties['Powered']:
+            error_handler(NotReadyException('Adapter is not powered'))
+            return
+        if len(self.advertisements) >= SUPPORTED_ADVERTISEMENTS:
+            error_handler(FailedException('Maximum advertisements reached'))
+            return
+
+        def on_properties(properties):
+            if str(properties.get('Type', '')) not in ('peripheral', 'broadcast'):
+                error_handler(InvalidArgumentsException(f'Invalid advertisement type {properties.get("Type")!r}'))
+                return
+            self.advertisements[key] = properties
+            self._watch_owner(key[0])
+            logger.info('Registered advertisement %s from %s: %s %s (%s)', path, sender,
+                        properties.get('LocalName', ''), list(properties.get('ServiceUUIDs', [])),
+                        self._since_start())
+            reply_handler()
+
+        def on_error(e):
+            logger.warning('GetAll of advertisement %s from %s failed: %s', path, sender, e)
+            error_handler(FailedException(f'Failed to read advertisement properties: {e}'))
+
+        advertisement = self.bus.get_object(sender, path, introspect=False)
+        advertisement.GetAll(LE_ADVERTISEMENT_IFACE, dbus_interface=DBUS_PROP_IFACE,
+                             reply_handler=on_properties, error_handler=on_error)
+
+    @dbus.service.method(LE_ADVERTISING_MANAGER_IFACE, in_signature='o', sender_keyword='sender')
+    def UnregisterAdvertisement(self, path, sender):
+        if self.advertisements.pop((str(sender), str(path)), None) is None:
+            raise DoesNotExistException('Advertisement not registered')
+        logger.info('Unregistered advertisement %s from %s', path, sender)
+
+
+class MockRoot(dbus.service.Object):
+    """Object manager at / plus the Mock1 introspection interface for test tools"""
+
+    def __init__(self, bus, adapter: MockAdapter):
+        self.adapter = adapter
+        dbus.service.Object.__init__(self, bus, '/')
+
+    @dbus.service.method(DBUS_OM_IFACE, out_signature='a{oa{sa{sv}}}')
+    def GetManagedObjects(self):
+        return {
+            dbus.ObjectPath('/org/bluez'): {},
+            dbus.ObjectPath(ADAPTER_PATH): self.adapter.get_interfaces(),
+        }
+
+    @dbus.service.method(MOCK_IFACE, out_signature='a(so)')
+    def GetApplications(self):
+        """(bus name, object path) of each registered GATT application"""
+        return [(owner, dbus.ObjectPath(path)) for owner, path in self.adapter.applications]
+
+    @dbus.service.method(MOCK_IFACE, out_signature='a(so)')
+    def GetAdvertisements(self):
+        """(bus name, object path) of each registered advertisement"""
+        return [(owner, dbus.ObjectPath(path)) for owner, path in self.adapter.advertisements]
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--bus', default='session',
+                        help="'session' (default), 'system' or a bus address")
+    parser.add_argument('--powered-off', action='store_true',
+                        help='Start with the adapter powered off')
+    parser.add_argument('--power-delay', type=float, default=0.0,
+                        help='Seconds until a Powered=True request takes effect')
+    parser.add_argument('--reject-ads-when-off', action='store_true',
+                        help='Refuse advertisements while the adapter is off (older BlueZ)')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(name)s: %(message)s')
+    dbus.mainloop.glib.DBusGMainLoop(set_as_default=True)
+    bus = open_bus(args.bus)
+    try:
+        bus_name = dbus.service.BusName(BLUEZ_SERVICE_NAME, bus, do_not_queue=True)
+    except dbus.exceptions.NameExistsException:
+        logger.error('%s is already owned on this bus - is bluetoothd running on it?', BLUEZ_SERVICE_NAME)
+        return 1
+    adapter = MockAdapter(bus, powered=not args.powered_off, power_delay=args.power_delay,
+                          reject_ads_when_off=args.reject_ads_when_off)
+    MockRoot(bus, adapter)
+    logger.info('Mock %s ready on the %s bus (%s)', BLUEZ_SERVICE_NAME, args.bus, ADAPTER_PATH)
+
+    mainloop = GLib.MainLoop()
+    try:
+        mainloop.run()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,302 @@
+#!/usr/bin/env python3
+"""
+rtnetlink address monitor for Raspberry Pi
+Receives IPv4 address changes (RTM_NEWADDR/RTM_DELADDR) directly from the kernel,
+so callers wake up the moment DHCP assigns an address instead of polling `ip addr show`
+"""
+
+import errno
+import select
+import socket
+import struct
+import threading
+import time
+from collections import namedtuple
+
+# Netlink / rtnetlink constants (linux/netlink.h, linux/rtnetlink.h, linux/if_addr.h)
+NETLINK_ROUTE = 0
+NLMSG_ERROR = 2
+NLMSG_DONE = 3
+NLM_F_REQUEST = 0x1
+NLM_F_DUMP = 0x300
+RTM_NEWADDR = 20
+RTM_DELADDR = 21
+RTM_GETADDR = 22
+RTMGRP_IPV4_IFADDR = 0x10
+IFA_ADDRESS = 1
+IFA_LOCAL = 2
+IFA_LABEL = 3
+
+# How often waits with a cancel event re-check it (seconds)
+CANCEL_CHECK_INTERVAL = 0.25
+# Maximum time to wait for the kernel to answer an address dump (seconds)
+DUMP_TIMEOUT = 2.0
+
+_NLMSGHDR = struct.Struct('=LHHLL')
+_IFADDRMSG = struct.Struct('=BBBBI')
+_RTATTR = struct.Struct('=HH')
+
+AddressEvent = namedtuple('AddressEvent', ['kind', 'ifindex', 'label', 'address', 'prefixlen'])
+
+
+def _align(length: int) -> int:
+    return (length + 3) & ~3
+
+
+def parse_address_messages(data: bytes) -> list:
+    """
+    Parse a buffer received from a NETLINK_ROUTE socket
+
+    Args:
+        data: Raw datagram as returned by recv()
+
+    Returns:
+        List of AddressEvent for every IPv4 RTM_NEWADDR/RTM_DELADDR message.
+        A NLMSG_DONE message is reported as AddressEvent(kind='done', ...)
+    """
+    events = []
+    offset = 0
+    while offset + _NLMSGHDR.size <= len(data):
+        msg_len, msg_type, _flags, _seq, _pid = _NLMSGHDR.unpack_from(data, offset)
+        if msg_len < _NLMSGHDR.size:
+            break
+        payload_start = offset + _NLMSGHDR.size
+        payload_end = offset + msg_len
+
+        if msg_type == NLMSG_DONE:
+            events.append(AddressEvent('done', 0, '', '', 0))
+        elif msg_type in (RTM_NEWADDR, RTM_DELADDR) and payload_end - payload_start >= _IFADDRMSG.size:
+            family, prefixlen, _ifa_flags, _scope, ifindex = _IFADDRMSG.unpack_from(data, payload_start)
+            if family == socket.AF_INET:
+                local = None
+                address = None
+                label = ''
+                attr_offset = payload_start + _IFADDRMSG.size
+                while attr_offset + _RTATTR.size <= payload_end:
+                    attr_len, attr_type = _RTATTR.unpack_from(data, attr_offset)
+                    if attr_len < _RTATTR.size:
+                        break
+                    value = data[attr_offset + _RTATTR.size:attr_offset + attr_len]
+                    if attr_type == IFA_LOCAL:
+                        local = socket.inet_ntoa(value[:4])
+                    elif attr_type == IFA_ADDRESS:
+                        address = socket.inet_ntoa(value[:4])
+                    elif attr_type == IFA_LABEL:
+                        label = value.split(b'\0', 1)[0].decode('utf-8', 'replace')
+                    attr_offset += _align(attr_len)
+                kind = 'new' if msg_type == RTM_NEWADDR else 'del'
+                events.append(AddressEvent(kind, ifindex, label, local or address or '', prefixlen))
+
+        offset += _align(msg_len)
+    return events
+
+
+class AddressMonitor:
+    """Subscription to kernel IPv4 address notifications over rtnetlink"""
+
+    def __init__(self):
+        # Raises OSError if netlink sockets are unavailable (e.g. restricted container)
+        self.sock = socket.socket(socket.AF_NETLINK, socket.SOCK_RAW | socket.SOCK_CLOEXEC, NETLINK_ROUTE)
+        try:
+            self.sock.bind((0, RTMGRP_IPV4_IFADDR))
+        except OSError:
+            self.sock.close()
+            raise
+        self._seq = int(time.time()) & 0xFFFFFFFF
+
+    def close(self):
+        self.sock.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def fileno(self) -> int:
+        return self.sock.fileno()
+
+    def request_dump(self):
+        """Ask the kernel for all current IPv4 addresses (answered as RTM_NEWADDR messages)"""
+        self._seq = (self._seq + 1) & 0xFFFFFFFF
+        body = _IFADDRMSG.pack(socket.AF_INET, 0, 0, 0, 0)
+        header = _NLMSGHDR.pack(_NLMSGHDR.size + len(body), RTM_GETADDR,
+                                NLM_F_REQUEST | NLM_F_DUMP, self._seq, 0)
+        self.sock.send(header + body)
+
+    def read_events(self, timeout: float) -> list:
+        """
+        Wait up to timeout seconds for address messages
+
+        Returns:
+            List of AddressEvent (empty if nothing arrived in time)
+        """
+        readable, _, _ = select.select([self.sock], [], [], max(0.0, timeout))
+        if not readable:
+            return []
+        return parse_address_messages(self.sock.recv(65536))
+
+
+def _interface_name(event: AddressEvent) -> str:
+    # IFA_LABEL is the interface name, with a ":n" suffix for alias addresses
+    if event.label:
+        return event.label.split(':', 1)[0]
+    try:
+        return socket.if_indextoname(event.ifindex)
+    except OSError:
+        return ''
+
+
+class AddressTable:
+    """
+    IPv4 addresses of all interfaces, read with one rtnetlink dump
+
+    The table stays subscribed to address notifications and is dumped again only
+    after the kernel reported a change, so a lookup of an unchanged table costs
+    one select() call.
+    """
+
+    def __init__(self):
+        """
+        Raises:
+            OSError: If rtnetlink sockets are not available
+        """
+        self._monitor = AddressMonitor()
+        self._lock = threading.Lock()
+        self._addresses = None
+        self._stale = True
+
+    def close(self):
+        self._monitor.close()
+
+    def _drain_notifications(self) -> bool:
+        """Discard queued notifications; True if there were any"""
+        changed = False
+        while select.select([self._monitor.sock], [], [], 0)[0]:
+            try:
+                self._monitor.sock.recv(65536)
+            except OSError as e:
+                # ENOBUFS: notifications were lost because the queue overflowed
+                if e.errno != errno.ENOBUFS:
+                    raise
+            changed = True
+        return changed
+
+    def _dump(self) -> dict:
+        self._monitor.request_dump()
+        addresses = {}
+        done = False
+        deadline = time.monotonic() + DUMP_TIMEOUT
+        while not done:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise OSError(errno.ETIMEDOUT, "rtnetlink address dump timed out")
+            for event in self._monitor.read_events(remaining):
+                if done:
+                    # A change notification arrived in the same datagram as the end of the dump
+                    self._stale = True
+                elif event.kind == 'done':
+                    done = True
+                else:
+                    current = addresses.setdefault(_interface_name(event), [])
+                    if event.kind == 'new' and event.address not in current:
+                        current.append(event.address)
+                    elif event.kind == 'del' and event.address in current:
+                        current.remove(event.address)
+        return addresses
+
+    def addresses(self) -> dict:
+        """
+        Current IPv4 addresses
+
+        Returns:
+            Dict of interface name -> list of addresses (in kernel order)
+        """
+        with self._lock:
+            if self._drain_notifications() or self._stale:
+                self._stale = False
+                self._addresses = self._dump()
+            return {name: list(ips) for name, ips in self._addresses.items() if ips}
+
+
+_address_table = None
+_address_table_lock = threading.Lock()
+
+
+def interface_addresses() -> dict:
+    """
+    IPv4 addresses of all interfaces, cached until the kernel reports an address change
+
+    Returns:
+        Dict of interface name -> list of addresses
+
+    Raises:
+        OSError: If rtnetlink sockets are not available
+    """
+    global _address_table
+    with _address_table_lock:
+        if _address_table is None:
+            _address_table = AddressTable()
+    return _address_table.addresses()
+
+
+def _matches_interface(event: AddressEvent, interface: str, ifindex) -> bool:
+    if ifindex is not None and event.ifindex == ifindex:
+        return True
+    return event.label == interface or event.label.startswith(interface + ':')
+
+
+def wait_for_ipv4_address(interface: str = "wlan0", timeout: float = 60, cancel=None) -> str:
+    """
+    Block until an IPv4 address is present on the interface
+
+    Subscribes first and then dumps the current addresses, so an address
+    assigned between the two steps cannot be missed.
+
+    Args:
+        interface: Network interface name (default: wlan0)
+        timeout: Maximum time to wait in seconds
+        cancel: Optional threading.Event - the wait gives up when it is set
+
+    Returns:
+        IP address as string, or empty string on timeout or cancellation
+
+    Raises:
+        OSError: If rtnetlink sockets are not available
+    """
+    deadline = time.monotonic() + timeout
+    with AddressMonitor() as monitor:
+        monitor.request_dump()
+        current = {}
+        while True:
+            try:
+                ifindex = socket.if_nametoindex(interface)
+            except OSError:
+                # Interface may appear later (driver load, USB dongle)
+                ifindex = None
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or (cancel is not None and cancel.is_set()):
+                return ""
+            if cancel is not None:
+                remaining = min(remaining, CANCEL_CHECK_INTERVAL)
+
+            for event in monitor.read_events(remaining):
+                if event.kind == 'done' or not _matches_interface(event, interface, ifindex):
+                    continue
+                if event.kind == 'new':
+                    current[event.address] = event
+                else:
+                    current.pop(event.address, None)
+
+            for ip in current:
+                if ip and not ip.startswith('127.'):
+                    return ip
+
+
+if __name__ == "__main__":
+    import sys
+
+    iface = sys.argv[1] if len(sys.argv) > 1 else "wlan0"
+    print(f"Waiting for IPv4 address on {iface}...")
+    print(wait_for_ipv4_address(iface, timeout=60) or "timeout")
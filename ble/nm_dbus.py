@@ -0,0 +1,325 @@
+#!/usr/bin/env python3
+"""
+NetworkManager D-Bus client for Raspberry Pi
+Talks to org.freedesktop.NetworkManager directly over the system bus instead of
+spawning `sudo nmcli`, and reports activation the moment NetworkManager reaches ACTIVATED
+"""
+
+import threading
+import time
+
+import dbus
+import dbus.exceptions
+
+NM_BUS_NAME = 'org.freedesktop.NetworkManager'
+NM_PATH = '/org/freedesktop/NetworkManager'
+NM_IFACE = 'org.freedesktop.NetworkManager'
+NM_DEVICE_IFACE = 'org.freedesktop.NetworkManager.Device'
+NM_WIRELESS_IFACE = 'org.freedesktop.NetworkManager.Device.Wireless'
+NM_AP_IFACE = 'org.freedesktop.NetworkManager.AccessPoint'
+NM_ACTIVE_CONNECTION_IFACE = 'org.freedesktop.NetworkManager.Connection.Active'
+NM_SETTINGS_PATH = '/org/freedesktop/NetworkManager/Settings'
+NM_SETTINGS_IFACE = 'org.freedesktop.NetworkManager.Settings'
+NM_CONNECTION_IFACE = 'org.freedesktop.NetworkManager.Settings.Connection'
+DBUS_PROP_IFACE = 'org.freedesktop.DBus.Properties'
+
+# NMActiveConnectionState
+NM_ACTIVE_CONNECTION_STATE_UNKNOWN = 0
+NM_ACTIVE_CONNECTION_STATE_ACTIVATING = 1
+NM_ACTIVE_CONNECTION_STATE_ACTIVATED = 2
+NM_ACTIVE_CONNECTION_STATE_DEACTIVATING = 3
+NM_ACTIVE_CONNECTION_STATE_DEACTIVATED = 4
+
+# NMActiveConnectionStateReason values worth reporting to the user
+ACTIVE_CONNECTION_STATE_REASONS = {
+    2: 'user disconnected',
+    3: 'device disconnected',
+    5: 'IP configuration failed',
+    6: 'connect timeout',
+    7: 'service start timeout',
+    8: 'service start failed',
+    9: 'no secrets (wrong password?)',
+    10: 'login failed',
+    11: 'connection removed',
+    12: 'dependency failed',
+}
+
+# NM80211ApFlags / NM80211ApSecurityFlags
+NM_802_11_AP_FLAGS_PRIVACY = 0x1
+NM_802_11_AP_SEC_KEY_MGMT_PSK = 0x100
+NM_802_11_AP_SEC_KEY_MGMT_802_1X = 0x200
+NM_802_11_AP_SEC_KEY_MGMT_SAE = 0x400
+
+WIRELESS_CONNECTION_TYPE = '802-11-wireless'
+
+# Fallback poll interval when no main loop dispatches StateChanged signals (CLI usage)
+STATE_POLL_INTERVAL = 1.0
+
+
+class NetworkManagerError(Exception):
+    """Raised when NetworkManager rejects a request"""
+
+
+def ap_security_string(flags: int, wpa_flags: int, rsn_flags: int) -> str:
+    """
+    Describe access point security the same way `nmcli -f SECURITY` does
+
+    Returns:
+        e.g. "WPA2", "WPA1 WPA2", "WPA3", "WEP" or "" for open networks
+    """
+    parts = []
+    if (flags & NM_802_11_AP_FLAGS_PRIVACY) and not wpa_flags and not rsn_flags:
+        parts.append('WEP')
+    if wpa_flags:
+        parts.append('WPA1')
+    if rsn_flags & NM_802_11_AP_SEC_KEY_MGMT_SAE:
+        parts.append('WPA3')
+    if rsn_flags & ~NM_802_11_AP_SEC_KEY_MGMT_SAE:
+        parts.append('WPA2')
+    if (wpa_flags | rsn_flags) & NM_802_11_AP_SEC_KEY_MGMT_802_1X:
+        parts.append('802.1X')
+    return ' '.join(parts)
+
+
+class NetworkManagerClient:
+    """Thin synchronous client for the NetworkManager D-Bus API"""
+
+    def __init__(self, bus=None):
+        # dbus.SystemBus() returns the shared connection the BLE daemon already holds;
+        # tests pass a private bus with a dbusmock NetworkManager instead
+        self.bus = bus if bus is not None else dbus.SystemBus()
+
+    def _object(self, path):
+        return self.bus.get_object(NM_BUS_NAME, path)
+
+    def _get(self, path, iface, prop):
+        return dbus.Interface(self._object(path), DBUS_PROP_IFACE).Get(iface, prop)
+
+    def is_running(self) -> bool:
+        """True if NetworkManager owns its well-known name on the bus"""
+        return bool(self.bus.name_has_owner(NM_BUS_NAME))
+
+    def get_device_path(self, interface: str = "wlan0"):
+        """
+        Return the D-Bus object path of a network device
+
+        Raises:
+            NetworkManagerError: If NetworkManager does not manage the interface
+        """
+        nm = dbus.Interface(self._object(NM_PATH), NM_IFACE)
+        try:
+            return nm.GetDeviceByIpIface(interface)
+        except dbus.exceptions.DBusException as e:
+            raise NetworkManagerError(f"Device {interface} not managed by NetworkManager: {e}")
+
+    def request_scan(self, interface: str = "wlan0", timeout: float = 10) -> bool:
+        """
+        Trigger a scan and wait until NetworkManager reports fresh results
+
+        Returns:
+            True if a new scan completed within timeout, False if cached results are used
+        """
+        device = self.get_device_path(interface)
+        try:
+            last_scan = int(self._get(device, NM_WIRELESS_IFACE, 'LastScan'))
+        except dbus.exceptions.DBusException:
+            last_scan = None
+
+        wireless = dbus.Interface(self._object(device), NM_WIRELESS_IFACE)
+        try:
+            wireless.RequestScan(dbus.Dictionary({}, signature='sv'))
+        except dbus.exceptions.DBusException:
+            # NM refuses scans that are too frequent; cached results are recent then
+            return False
+        if last_scan is None:
+            return False
+
+        done = threading.Event()
+
+        def on_properties_changed(iface, changed, invalidated):
+            if iface == NM_WIRELESS_IFACE and 'LastScan' in changed:
+                done.set()
+
+        match = self.bus.add_signal_receiver(
+            on_properties_changed, 'PropertiesChanged', DBUS_PROP_IFACE, NM_BUS_NAME, device)
+        try:
+            deadline = time.monotonic() + timeout
+            while True:
+                if int(self._get(device, NM_WIRELESS_IFACE, 'LastScan')) != last_scan:
+                    return True
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                done.wait(min(remaining, 0.25))
+        finally:
+            match.remove()
+
+    def get_access_points(self, interface: str = "wlan0") -> list:
+        """
+        Read the access points currently known to NetworkManager
+
+        Returns:
+            List of dictionaries: {"ssid": str, "signal": int (0-100), "security": str}
+            One entry per BSSID, SSIDs may repeat
+        """
+        device = self.get_device_path(interface)
+        wireless = dbus.Interface(self._object(device), NM_WIRELESS_IFACE)
+        access_points = []
+        for ap_path in wireless.GetAllAccessPoints():
+            try:
+                props = dbus.Interface(self._object(ap_path), DBUS_PROP_IFACE).GetAll(NM_AP_IFACE)
+            except dbus.exceptions.DBusException:
+                # AP vanished between listing and reading
+                continue
+            ssid = bytes(props.get('Ssid', b'')).decode('utf-8', 'replace')
+            access_points.append({
+                'ssid': ssid,
+                'signal': int(props.get('Strength', 0)),
+                'security': ap_security_string(int(props.get('Flags', 0)),
+                                               int(props.get('WpaFlags', 0)),
+                                               int(props.get('RsnFlags', 0))),
+            })
+        return access_points
+
+    def find_access_point(self, bssid: str, interface: str = "wlan0"):
+        """
+        Returns:
+            Object path of the access point with this BSSID (aa:bb:cc:dd:ee:ff), or None
+        """
+        device = self.get_device_path(interface)
+        wireless = dbus.Interface(self._object(device), NM_WIRELESS_IFACE)
+        for ap_path in wireless.GetAllAccessPoints():
+            try:
+                if str(self._get(ap_path, NM_AP_IFACE, 'HwAddress')).lower() == bssid.lower():
+                    return ap_path
+            except dbus.exceptions.DBusException:
+                continue
+        return None
+
+    def list_connections(self) -> list:
+        """
+        Returns:
+            List of (path, id, type) tuples for all saved connection profiles
+        """
+        settings = dbus.Interface(self._object(NM_SETTINGS_PATH), NM_SETTINGS_IFACE)
+        connections = []
+        for path in settings.ListConnections():
+            try:
+                conn_settings = dbus.Interface(self._object(path), NM_CONNECTION_IFACE).GetSettings()
+            except dbus.exceptions.DBusException:
+                continue
+            conn = conn_settings.get('connection', {})
+            connections.append((path, str(conn.get('id', '')), str(conn.get('type', ''))))
+        return connections
+
+    def delete_connection(self, path):
+        dbus.Interface(self._object(path), NM_CONNECTION_IFACE).Delete()
+
+    def delete_wifi_connections(self, connection_id: str = None) -> list:
+        """
+        Delete saved WiFi connection profiles
+
+        Args:
+            connection_id: Only delete profiles with this id (default: all WiFi profiles)
+
+        Returns:
+            List of deleted connection ids
+        """
+        deleted = []
+        for path, conn_id, conn_type in self.list_connections():
+            if conn_type != WIRELESS_CONNECTION_TYPE:
+                continue
+            if connection_id is not None and conn_id != connection_id:
+                continue
+            self.delete_connection(path)
+            deleted.append(conn_id)
+        return deleted
+
+    def _active_state(self, active_path):
+        try:
+            return int(self._get(active_path, NM_ACTIVE_CONNECTION_IFACE, 'State'))
+        except dbus.exceptions.DBusException:
+            # The active connection object is removed once activation fails
+            return NM_ACTIVE_CONNECTION_STATE_DEACTIVATED
+
+    def wait_for_activation(self, active_path, timeout: float = 30, cancel=None) -> tuple[bool, str]:
+        """
+        Wait until an active connection reaches ACTIVATED or fails
+
+        Wakes on the StateChanged signal; the State property is also re-read
+        periodically so the call works without a running main loop.
+        If the optional threading.Event `cancel` is set, gives up with reason "cancelled".
+
+        Returns:
+            Tuple of (activated: bool, failure reason: str)
+        """
+        changed = threading.Event()
+        reason = {'code': 0}
+
+        def on_state_changed(state, state_reason):
+            reason['code'] = int(state_reason)
+            changed.set()
+
+        match = self.bus.add_signal_receiver(
+            on_state_changed, 'StateChanged', NM_ACTIVE_CONNECTION_IFACE, NM_BUS_NAME, active_path)
+        try:
+            deadline = time.monotonic() + timeout
+            while True:
+                changed.clear()
+                state = self._active_state(active_path)
+                if state == NM_ACTIVE_CONNECTION_STATE_ACTIVATED:
+                    return (True, "")
+                if state in (NM_ACTIVE_CONNECTION_STATE_DEACTIVATING, NM_ACTIVE_CONNECTION_STATE_DEACTIVATED):
+                    return (False, ACTIVE_CONNECTION_STATE_REASONS.get(reason['code'], 'activation failed'))
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return (False, 'timeout')
+                if cancel is not None and cancel.is_set():
+                    return (False, 'cancelled')
+                changed.wait(min(remaining, STATE_POLL_INTERVAL))
+        finally:
+            match.remove()
+
+    def connect(self, ssid: str, password: str, interface: str = "wlan0", timeout: float = 30,
+                cancel=None, bssid: str = None) -> tuple[bool, str]:
+        """
+        Create a WPA-PSK connection profile and activate it (AddAndActivateConnection)
+
+        Args:
+            ssid: WiFi network SSID
+            password: WiFi network password
+            interface: Network interface name (default: wlan0)
+            timeout: Maximum time to wait for ACTIVATED in seconds
+            cancel: Optional threading.Event that aborts the wait
+            bssid: Optional access point hint - activation starts on that AP if NetworkManager
+                   knows it, without locking the profile to it
+
+        Returns:
+            Tuple of (activated: bool, failure reason: str)
+        """
+        device = self.get_device_path(interface)
+        settings = dbus.Dictionary({
+            'connection': dbus.Dictionary({
+                'id': ssid,
+                'type': WIRELESS_CONNECTION_TYPE,
+                'interface-name': interface,
+            }, signature='sv'),
+            WIRELESS_CONNECTION_TYPE: dbus.Dictionary({
+                'ssid': dbus.ByteArray(ssid.encode('utf-8')),
+                'mode': 'infrastructure',
+            }, signature='sv'),
+            '802-11-wireless-security': dbus.Dictionary({
+                'key-mgmt': 'wpa-psk',
+                'psk': password,
+            }, signature='sv'),
+            'ipv4': dbus.Dictionary({'method': 'auto'}, signature='sv'),
+        }, signature='sa{sv}')
+
+        specific_object = (self.find_access_point(bssid, interface) if bssid else None) or '/'
+        nm = dbus.Interface(self._object(NM_PATH), NM_IFACE)
+        try:
+            _connection_path, active_path = nm.AddAndActivateConnection(
+                settings, device, dbus.ObjectPath(specific_object))
+        except dbus.exceptions.DBusException as e:
+            raise NetworkManagerError(f"AddAndActivateConnection failed: {e}")
+        return self.wait_for_activation(active_path, timeout, cancel)
@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+"""
+Podman REST API client for the BLE server
+Talks HTTP over the (rootless) podman.sock UNIX socket instead of spawning
+`su - pi -c 'podman ...'`, keeping a small pool of keep-alive connections
+"""
+
+import http.client
+import json
+import os
+import pwd
+import socket
+import struct
+import threading
+from urllib.parse import quote, urlencode
+
+import timeline
+
+PODMAN_API_PREFIX = "/v4.0.0/libpod"
+ROOT_SOCKET_PATH = "/run/podman/podman.sock"
+
+# Header of multiplexed log frames: stream type (1), padding (3), payload size (4, big endian)
+_LOG_FRAME_HEADER = struct.Struct('>BxxxL')
+
+
+class PodmanError(Exception):
+    """Raised when the podman API is unreachable or returns an error"""
+
+    def __init__(self, message, status=None):
+        super().__init__(message)
+        self.status = status
+
+
+def user_socket_path(user: str = None) -> str:
+    """
+    Path of the podman API socket for a user
+
+    Args:
+        user: User running rootless podman (None or 'root' for the system socket)
+    """
+    if not user or user == 'root':
+        return ROOT_SOCKET_PATH
+    uid = pwd.getpwnam(user).pw_uid
+    return f"/run/user/{uid}/podman/podman.sock"
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    """HTTPConnection over a UNIX stream socket"""
+
+    def __init__(self, socket_path: str, timeout: float = 5):
+        super().__init__('localhost', timeout=timeout)
+        self.socket_path = socket_path
+
+    def connect(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        try:
+            sock.connect(self.socket_path)
+        except OSError:
+            sock.close()
+            raise
+        self.sock = sock
+
+
+def demultiplex_logs(data: bytes) -> str:
+    """
+    Decode container logs, stripping stdout/stderr frame headers if present
+
+    Containers without a TTY return logs as frames of [stream, 0, 0, 0, size] + payload.
+    """
+    if len(data) < _LOG_FRAME_HEADER.size or data[0] not in (0, 1, 2) or data[1:4] != b'\0\0\0':
+        return data.decode('utf-8', 'replace')
+    chunks = []
+    offset = 0
+    while offset + _LOG_FRAME_HEADER.size <= len(data):
+        _stream, size = _LOG_FRAME_HEADER.unpack_from(data, offset)
+        offset += _LOG_FRAME_HEADER.size
+        chunks.append(data[offset:offset + size])
+        offset += size
+    return b''.join(chunks).decode('utf-8', 'replace')
+
+
+class PodmanClient:
+    """Pooled client for the libpod REST API"""
+
+    def __init__(self, socket_path: str, timeout: float = 5, pool_size: int = 2):
+        """
+        Args:
+            socket_path: podman.sock path (see user_socket_path())
+            timeout: Per-request socket timeout in seconds
+            pool_size: Number of idle keep-alive connections kept for reuse
+        """
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self._idle = []
+        self._lock = threading.Lock()
+
+    def available(self) -> bool:
+        """True if the API socket exists (podman.socket is enabled)"""
+        return os.path.exists(self.socket_path)
+
+    def _acquire(self):
+        with self._lock:
+            if self._idle:
+                return self._idle.pop()
+        return UnixHTTPConnection(self.socket_path, self.timeout)
+
+    def _release(self, conn):
+        with self._lock:
+            if len(self._idle) < self.pool_size:
+                self._idle.append(conn)
+                return
+        conn.close()
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.close()
+
+    def request(self, method: str, path: str, query: dict = None) -> tuple[int, bytes]:
+        """
+        Perform one API request
+
+        Returns:
+            Tuple of (HTTP status, response body)
+
+        Raises:
+            PodmanError: If the socket is unreachable
+        """
+        url = PODMAN_API_PREFIX + path
+        if query:
+            url += '?' + urlencode(query)
+        with timeline.span(f"podman {method} {path}", 'podman'):
+            return self._request(method, url, path)
+
+    def _request(self, method: str, url: str, path: str) -> tuple[int, bytes]:
+        # A pooled keep-alive connection may have been closed by the server - retry once on a new one
+        for attempt in range(2):
+            conn = self._acquire()
+            try:
+                conn.request(method, url)
+                response = conn.getresponse()
+                body = response.read()
+            except (OSError, http.client.HTTPException) as e:
+                conn.close()
+                if attempt == 0:
+                    continue
+                raise PodmanError(f"Podman API {method} {path} failed: {e}")
+            if response.will_close:
+                conn.close()
+            else:
+                self._release(conn)
+            return (response.status, body)
+
+    def _json(self, method: str, path: str, query: dict = None, allow_missing: bool = False):
+        status, body = self.request(method, path, query)
+        if status == 404 and allow_missing:
+            return None
+        if status >= 400:
+            try:
+                message = json.loads(body).get('message', '')
+            except (ValueError, AttributeError):
+                message = body.decode('utf-8', 'replace')
+            raise PodmanError(f"Podman API {method} {path} returned {status}: {message}", status)
+        return json.loads(body) if body else None
+
+    def ping(self) -> bool:
+        try:
+            status, _ = self.request('GET', '/_ping')
+            return status == 200
+        except PodmanError:
+            return False
+
+    def list_containers(self, all: bool = False) -> list:
+        """Equivalent of `podman ps [-a]` - list of container dicts (Names, State, Status, ...)"""
+        return self._json('GET', '/containers/json', {'all': 'true' if all else 'false'}) or []
+
+    def inspect_container(self, name: str):
+        """Equivalent of `podman inspect` - container dict, or None if it does not exist"""
+        return self._json('GET', f'/containers/{quote(name)}/json', allow_missing=True)
+
+    def remove_container(self, name: str, force: bool = True) -> bool:
+        """Equivalent of `podman rm [-f]` - returns False if the container did not exist"""
+        status, body = self.request('DELETE', f'/containers/{quote(name)}', {'force': 'true' if force else 'false'})
+        if status == 404:
+            return False
+        if status >= 400:
+            raise PodmanError(f"Removing container {name} failed: {body.decode('utf-8', 'replace')}", status)
+        return True
+
+    def list_pods(self) -> list:
+        """Equivalent of `podman pod ls` - list of pod dicts (Id, Name, Status, ...)"""
+        return self._json('GET', '/pods/json') or []
+
+    def remove_pod(self, pod_id: str, force: bool = True) -> bool:
+        """Equivalent of `podman pod rm [-f]` - returns False if the pod did not exist"""
+        result = self._json('DELETE', f'/pods/{quote(pod_id)}', {'force': 'true' if force else 'false'},
+                            allow_missing=True)
+        return result is not None
+
+    def container_logs(self, name: str, tail: int = 50) -> str:
+        """Equivalent of `podman logs --tail N`"""
+        status, body = self.request('GET', f'/containers/{quote(name)}/logs',
+                                    {'stdout': 'true', 'stderr': 'true', 'tail': str(tail)})
+        if status >= 400:
+            raise PodmanError(f"Reading logs of {name} failed: {body.decode('utf-8', 'replace')}", status)
+        return demultiplex_logs(body)
+
+    def stream_events(self, filters: dict = None, timeout: float = None):
+        """
+        Follow `podman events`
+
+        The request is sent before this returns, so events that happen afterwards are
+        never missed. Uses its own connection (not the pool) because the response never completes.
+
+        Args:
+            filters: e.g. {"type": ["container"]}
+            timeout: Seconds to wait for the next event before the stream ends (None = wait forever)
+
+        Returns:
+            Iterator of event dicts; it ends when podman closes the stream or timeout expires
+
+        Raises:
+            PodmanError: If the stream cannot be opened or breaks
+        """
+        url = PODMAN_API_PREFIX + '/events?' + urlencode({'stream': 'true', 'filters': json.dumps(filters or {})})
+        conn = UnixHTTPConnection(self.socket_path, timeout)
+        try:
+            conn.request('GET', url)
+            response = conn.getresponse()
+        except (OSError, http.client.HTTPException) as e:
+            conn.close()
+            raise PodmanError(f"Opening podman event stream failed: {e}")
+        if response.status >= 400:
+            conn.close()
+            raise PodmanError(f"Podman events returned {response.status}", response.status)
+        return self._iter_events(conn, response)
+
+    @staticmethod
+    def _iter_events(conn, response):
+        try:
+            while True:
+                line = response.readline()
+                if not line:
+                    return
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    event = json.loads(line)
+                except ValueError:
+                    continue
+                yield event
+        except socket.timeout:
+            # Quiet period longer than the timeout - let the caller reopen and resync
+            return
+        except (OSError, http.client.HTTPException) as e:
+            raise PodmanError(f"Podman event stream failed: {e}")
+        finally:
+            conn.close()
+
+
+def container_names(containers: list) -> list:
+    """Flatten the Names lists of list_containers() results"""
+    names = []
+    for container in containers:
+        names.extend(container.get('Names') or [])
+    return names
+
+
+def parse_ps_names(output: str) -> list:
+    """Container names from `podman ps --format "{{.Names}}"` output (one per line)"""
+    # Container names cannot contain whitespace
+    return output.split()
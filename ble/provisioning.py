@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+"""
+WiFi provisioning state machine
+Takes the interface from link-up through configuration, association and address
+assignment. Each state waits on its real condition (sysfs link flag, NetworkManager
+activation, wpa_supplicant events, rtnetlink address notifications) within its own
+time budget, so a run never sleeps longer than needed and a run superseded by new
+credentials stops at the next check.
+"""
+
+import logging
+import os
+import threading
+import time
+
+import commands
+import metrics
+import timeline
+import wpa_ctrl
+from netlink_monitor import wait_for_ipv4_address
+from wifi_config import (
+    configure_wifi_with_networkmanager,
+    ensure_wifi_enabled,
+    get_ip_address,
+    print_wifi_diagnostics,
+    restart_wifi,
+    wait_for_interface_up,
+    write_wifi_config,
+)
+
+logger = logging.getLogger('ble.provisioning')
+
+LINK = 'link'
+CONFIGURE = 'configure'
+ASSOCIATE = 'associate'
+ADDRESS = 'address'
+DONE = 'done'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+
+# Time budget of each state in seconds
+STATE_TIMEOUTS = {
+    LINK: 10,
+    CONFIGURE: 40,
+    ASSOCIATE: 25,
+    ADDRESS: 40,
+}
+
+CTRL_SOCKET_POLL_INTERVAL = 0.1
+
+
+class Provisioner:
+    """One WiFi configuration attempt, run as link -> configure -> associate -> address"""
+
+    def __init__(self, ssid: str, password: str, interface: str = "wlan0",
+                 cancel: threading.Event = None, timeouts: dict = None, bssid: str = None):
+        """
+        Args:
+            ssid: WiFi network SSID
+            password: WiFi network password
+            interface: Network interface name (default: wlan0)
+            cancel: Event that aborts the run at the next condition check (e.g. new credentials)
+            timeouts: Per-state budgets overriding STATE_TIMEOUTS
+            bssid: Optional access point to try first (aa:bb:cc:dd:ee:ff)
+        """
+        self.ssid = ssid
+        self.password = password
+        self.bssid = bssid
+        self.interface = interface
+        self.cancel = cancel or threading.Event()
+        self.timeouts = dict(STATE_TIMEOUTS, **(timeouts or {}))
+        self.state = LINK
+        self.reason = ""
+        self.ip_address = ""
+        self.deadline = 0.0
+
+    def remaining(self) -> float:
+        """Seconds left in the current state's budget"""
+        return max(0.0, self.deadline - time.monotonic())
+
+    def run(self) -> tuple[bool, str]:
+        """
+        Run the state machine to completion
+
+        Returns:
+            Tuple of (success: bool, ip_address: str)
+        """
+        handlers = {
+            LINK: self._link,
+            CONFIGURE: self._configure,
+            ASSOCIATE: self._associate,
+            ADDRESS: self._address,
+        }
+        logger.info(f"Starting WiFi configuration for SSID: {self.ssid}")
+        while self.state in handlers:
+            if self.cancel.is_set():
+                self.state = CANCELLED
+                break
+            state = self.state
+            started = time.monotonic()
+            self.deadline = started + self.timeouts[state]
+            with timeline.span(f'state {state}', 'state'):
+                next_state = handlers[state]()
+            if next_state != DONE and self.cancel.is_set():
+                next_state = CANCELLED
+            elapsed = time.monotonic() - started
+            metrics.observe('ble_provisioning_state_duration_seconds', elapsed, state=state)
+            logger.info(f"Provisioning: {state} -> {next_state} ({elapsed:.1f}s)")
+            self.state = next_state
+
+        if self.state == DONE:
+            logger.info(f"WiFi configuration SUCCESSFUL! IP address: {self.ip_address}")
+            return (True, self.ip_address)
+        if self.state == CANCELLED:
+            logger.info("WiFi configuration cancelled")
+            return (False, "")
+        logger.error(f"WiFi configuration failed in state '{state}': {self.reason}")
+        print_wifi_diagnostics(self.interface)
+        return (False, "")
+
+    def _link(self) -> str:
+        """Unblock the radio and bring the interface UP"""
+        if not ensure_wifi_enabled():
+            logger.warning("Could not enable WiFi interface, waiting for it to come UP...")
+        if not wait_for_interface_up(self.interface, self.remaining(), self.cancel):
+            self.reason = f"interface {self.interface} is not UP"
+            return FAILED
+        return CONFIGURE
+
+    def _configure(self) -> str:
+        """Hand the credentials to NetworkManager, or to wpa_supplicant if NM is not in charge"""
+        if _networkmanager_active():
+            logger.info("NetworkManager is active - using NetworkManager for WiFi configuration")
+            # Write to wpa_supplicant.conf as backup, but use NetworkManager primarily
+            write_wifi_config(self.ssid, self.password, self.bssid)
+            success, ip_address = configure_wifi_with_networkmanager(
+                self.ssid, self.password, timeout=max(1, self.remaining()), cancel=self.cancel, bssid=self.bssid)
+            if success:
+                # NM manages wpa_supplicant itself - it reports activation, not association events
+                self.ip_address = ip_address
+                return ADDRESS
+            if self.cancel.is_set():
+                return CANCELLED
+            logger.warning("NetworkManager configuration failed, falling back to wpa_supplicant method...")
+
+        if not write_wifi_config(self.ssid, self.password, self.bssid):
+            self.reason = "writing wpa_supplicant.conf failed"
+            return FAILED
+        if not restart_wifi():
+            self.reason = "restarting WiFi services failed"
+            return FAILED
+        return ASSOCIATE
+
+    def _associate(self) -> str:
+        """Wait for CTRL-EVENT-CONNECTED (or a WRONG_KEY rejection) from wpa_supplicant"""
+        path = wpa_ctrl.ctrl_path(self.interface)
+        # A (re)started wpa_supplicant creates its control socket once it is initialized
+        while not os.path.exists(path):
+            remaining = self.remaining()
+            if remaining <= 0 or self.cancel.wait(min(remaining, CTRL_SOCKET_POLL_INTERVAL)):
+                break
+        try:
+            with timeline.span('wpa_ctrl.wait_for_connection', 'wait'):
+                connected, reason = wpa_ctrl.wait_for_connection(
+                    self.interface, timeout=self.remaining(), cancel=self.cancel, ssid=self.ssid)
+        except OSError as e:
+            # No control socket access - the address state is the only signal left
+            logger.warning(f"wpa_supplicant control socket not available ({e}), waiting for an address")
+            return ADDRESS
+        if connected:
+            logger.info("WiFi associated (CTRL-EVENT-CONNECTED)")
+            return ADDRESS
+        if reason == 'cancelled':
+            return CANCELLED
+        if reason == 'WRONG_KEY':
+            self.reason = "wpa_supplicant rejected the password (WRONG_KEY)"
+        else:
+            self.reason = f"WiFi not associated ({reason})"
+        return FAILED
+
+    def _address(self) -> str:
+        """Wait for an IPv4 address (DHCP) on the interface"""
+        if self.ip_address:
+            return DONE
+        try:
+            self.ip_address = wait_for_ipv4_address(self.interface, self.remaining(), cancel=self.cancel)
+        except OSError as e:
+            logger.warning(f"rtnetlink not available ({e}), polling for the address")
+            self.ip_address = get_ip_address(self.interface, timeout=max(1, int(self.remaining())))
+        if self.ip_address:
+            return DONE
+        self.reason = "no IPv4 address obtained (DHCP)"
+        return FAILED
+
+
+def _networkmanager_active() -> bool:
+    try:
+        return commands.run(['systemctl', 'is-active', '--quiet', 'NetworkManager'], timeout=2).returncode == 0
+    except Exception:
+        return False
+
+
+@metrics.timed()
+@timeline.traced
+def configure_wifi(ssid: str, password: str, cancel: threading.Event = None,
+                   bssid: str = None) -> tuple[bool, str]:
+    """
+    Complete WiFi configuration process (see Provisioner)
+
+    Args:
+        ssid: WiFi network SSID
+        password: WiFi network password
+        cancel: Event that aborts the configuration, e.g. when new credentials arrive
+        bssid: Optional access point hint (aa:bb:cc:dd:ee:ff)
+
+    Returns:
+        Tuple of (success: bool, ip_address: str)
+    """
+    return Provisioner(ssid, password, cancel=cancel, bssid=bssid).run()
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Serialized queue of WiFi provisioning requests from several centrals
+Requests run one at a time, in submission order, on one worker thread. New credentials
+from a central replace its own queued request (keeping the queue position) or cancel its
+running one; identical credentials (including the BSSID hint) from another central join the
+pending request instead of causing a second reconfiguration. Each request lists the centrals
+(BlueZ device paths) waiting for its result.
+"""
+
+import collections
+import itertools
+import logging
+import threading
+
+logger = logging.getLogger('ble.provisioning')
+
+QUEUED = 'queued'
+
+
+class ProvisioningRequest:
+    """Credentials to apply, and the centrals waiting for the result"""
+
+    def __init__(self, sequence: int, device: str, ssid: str, password: str,
+                 bssid: str = None, request_id: int = 0):
+        self.sequence = sequence
+        self.ssid = ssid
+        self.password = password
+        self.bssid = bssid
+        # Client-chosen ID of a single-write credentials record (0 for separate SSID/password writes)
+        self.request_id = request_id
+        self.devices = [device]
+        self.cancel = threading.Event()
+        self.status = QUEUED
+
+    def has_credentials(self, ssid: str, password: str, bssid: str = None) -> bool:
+        """Same network, passphrase and access point hint"""
+        return self.ssid == ssid and self.password == password and self.bssid == bssid
+
+    def __repr__(self):
+        return f'<ProvisioningRequest #{self.sequence} {self.ssid!r} for {len(self.devices)} central(s)>'
+
+
+class ProvisioningQueue:
+    """FIFO of ProvisioningRequests executed by one worker thread"""
+
+    def __init__(self, run_request):
+        """
+        Args:
+            run_request: Called with each request on the worker thread; should stop early
+                         once request.cancel is set
+        """
+        self.run_request = run_request
+        self.current = None
+        self._pending = collections.deque()
+        self._sequence = itertools.count(1)
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._worker = None
+
+    def _request_of(self, device: str):
+        for request in [self.current, *self._pending]:
+            if request is not None and not request.cancel.is_set() and device in request.devices:
+                return request
+        return None
+
+    def _matching(self, ssid: str, password: str, bssid: str = None):
+        for request in [self.current, *self._pending]:
+            if request is not None and not request.cancel.is_set() and request.has_credentials(ssid, password, bssid):
+                return request
+        return None
+
+    def _detach(self, device: str, request: ProvisioningRequest):
+        """
+        Remove a central from a request, dropping the request once nobody waits for it
+
+        Returns:
+            Queue index the dropped request had, or None if it was not dropped from the queue
+        """
+        request.devices.remove(device)
+        if request.devices:
+            return None
+        request.cancel.set()
+        if request is self.current:
+            logger.info('Cancelling running %r - its central sent new credentials', request)
+            return None
+        index = self._pending.index(request)
+        del self._pending[index]
+        return index
+
+    def submit(self, device: str, ssid: str, password: str, bssid: str = None,
+               request_id: int = 0) -> ProvisioningRequest:
+        """
+        Queue credentials written by a central
+
+        Args:
+            device: BlueZ device path of the central ('' if BlueZ did not pass one)
+            ssid: WiFi network SSID
+            password: WiFi network password
+            bssid: Optional access point hint
+            request_id: Client-chosen ID of the provisioning attempt (0 = none)
+
+        Returns:
+            The request the central now waits for (possibly another central's identical one)
+        """
+        with self._lock:
+            own = self._request_of(device)
+            matching = self._matching(ssid, password, bssid)
+            if own is not None and own is matching:
+                # Same credentials written again - keep the request that is already on its way
+                return own
+            index = self._detach(device, own) if own is not None else None
+            if matching is not None:
+                matching.devices.append(device)
+                logger.info('Central joined %r with the same credentials', matching)
+                return matching
+            request = ProvisioningRequest(next(self._sequence), device, ssid, password, bssid, request_id)
+            if index is None:
+                self._pending.append(request)
+            else:
+                self._pending.insert(index, request)
+            logger.info('Queued %r (%d ahead)', request,
+                        (index if index is not None else len(self._pending) - 1) + (self.current is not None))
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._work, name='provisioning', daemon=True)
+                self._worker.start()
+            self._wakeup.notify()
+            return request
+
+    def position(self, request: ProvisioningRequest) -> int:
+        """Requests ahead of `request` (0 when running, -1 when no longer queued)"""
+        with self._lock:
+            if request is self.current:
+                return 0
+            try:
+                return self._pending.index(request) + (self.current is not None)
+            except ValueError:
+                return -1
+
+    def _work(self):
+        while True:
+            with self._lock:
+                while not self._pending:
+                    self._wakeup.wait()
+                request = self._pending.popleft()
+                self.current = request
+            try:
+                self.run_request(request)
+            except Exception as e:
+                logger.error('Provisioning %r failed: %s', request, e, exc_info=True)
+            finally:
+                with self._lock:
+                    self.current = None
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Cached, single-flight WiFi scan results for the BLE server
+Reads are answered from the last good scan while a refresh runs in the background,
+and concurrent readers join the one scan in flight instead of starting new ones
+"""
+
+import logging
+import threading
+import time
+
+logger = logging.getLogger('ble.scan')
+
+
+class ScanCache:
+    """Last good scan result with TTL-driven background refresh"""
+
+    def __init__(self, scan_func, ttl: float = 30.0):
+        """
+        Args:
+            scan_func: Callable returning a list of networks (e.g. scan_wifi_networks)
+            ttl: Age in seconds after which a read triggers a background refresh
+        """
+        self.scan_func = scan_func
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._networks = None
+        self._scanned_at = 0.0
+        self._inflight = None
+
+    def refresh(self) -> threading.Event:
+        """
+        Start a background scan unless one is already running
+
+        Returns:
+            Event that is set when the in-flight scan finishes
+        """
+        with self._lock:
+            if self._inflight is None:
+                self._inflight = threading.Event()
+                threading.Thread(target=self._run_scan, args=(self._inflight,), daemon=True).start()
+            return self._inflight
+
+    @property
+    def has_result(self) -> bool:
+        """True once a scan has succeeded (get() then returns without waiting)"""
+        with self._lock:
+            return self._networks is not None
+
+    def _run_scan(self, done: threading.Event):
+        started = time.monotonic()
+        try:
+            networks = self.scan_func()
+        except Exception as e:
+            logger.error(f'WiFi scan failed: {e}', exc_info=True)
+            networks = None
+        with self._lock:
+            # An empty list usually means the scan failed - keep the previous good result then
+            if networks is not None and (networks or self._networks is None):
+                self._networks = networks
+                self._scanned_at = time.monotonic()
+            self._inflight = None
+        logger.info(f'WiFi scan finished in {time.monotonic() - started:.2f}s, '
+                    f'{len(networks) if networks is not None else 0} networks')
+        done.set()
+
+    def get(self, wait: float = 0.0) -> tuple:
+        """
+        Return the last good scan result without blocking on a new scan
+
+        Args:
+            wait: If no result exists yet, wait up to this many seconds for the in-flight scan
+
+        Returns:
+            Tuple of (networks list or None, age in seconds or None)
+        """
+        with self._lock:
+            networks = self._networks
+            age = time.monotonic() - self._scanned_at if networks is not None else None
+        if networks is None:
+            self.refresh().wait(wait)
+            with self._lock:
+                networks = self._networks
+                age = time.monotonic() - self._scanned_at if networks is not None else None
+        elif age > self.ttl:
+            self.refresh()
+        return (networks, age)
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Encodings of WiFi scan results for BLE reads
+
+JSON (default, the format existing apps parse - every element is a network):
+
+    [{"s": ssid, "g": signal, "c": security (max 10 chars)}, ...]
+
+The age of the scan result is only sent in the binary format.
+
+Compact binary format version 1 (all integers little endian):
+
+    offset  size  field
+    0       1     version (1)
+    1       1     flags (bit 0: list truncated to fit the read)
+    2       2     age of the scan result in seconds (0xFFFF = unknown)
+    4       1     number of networks N
+    5       ...   N records: ssid_len (1), ssid (UTF-8, ssid_len bytes),
+                  signal (signed byte), security (SECURITY_* enum, 1 byte)
+"""
+
+import json
+import struct
+
+FORMAT_VERSION = 1
+FLAG_TRUNCATED = 0x01
+AGE_UNKNOWN = 0xFFFF
+
+HEADER = struct.Struct('<BBHB')
+RECORD_TAIL = struct.Struct('<bB')
+
+SECURITY_OPEN = 0
+SECURITY_WEP = 1
+SECURITY_WPA = 2
+SECURITY_WPA2 = 3
+SECURITY_WPA3 = 4
+SECURITY_WPA2_WPA3 = 5
+SECURITY_ENTERPRISE = 6
+SECURITY_UNKNOWN = 0xFF
+
+# ATT Read response carries at most MTU - 1 bytes; attribute values are limited to 512
+ATT_MAX_VALUE_LEN = 512
+DEFAULT_ATT_MTU = 23
+
+
+def security_code(security: str) -> int:
+    """
+    Map nmcli / wpa_cli security descriptions to the SECURITY_* enum
+
+    Args:
+        security: e.g. "WPA2", "WPA1 WPA2", "WPA2 WPA3", "WEP", "Open", ""
+    """
+    text = security.upper()
+    if '802.1X' in text or 'EAP' in text:
+        return SECURITY_ENTERPRISE
+    if 'WPA3' in text or 'SAE' in text:
+        return SECURITY_WPA2_WPA3 if 'WPA2' in text else SECURITY_WPA3
+    if 'WPA2' in text or 'RSN' in text:
+        return SECURITY_WPA2
+    if 'WPA' in text:
+        return SECURITY_WPA
+    if 'WEP' in text:
+        return SECURITY_WEP
+    if text in ('', '--', 'OPEN', 'NONE'):
+        return SECURITY_OPEN
+    return SECURITY_UNKNOWN
+
+
+def max_payload_size(mtu) -> int:
+    """Bytes that fit into one ATT Read response for the negotiated MTU"""
+    try:
+        mtu = int(mtu)
+    except (TypeError, ValueError):
+        mtu = DEFAULT_ATT_MTU
+    return max(HEADER.size, min(mtu - 1, ATT_MAX_VALUE_LEN))
+
+
+def encode_scan_json(networks: list) -> bytes:
+    """
+    Encode networks in the JSON format (short keys)
+
+    Args:
+        networks: List of {"ssid": str, "signal": int, "security": str}
+
+    Returns:
+        UTF-8 encoded JSON
+    """
+    entries = [{'s': net.get('ssid', ''), 'g': net.get('signal', 0), 'c': net.get('security', '')[:10]}
+               for net in networks]
+    return json.dumps(entries, ensure_ascii=False).encode('utf-8')
+
+
+def encode_scan_results(networks: list, max_size: int, age=None) -> bytes:
+    """
+    Pack networks (strongest first) into at most max_size bytes in one linear pass
+
+    Args:
+        networks: List of {"ssid": str, "signal": int, "security": str}
+        max_size: Payload budget in bytes (see max_payload_size())
+        age: Age of the scan result in seconds, or None if unknown
+
+    Returns:
+        Encoded payload
+    """
+    records = []
+    size = HEADER.size
+    truncated = False
+    for net in networks:
+        if len(records) == 255:
+            truncated = True
+            break
+        ssid = net.get('ssid', '').encode('utf-8')[:32]
+        record_size = 1 + len(ssid) + RECORD_TAIL.size
+        if size + record_size > max_size:
+            truncated = True
+            break
+        signal = max(-128, min(127, int(net.get('signal', 0))))
+        records.append(bytes((len(ssid),)) + ssid + RECORD_TAIL.pack(signal, security_code(net.get('security', ''))))
+        size += record_size
+
+    age_field = AGE_UNKNOWN if age is None else min(int(age), AGE_UNKNOWN - 1)
+    header = HEADER.pack(FORMAT_VERSION, FLAG_TRUNCATED if truncated else 0, age_field, len(records))
+    return header + b''.join(records)
+
+
+def decode_scan_results(data: bytes) -> tuple:
+    """
+    Decode a payload produced by encode_scan_results()
+
+    Returns:
+        Tuple of (networks list with 'ssid'/'signal'/'security' (enum), age or None, truncated flag)
+
+    Raises:
+        ValueError: On unknown version or malformed payload
+    """
+    if len(data) < HEADER.size:
+        raise ValueError("Payload shorter than header")
+    version, flags, age, count = HEADER.unpack_from(data, 0)
+    if version != FORMAT_VERSION:
+        raise ValueError(f"Unsupported scan format version {version}")
+    networks = []
+    offset = HEADER.size
+    for _ in range(count):
+        ssid_len = data[offset]
+        ssid = data[offset + 1:offset + 1 + ssid_len].decode('utf-8', 'replace')
+        signal, security = RECORD_TAIL.unpack_from(data, offset + 1 + ssid_len)
+        networks.append({'ssid': ssid, 'signal': signal, 'security': security})
+        offset += 1 + ssid_len + RECORD_TAIL.size
+    return (networks, None if age == AGE_UNKNOWN else age, bool(flags & FLAG_TRUNCATED))
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+GATT session recorder for the BLE server
+When BLE_SESSION_RECORD_DIR is set, every D-Bus method call on the GATT application,
+service and characteristics is appended to a JSON-lines file with its time offset,
+options, payload size and reply time, so traffic captured from real phone apps can be
+replayed with gatt_replay.py. Written values are stored as hex, except for sensitive
+characteristics (the password), whose bytes are never recorded - only their length.
+When recording is off, record() costs one attribute check.
+
+Environment:
+    BLE_SESSION_RECORD_DIR    Directory for session files (default: recording off)
+    BLE_SESSION_RECORD_KEEP   Number of session files kept (default 10)
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger('ble.session')
+
+SESSION_DIR = os.environ.get('BLE_SESSION_RECORD_DIR', '')
+SESSION_KEEP = int(os.environ.get('BLE_SESSION_RECORD_KEEP', '10'))
+SESSION_PREFIX = 'session-'
+FORMAT_VERSION = 1
+
+_active = None
+
+
+class SessionRecorder:
+    """Appends GATT calls to one session file"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.started = time.monotonic()
+        self._lock = threading.Lock()
+        self._file = open(path, 'a', encoding='utf-8')
+        self._write({
+            'type': 'session',
+            'version': FORMAT_VERSION,
+            'started': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        })
+
+    def _write(self, event: dict):
+        line = json.dumps(event, separators=(',', ':'))
+        with self._lock:
+            self._file.write(line + '\n')
+            self._file.flush()
+
+    def add(self, method: str, path: str, started: float, **fields):
+        """Record a call that started at monotonic time `started` and was answered now"""
+        event = {
+            'type': 'call',
+            't': round(started - self.started, 6),
+            'method': method,
+            'path': str(path),
+            'duration': round(time.monotonic() - started, 6),
+        }
+        event.update((key, value) for key, value in fields.items() if value is not None)
+        self._write(event)
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+def _plain_options(options) -> dict:
+    """D-Bus option dictionary as JSON-serializable values"""
+    plain = {}
+    for key, value in (options or {}).items():
+        if isinstance(value, bool):
+            plain[str(key)] = bool(value)
+        elif isinstance(value, int):
+            plain[str(key)] = int(value)
+        else:
+            plain[str(key)] = str(value)
+    return plain
+
+
+def record(method: str, path: str, started: float, uuid: str = None, options=None,
+           value=None, sensitive: bool = False, size: int = None, error: str = None, **fields):
+    """
+    Record one GATT call in the active session (no-op when recording is off)
+
+    Args:
+        method: D-Bus method name (ReadValue, WriteValue, GetAll, ...)
+        path: Object path the call was made on
+        started: time.monotonic() when the call arrived
+        uuid: Characteristic or service UUID
+        options: ReadValue/WriteValue options dictionary
+        value: Written bytes (recorded as hex unless sensitive)
+        sensitive: Record only the length of `value`, never its bytes
+        size: Payload size of the reply (reads)
+        error: D-Bus error name if the call failed
+    """
+    recorder = _active
+    if recorder is None:
+        return
+    if value is not None:
+        fields['size'] = len(value)
+        if sensitive:
+            fields['redacted'] = True
+        else:
+            fields['value'] = bytes(value).hex()
+    elif size is not None:
+        fields['size'] = size
+    recorder.add(method, path, started, uuid=uuid, options=_plain_options(options) if options else None,
+                 error=error, **fields)
+
+
+def start(directory: str = SESSION_DIR, keep: int = SESSION_KEEP):
+    """
+    Start recording into a new session file and delete all but the newest `keep` sessions
+
+    Returns:
+        The SessionRecorder, or None if no directory is configured or it is not writable
+    """
+    global _active
+    if not directory:
+        return None
+    try:
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"{SESSION_PREFIX}{time.strftime('%Y%m%d-%H%M%S')}.jsonl")
+        recorder = SessionRecorder(path)
+    except OSError as e:
+        logger.warning('GATT session recording disabled: %s', e)
+        return None
+    sessions = sorted(name for name in os.listdir(directory)
+                      if name.startswith(SESSION_PREFIX) and name.endswith('.jsonl'))
+    for name in sessions[:-keep] if keep > 0 else []:
+        try:
+            os.unlink(os.path.join(directory, name))
+        except OSError:
+            pass
+    _active = recorder
+    logger.warning('Recording GATT sessions to %s', path)
+    return recorder
+
+
+def stop():
+    """Stop recording and close the session file"""
+    global _active
+    recorder, _active = _active, None
+    if recorder is not None:
+        recorder.close()
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Provisioning timeline tracer for the BLE server
+While a provisioning run is active, steps, external commands, podman API calls and
+sleeps are recorded as timed spans. Each run is written as one Chrome trace event
+file (open in chrome://tracing or https://ui.perfetto.dev); the last N are kept.
+Outside a run, span() and sleep() cost one attribute check.
+"""
+
+import contextlib
+import functools
+import json
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger('ble.timeline')
+
+TRACE_DIR = os.environ.get('BLE_PROVISIONING_TRACE_DIR', '/var/log/ble-wifi/provisioning')
+TRACE_KEEP = int(os.environ.get('BLE_PROVISIONING_TRACE_KEEP', '10'))
+TRACE_PREFIX = 'provisioning-'
+
+_active = None
+
+
+class Timeline:
+    """Spans of one provisioning run"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.started_wall = time.time()
+        self.started = time.monotonic()
+        self.events = []
+        self.threads = {}
+        self.args = {}
+        self._lock = threading.Lock()
+
+    def add(self, name: str, category: str, start: float, end: float, args: dict = None):
+        """Record a complete span (monotonic start/end in seconds)"""
+        thread = threading.current_thread()
+        event = {
+            'name': name,
+            'cat': category,
+            'ph': 'X',
+            'ts': round((start - self.started) * 1e6),
+            'dur': round((end - start) * 1e6),
+            'pid': os.getpid(),
+            'tid': thread.ident,
+        }
+        if args:
+            event['args'] = args
+        with self._lock:
+            self.threads[thread.ident] = thread.name
+            self.events.append(event)
+
+    def to_chrome_trace(self) -> dict:
+        """Trace in Chrome trace event format (JSON object form)"""
+        with self._lock:
+            events = list(self.events)
+            threads = dict(self.threads)
+        metadata = [{'name': 'process_name', 'ph': 'M', 'pid': os.getpid(), 'args': {'name': self.name}}]
+        metadata += [{'name': 'thread_name', 'ph': 'M', 'pid': os.getpid(), 'tid': tid, 'args': {'name': name}}
+                     for tid, name in threads.items()]
+        return {
+            'traceEvents': metadata + sorted(events, key=lambda e: e['ts']),
+            'displayTimeUnit': 'ms',
+            'otherData': dict(self.args, started=time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(self.started_wall))),
+        }
+
+    def write(self, directory: str = TRACE_DIR, keep: int = TRACE_KEEP) -> str:
+        """
+        Write the trace file and delete all but the newest `keep` traces
+
+        Returns:
+            Path of the written file
+        """
+        os.makedirs(directory, exist_ok=True)
+        stamp = time.strftime('%Y%m%d-%H%M%S', time.localtime(self.started_wall))
+        stamp += f'{self.started_wall % 1:.3f}'[1:]
+        path = os.path.join(directory, f'{TRACE_PREFIX}{stamp}.json')
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_chrome_trace(), f, separators=(',', ':'))
+        traces = sorted(name for name in os.listdir(directory)
+                        if name.startswith(TRACE_PREFIX) and name.endswith('.json'))
+        for name in traces[:-keep] if keep > 0 else []:
+            try:
+                os.unlink(os.path.join(directory, name))
+            except OSError:
+                pass
+        return path
+
+
+@contextlib.contextmanager
+def run(name: str = 'provisioning', directory: str = TRACE_DIR, keep: int = TRACE_KEEP):
+    """
+    Record a provisioning run; the trace is written when the block exits
+
+    Yields:
+        The Timeline (set timeline.args for run metadata such as the result)
+    """
+    global _active
+    timeline = Timeline(name)
+    _active = timeline
+    start = time.monotonic()
+    try:
+        yield timeline
+    finally:
+        timeline.add(name, 'run', start, time.monotonic(), timeline.args or None)
+        _active = None
+        try:
+            path = timeline.write(directory, keep)
+            logger.info('Provisioning trace written to %s', path)
+        except OSError as e:
+            logger.warning('Writing provisioning trace failed: %s', e)
+
+
+class span:
+    """Context manager recording a span in the active run (no-op outside a run)"""
+
+    __slots__ = ('name', 'category', 'args', 'timeline', 'start')
+
+    def __init__(self, name: str, category: str = 'step', **args):
+        self.name = name
+        self.category = category
+        self.args = args
+
+    def __enter__(self):
+        self.timeline = _active
+        if self.timeline is not None:
+            self.start = time.monotonic()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self.timeline is not None:
+            if exc_type is not None:
+                self.args['error'] = exc_type.__name__
+            self.timeline.add(self.name, self.category, self.start, time.monotonic(), self.args or None)
+        return False
+
+
+def traced(func):
+    """Decorator recording each call of a function as a step span"""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if _active is None:
+            return func(*args, **kwargs)
+        with span(func.__name__):
+            return func(*args, **kwargs)
+    return wrapper
+
+
+def sleep(seconds: float, reason: str = None):
+    """time.sleep() that shows up as a span in the active run"""
+    if _active is None:
+        time.sleep(seconds)
+        return
+    with span(f'sleep {seconds:g}s', 'sleep', reason=reason or ''):
+        time.sleep(seconds)
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Level-gated tracing for the BLE server
+
+Each subsystem logs through its own logger ("ble.gatt", "ble.scan", ...) with
+%-style arguments, so a disabled message costs one level check and is never
+formatted. Messages that pass a subsystem's level go to an in-memory ring
+buffer (message text fixed when recorded, so a dump shows values as they were
+logged); the console/journal only gets messages at or above the console level.
+
+Environment:
+    BLE_LOG_LEVEL       Console level (default WARNING)
+    BLE_TRACE_LEVELS    Per-subsystem levels, e.g. "gatt=DEBUG,podman=INFO"
+                        (subsystems default to the console level)
+    BLE_TRACE_BUFFER    Ring buffer size in records (default 2000)
+
+Send SIGUSR1 to write the ring buffer to TRACE_DUMP_PATH.
+"""
+
+import collections
+import copy
+import logging
+import os
+import signal
+import threading
+import time
+
+ROOT_LOGGER = 'ble'
+DEFAULT_LEVEL = 'WARNING'
+DEFAULT_BUFFER_SIZE = 2000
+TRACE_DUMP_PATH = '/tmp/ble-wifi-trace.log'
+
+_FORMAT = '%(asctime)s %(levelname)s %(name)s: %(message)s'
+
+_ring = None
+
+
+class RingBufferHandler(logging.Handler):
+    """Keeps the last N records; the message is resolved on emit, the line layout in dump()"""
+
+    def __init__(self, capacity: int = DEFAULT_BUFFER_SIZE):
+        super().__init__(logging.DEBUG)
+        self.records = collections.deque(maxlen=capacity)
+        self._dump_lock = threading.Lock()
+        self.setFormatter(logging.Formatter(_FORMAT))
+
+    def emit(self, record):
+        # Resolve %-args now: they may be mutable objects that change before a dump
+        frozen = copy.copy(record)
+        try:
+            frozen.msg = record.getMessage()
+        except Exception as e:
+            frozen.msg = f'<unformattable message {record.msg!r}: {e}>'
+        frozen.args = None
+        if record.exc_info:
+            frozen.exc_text = record.exc_text or self.formatter.formatException(record.exc_info)
+            frozen.exc_info = None
+        # deque.append is atomic - no handler lock work on the hot path
+        self.records.append(frozen)
+
+    def handle(self, record):
+        if self.filter(record):
+            self.emit(record)
+        return True
+
+    def dump(self) -> str:
+        with self._dump_lock:
+            lines = []
+            for record in list(self.records):
+                try:
+                    lines.append(self.format(record))
+                except Exception as e:
+                    lines.append(f'<unformattable record {record.name}: {e}>')
+            return '\n'.join(lines) + ('\n' if lines else '')
+
+
+def _parse_level(name: str, default: int) -> int:
+    level = logging.getLevelName(name.strip().upper()) if name else default
+    return level if isinstance(level, int) else default
+
+
+def parse_trace_levels(spec: str) -> dict:
+    """Parse "gatt=DEBUG,podman=INFO" into {"gatt": 10, "podman": 20}"""
+    levels = {}
+    for item in (spec or '').split(','):
+        if '=' in item:
+            subsystem, level = item.split('=', 1)
+            levels[subsystem.strip()] = _parse_level(level, logging.WARNING)
+    return levels
+
+
+def configure(console_level: str = None, trace_levels: dict = None, buffer_size: int = None):
+    """
+    Set up console logging, per-subsystem levels and the ring buffer (call once at startup)
+
+    Args:
+        console_level: Level name for the console (default: BLE_LOG_LEVEL or WARNING)
+        trace_levels: {subsystem: level} overrides (default: BLE_TRACE_LEVELS)
+        buffer_size: Ring buffer capacity in records (default: BLE_TRACE_BUFFER or 2000)
+    """
+    global _ring
+    console = _parse_level(console_level or os.environ.get('BLE_LOG_LEVEL', DEFAULT_LEVEL), logging.WARNING)
+    if trace_levels is None:
+        trace_levels = parse_trace_levels(os.environ.get('BLE_TRACE_LEVELS', ''))
+    if buffer_size is None:
+        buffer_size = int(os.environ.get('BLE_TRACE_BUFFER', DEFAULT_BUFFER_SIZE))
+
+    logging.basicConfig(level=console, format=_FORMAT)
+    root = logging.getLogger()
+    root.setLevel(console)
+    for handler in root.handlers:
+        handler.setLevel(console)
+    if _ring is None:
+        _ring = RingBufferHandler(buffer_size)
+        root.addHandler(_ring)
+
+    # Subsystem loggers gate messages before any record is created; records of a
+    # subsystem traced below the console level only reach the ring buffer
+    for subsystem, level in trace_levels.items():
+        get_tracer(subsystem).setLevel(level)
+
+
+def get_tracer(subsystem: str) -> logging.Logger:
+    """Logger of a subsystem, e.g. get_tracer('gatt') -> 'ble.gatt'"""
+    return logging.getLogger(f'{ROOT_LOGGER}.{subsystem}')
+
+
+def dump_ring_buffer() -> str:
+    """Formatted contents of the ring buffer (empty before configure())"""
+    return _ring.dump() if _ring else ''
+
+
+def write_dump(path: str = TRACE_DUMP_PATH) -> str:
+    """Write the ring buffer to a file and return the path"""
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(f'# BLE trace dump {time.strftime("%Y-%m-%d %H:%M:%S")}\n')
+        f.write(dump_ring_buffer())
+    return path
+
+
+def install_dump_signal(signum: int = signal.SIGUSR1, path: str = TRACE_DUMP_PATH):
+    """Dump the ring buffer to path whenever the process receives signum"""
+    def handler(_signum, _frame):
+        try:
+            logging.getLogger(ROOT_LOGGER).warning('Trace buffer written to %s', write_dump(path))
+        except OSError as e:
+            logging.getLogger(ROOT_LOGGER).error('Writing trace buffer failed: %s', e)
+    signal.signal(signum, handler)
@@ -4,20 +4,129 @@ WiFi Configuration Handler for Raspberry Pi
 Handles writing WiFi credentials to wpa_supplicant and retrieving IP address
 """
 
+import logging
 import subprocess
 import time
 import re
 import os
 import json
 
+import commands
+import metrics
+import timeline
+from netlink_monitor import interface_addresses, wait_for_ipv4_address
+import wpa_ctrl
 
-def write_wifi_config(ssid: str, password: str) -> bool:
+logger = logging.getLogger('ble.wifi')
+
+try:
+    from nm_dbus import NetworkManagerClient
+except ImportError:
+    # dbus-python is not installed (e.g. CLI run outside the BLE virtualenv) - use nmcli only
+    NetworkManagerClient = None
+
+WPA_SUPPLICANT_CONF = "/etc/wpa_supplicant/wpa_supplicant.conf"
+_INET_RE = re.compile(r'inet\s+(\d+\.\d+\.\d+\.\d+)/\d+')
+# Field separator of nmcli terse output: a colon not escaped with a backslash
+_NMCLI_FIELD_RE = re.compile(r'(?<!\\):')
+IFF_UP = 0x1
+LINK_POLL_INTERVAL = 0.1
+
+
+def _wpa_cli(*args, timeout: float = 5) -> subprocess.CompletedProcess:
+    """
+    Run a wpa_cli command for wlan0, preferring the wpa_supplicant control socket
+    
+    Args:
+        *args: wpa_cli command and arguments, e.g. ('remove_network', '0')
+        timeout: Maximum time to wait for the reply in seconds
+        
+    Returns:
+        CompletedProcess with wpa_cli compatible returncode, stdout and stderr
+    """
+    command = ' '.join([args[0].upper()] + [str(arg) for arg in args[1:]])
+    try:
+        with timeline.span(f'wpa_ctrl {args[0]}', 'command'), wpa_ctrl.WpaCtrl(wpa_ctrl.ctrl_path('wlan0')) as ctrl:
+            reply = ctrl.request(command, timeout=timeout)
+        failed = reply.startswith('FAIL') or reply.startswith('UNKNOWN COMMAND')
+        return subprocess.CompletedProcess(list(args), 1 if failed else 0, stdout=reply, stderr='')
+    except OSError:
+        # Control socket not available (wpa_supplicant not running, no permission) - spawn wpa_cli
+        return commands.run(
+            ['sudo', 'wpa_cli', '-i', 'wlan0', *args],
+            capture_output=True,
+            text=True,
+            timeout=timeout
+        )
+
+
+def _get_networkmanager_client():
+    """
+    Get a NetworkManager D-Bus client if NetworkManager is reachable on the system bus
+    
+    Returns:
+        NetworkManagerClient instance, or None if nmcli must be used instead
+    """
+    if NetworkManagerClient is None:
+        return None
+    try:
+        client = NetworkManagerClient()
+        if client.is_running():
+            return client
+    except Exception as e:
+        logger.info(f"Note: NetworkManager D-Bus API not available: {e}")
+    return None
+
+
+def interface_is_up(interface: str = "wlan0") -> bool:
+    """
+    Check the interface's administrative UP flag (IFF_UP in /sys/class/net/<interface>/flags)
+    
+    Returns:
+        True if the interface exists and is UP, False otherwise
+    """
+    try:
+        with open(f'/sys/class/net/{interface}/flags') as f:
+            return bool(int(f.read().strip(), 16) & IFF_UP)
+    except (OSError, ValueError):
+        return False
+
+
+def wait_for_interface_up(interface: str = "wlan0", timeout: float = 5, cancel=None) -> bool:
+    """
+    Wait until the interface is UP, checking the sysfs flag every LINK_POLL_INTERVAL
+    
+    Args:
+        interface: Network interface name (default: wlan0)
+        timeout: Maximum time to wait in seconds
+        cancel: Optional threading.Event that aborts the wait
+        
+    Returns:
+        True if the interface is UP, False on timeout or cancellation
+    """
+    deadline = time.monotonic() + timeout
+    with timeline.span(f'wait {interface} up', 'wait'):
+        while not interface_is_up(interface):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            if cancel is not None:
+                if cancel.wait(min(remaining, LINK_POLL_INTERVAL)):
+                    return False
+            else:
+                time.sleep(min(remaining, LINK_POLL_INTERVAL))
+    return True
+
+
+@timeline.traced
+def write_wifi_config(ssid: str, password: str, bssid: str = None) -> bool:
     """
     Write WiFi configuration to wpa_supplicant.conf
     
     Args:
         ssid: WiFi network SSID
         password: WiFi network password
+        bssid: Optional access point to try first (bssid_hint, the network is not locked to it)
         
     Returns:
         True if successful, False otherwise
@@ -31,7 +140,7 @@ def write_wifi_config(ssid: str, password: str) -> bool:
     if len(password) < 8 or len(password) > 63:
         return False
     
-    wpa_supplicant_path = "/etc/wpa_supplicant/wpa_supplicant.conf"
+    wpa_supplicant_path = WPA_SUPPLICANT_CONF
     
     # Read existing config
     try:
@@ -45,7 +154,8 @@ def write_wifi_config(ssid: str, password: str) -> bool:
     content = re.sub(pattern, '', content, flags=re.DOTALL)
     
     # Add new network configuration
-    network_config = f'\nnetwork={{\n    ssid="{ssid}"\n    psk="{password}"\n    key_mgmt=WPA-PSK\n}}\n'
+    hint = f'    bssid_hint={bssid}\n' if bssid else ''
+    network_config = f'\nnetwork={{\n    ssid="{ssid}"\n    psk="{password}"\n    key_mgmt=WPA-PSK\n{hint}}}\n'
     content += network_config
     
     # Write back to file (requires root)
@@ -54,13 +164,14 @@ def write_wifi_config(ssid: str, password: str) -> bool:
             f.write(content)
         return True
     except PermissionError:
-        print("Error: Need root privileges to write to wpa_supplicant.conf")
+        logger.error("Need root privileges to write to wpa_supplicant.conf")
         return False
     except Exception as e:
-        print(f"Error writing WiFi config: {e}")
+        logger.error(f"Error writing WiFi config: {e}")
         return False
 
 
+@timeline.traced
 def delete_all_wifi_networks() -> bool:
     """
     Delete all saved WiFi networks from both wpa_supplicant and NetworkManager
@@ -73,18 +184,18 @@ def delete_all_wifi_networks() -> bool:
     Returns:
         True if successful, False otherwise
     """
-    print("Deleting all saved WiFi networks...")
+    logger.info("Deleting all saved WiFi networks...")
     success = True
     
     # 1. Delete from wpa_supplicant.conf
-    wpa_supplicant_path = "/etc/wpa_supplicant/wpa_supplicant.conf"
+    wpa_supplicant_path = WPA_SUPPLICANT_CONF
     try:
         # Read existing config
         try:
             with open(wpa_supplicant_path, 'r') as f:
                 content = f.read()
         except FileNotFoundError:
-            print("wpa_supplicant.conf not found, nothing to delete")
+            logger.info("wpa_supplicant.conf not found, nothing to delete")
             content = None
         
         if content:
@@ -113,25 +224,20 @@ def delete_all_wifi_networks() -> bool:
                 
                 with open(wpa_supplicant_path, 'w') as f:
                     f.write(content)
-                print("✓ Deleted all networks from wpa_supplicant.conf")
+                logger.info("Deleted all networks from wpa_supplicant.conf")
             else:
-                print("✓ No networks found in wpa_supplicant.conf")
+                logger.info("No networks found in wpa_supplicant.conf")
     except PermissionError:
-        print("ERROR: Need root privileges to modify wpa_supplicant.conf")
+        logger.error("Need root privileges to modify wpa_supplicant.conf")
         success = False
     except Exception as e:
-        print(f"ERROR: Failed to delete from wpa_supplicant.conf: {e}")
+        logger.error(f"Failed to delete from wpa_supplicant.conf: {e}")
         success = False
     
     # 2. Delete from wpa_cli (if wpa_supplicant is running)
     try:
         # List all networks
-        list_result = subprocess.run(
-            ['sudo', 'wpa_cli', '-i', 'wlan0', 'list_networks'],
-            capture_output=True,
-            text=True,
-            timeout=5
-        )
+        list_result = _wpa_cli('list_networks', timeout=5)
         if list_result.returncode == 0:
             lines = list_result.stdout.strip().split('\n')
             # First line is header, rest are networks
@@ -149,77 +255,81 @@ def delete_all_wifi_networks() -> bool:
                 
                 # Delete each network
                 for network_id in network_ids:
-                    delete_result = subprocess.run(
-                        ['sudo', 'wpa_cli', '-i', 'wlan0', 'remove_network', str(network_id)],
-                        capture_output=True,
-                        text=True,
-                        timeout=5
-                    )
+                    delete_result = _wpa_cli('remove_network', str(network_id), timeout=5)
                     if delete_result.returncode == 0 and 'OK' in delete_result.stdout:
-                        print(f"✓ Deleted network {network_id} from wpa_cli")
+                        logger.info(f"Deleted network {network_id} from wpa_cli")
                 
                 # Save configuration
-                save_result = subprocess.run(
-                    ['sudo', 'wpa_cli', '-i', 'wlan0', 'save_config'],
-                    capture_output=True,
-                    text=True,
-                    timeout=5
-                )
+                save_result = _wpa_cli('save_config', timeout=5)
                 if save_result.returncode == 0:
-                    print("✓ Saved wpa_cli configuration")
+                    logger.info("Saved wpa_cli configuration")
             else:
-                print("✓ No networks found in wpa_cli")
+                logger.info("No networks found in wpa_cli")
     except (subprocess.CalledProcessError, FileNotFoundError, subprocess.TimeoutExpired) as e:
         # wpa_cli might not be available or wpa_supplicant not running
-        print(f"Note: Could not delete from wpa_cli: {e}")
+        logger.info(f"Note: Could not delete from wpa_cli: {e}")
     
     # 3. Delete from NetworkManager (if active)
-    try:
-        # Check if NetworkManager is active
-        nm_check = subprocess.run(
-            ['systemctl', 'is-active', '--quiet', 'NetworkManager'],
-            timeout=2
-        )
-        if nm_check.returncode == 0:
-            # List all WiFi connections
-            list_result = subprocess.run(
-                ['sudo', 'nmcli', 'connection', 'show'],
-                capture_output=True,
-                text=True,
-                timeout=5
+    nm_client = _get_networkmanager_client()
+    if nm_client:
+        try:
+            deleted = nm_client.delete_wifi_connections()
+            for conn_name in deleted:
+                logger.info(f"Deleted NetworkManager connection: {conn_name}")
+            if not deleted:
+                logger.info("No WiFi connections found in NetworkManager")
+        except Exception as e:
+            logger.info(f"Note: Could not delete from NetworkManager over D-Bus: {e}")
+            nm_client = None
+    
+    if nm_client is None:
+        # Fallback: nmcli
+        try:
+            # Check if NetworkManager is active
+            nm_check = commands.run(
+                ['systemctl', 'is-active', '--quiet', 'NetworkManager'],
+                timeout=2
             )
-            if list_result.returncode == 0:
-                lines = list_result.stdout.strip().split('\n')
-                wifi_connections = []
-                for line in lines[1:]:  # Skip header
-                    parts = line.split()
-                    if parts:
-                        conn_name = parts[0]
-                        conn_type = parts[1] if len(parts) > 1 else ''
-                        if conn_type == 'wifi' or '802-11-wireless' in line:
-                            wifi_connections.append(conn_name)
+            if nm_check.returncode == 0:
+                # List all WiFi connections
+                list_result = commands.run(
+                    ['sudo', 'nmcli', 'connection', 'show'],
+                    capture_output=True,
+                    text=True,
+                    timeout=5
+                )
+                if list_result.returncode == 0:
+                    lines = list_result.stdout.strip().split('\n')
+                    wifi_connections = []
+                    for line in lines[1:]:  # Skip header
+                        parts = line.split()
+                        if parts:
+                            conn_name = parts[0]
+                            conn_type = parts[1] if len(parts) > 1 else ''
+                            if conn_type == 'wifi' or '802-11-wireless' in line:
+                                wifi_connections.append(conn_name)
                 
-                # Delete each WiFi connection
-                for conn_name in wifi_connections:
-                    delete_result = subprocess.run(
-                        ['sudo', 'nmcli', 'connection', 'delete', conn_name],
-                        capture_output=True,
-                        text=True,
-                        timeout=5
-                    )
-                    if delete_result.returncode == 0:
-                        print(f"✓ Deleted NetworkManager connection: {conn_name}")
-                    else:
-                        print(f"⚠ Failed to delete NetworkManager connection: {conn_name}")
+                    # Delete each WiFi connection
+                    for conn_name in wifi_connections:
+                        delete_result = commands.run(
+                            ['sudo', 'nmcli', 'connection', 'delete', conn_name],
+                            capture_output=True,
+                            text=True,
+                            timeout=5
+                        )
+                        if delete_result.returncode == 0:
+                            logger.info(f"Deleted NetworkManager connection: {conn_name}")
+                        else:
+                            logger.warning(f"Failed to delete NetworkManager connection: {conn_name}")
                 
-                if not wifi_connections:
-                    print("✓ No WiFi connections found in NetworkManager")
+                    if not wifi_connections:
+                        logger.info("No WiFi connections found in NetworkManager")
+                else:
+                    logger.info("Note: Could not list NetworkManager connections")
             else:
-                print("Note: Could not list NetworkManager connections")
-        else:
-            print("✓ NetworkManager is not active, skipping")
-    except (subprocess.CalledProcessError, FileNotFoundError, subprocess.TimeoutExpired) as e:
-        print(f"Note: Could not delete from NetworkManager: {e}")
+                logger.info("NetworkManager is not active, skipping")
+        except (subprocess.CalledProcessError, FileNotFoundError, subprocess.TimeoutExpired) as e:
+            logger.info(f"Note: Could not delete from NetworkManager: {e}")
     
     # 4. Also check NetworkManager system-connections directory
     nm_connections_dir = "/etc/NetworkManager/system-connections"
@@ -237,25 +347,26 @@ def delete_all_wifi_networks() -> bool:
                         if 'type=wifi' in content or '802-11-wireless' in content:
                             os.remove(filepath)
                             deleted_count += 1
-                            print(f"✓ Deleted NetworkManager file: {filename}")
+                            logger.info(f"Deleted NetworkManager file: {filename}")
                 except Exception as e:
-                    print(f"⚠ Could not delete {filename}: {e}")
+                    logger.warning(f"Could not delete {filename}: {e}")
             
             if deleted_count == 0:
-                print("✓ No WiFi connection files found in NetworkManager directory")
+                logger.info("No WiFi connection files found in NetworkManager directory")
     except PermissionError:
-        print("Note: Need root privileges to delete NetworkManager connection files")
+        logger.info("Note: Need root privileges to delete NetworkManager connection files")
     except Exception as e:
-        print(f"Note: Could not access NetworkManager directory: {e}")
+        logger.info(f"Note: Could not access NetworkManager directory: {e}")
     
     if success:
-        print("✓ All WiFi networks deleted successfully")
+        logger.info("All WiFi networks deleted successfully")
     else:
-        print("⚠ Some operations failed, but partial cleanup completed")
+        logger.warning("Some operations failed, but partial cleanup completed")
     
     return success
 
 
+@timeline.traced
 def restart_wifi() -> bool:
     """
     Restart WiFi service to apply new configuration
@@ -275,53 +386,47 @@ def restart_wifi() -> bool:
     # Method 1: Use wpa_cli to reconfigure (PREFERRED METHOD)
     # This is the recommended way - reconfigures wpa_supplicant without service restart
     try:
-        result = subprocess.run(
-            ['sudo', 'wpa_cli', '-i', 'wlan0', 'reconfigure'],
-            capture_output=True,
-            text=True,
-            timeout=10
-        )
+        result = _wpa_cli('reconfigure', timeout=10)
         if result.returncode == 0:
             # Check for OK in output (wpa_cli returns "OK" on success)
             if 'OK' in result.stdout or result.returncode == 0:
-                print("WiFi reconfigured using wpa_cli (preferred method)")
+                logger.info("WiFi reconfigured using wpa_cli (preferred method)")
                 success = True
-                time.sleep(2)  # Give time for reconfiguration
+                # RECONFIGURE is answered once the new configuration is loaded;
+                # association progress is awaited on wpa_supplicant events later
                 # If wpa_cli succeeded, we're done - no need to restart services
                 return True
     except (subprocess.CalledProcessError, FileNotFoundError, subprocess.TimeoutExpired) as e:
-        print(f"wpa_cli reconfigure failed: {e}")
+        logger.warning(f"wpa_cli reconfigure failed: {e}")
     
     # Method 2: Restart wpa_supplicant service (fallback if wpa_cli failed)
     try:
         # Check if wpa_supplicant is running first
-        check_result = subprocess.run(
+        check_result = commands.run(
             ['systemctl', 'is-active', 'wpa_supplicant'],
             capture_output=True,
             text=True,
             timeout=3
         )
         if check_result.returncode == 0:
-            subprocess.run(['sudo', 'systemctl', 'restart', 'wpa_supplicant'], 
+            commands.run(['sudo', 'systemctl', 'restart', 'wpa_supplicant'], 
                           check=True, timeout=10)
-            print("wpa_supplicant service restarted")
+            logger.info("wpa_supplicant service restarted")
             success = True
-            time.sleep(2)
         else:
             # wpa_supplicant might not be running, try to start it
-            print("wpa_supplicant is not active, attempting to start it...")
+            logger.info("wpa_supplicant is not active, attempting to start it...")
             try:
-                subprocess.run(['sudo', 'systemctl', 'start', 'wpa_supplicant'], 
+                commands.run(['sudo', 'systemctl', 'start', 'wpa_supplicant'], 
                               check=True, timeout=10)
-                print("wpa_supplicant service started")
+                logger.info("wpa_supplicant service started")
                 success = True
-                time.sleep(2)
             except subprocess.CalledProcessError as e2:
-                print(f"Failed to start wpa_supplicant: {e2}")
+                logger.error(f"Failed to start wpa_supplicant: {e2}")
                 # If NetworkManager is active, wpa_supplicant might be managed by it
-                print("Note: If NetworkManager is active, it may manage wpa_supplicant")
+                logger.info("Note: If NetworkManager is active, it may manage wpa_supplicant")
     except (subprocess.CalledProcessError, FileNotFoundError, subprocess.TimeoutExpired) as e:
-        print(f"Failed to restart wpa_supplicant: {e}")
+        logger.error(f"Failed to restart wpa_supplicant: {e}")
     
     # Method 3: Detect and restart the active network manager
     # Check which network manager is active and restart it
@@ -336,46 +441,124 @@ def restart_wifi() -> bool:
     for service_name, display_name in network_managers:
         try:
             # Check if service exists and is active
-            check_result = subprocess.run(
+            check_result = commands.run(
                 ['systemctl', 'is-active', '--quiet', service_name],
                 timeout=2
             )
             if check_result.returncode == 0:
                 # Service is active, restart it
-                subprocess.run(['sudo', 'systemctl', 'restart', service_name], 
+                commands.run(['sudo', 'systemctl', 'restart', service_name], 
                               check=True, timeout=10)
-                print(f"{display_name} restarted (detected as active)")
+                logger.info(f"{display_name} restarted (detected as active)")
                 network_manager_restarted = True
                 network_manager_name = display_name
-                time.sleep(2)  # Give more time after NetworkManager restart
+                timeline.sleep(2)  # Give more time after NetworkManager restart
                 
                 # If NetworkManager is active, ensure interface is UP after restart
                 if service_name == 'NetworkManager':
-                    print("NetworkManager restarted - ensuring wlan0 is UP...")
+                    logger.info("NetworkManager restarted - ensuring wlan0 is UP...")
                     try:
                         # NetworkManager should manage the interface, but ensure it's up
-                        subprocess.run(['sudo', 'ip', 'link', 'set', 'wlan0', 'up'], 
+                        commands.run(['sudo', 'ip', 'link', 'set', 'wlan0', 'up'], 
                                      timeout=5)
-                        time.sleep(1)
+                        timeline.sleep(1)
                         # Also try nmcli to ensure WiFi is enabled
-                        subprocess.run(['sudo', 'nmcli', 'radio', 'wifi', 'on'], 
+                        commands.run(['sudo', 'nmcli', 'radio', 'wifi', 'on'], 
                                      timeout=5)
-                        print("✓ WiFi radio enabled via NetworkManager")
+                        logger.info("WiFi radio enabled via NetworkManager")
                     except Exception as e:
-                        print(f"Note: Could not explicitly enable WiFi via NetworkManager: {e}")
+                        logger.info(f"Note: Could not explicitly enable WiFi via NetworkManager: {e}")
                 break
         except (subprocess.CalledProcessError, FileNotFoundError, subprocess.TimeoutExpired):
             # Service not active or doesn't exist, try next
             continue
     
     if not network_manager_restarted:
-        print("No active network manager service found to restart (this is OK)")
+        logger.info("No active network manager service found to restart (this is OK)")
     
     # Success if wpa_supplicant was reconfigured or restarted
     # Network manager restart is optional - DHCP will be handled automatically
     return success
 
 
+def parse_ipv4_address(output: str) -> str:
+    """
+    First non-loopback IPv4 address in `ip addr show` output
+    
+    Returns:
+        IP address as string, or empty string if there is none
+    """
+    for match in _INET_RE.finditer(output):
+        if match.group(1) != "127.0.0.1":
+            return match.group(1)
+    return ""
+
+
+def _split_nmcli_terse(line: str) -> list:
+    # nmcli -t escapes ':' and '\' inside values with a backslash
+    if '\\' not in line:
+        return line.split(':')
+    return [field.replace('\\:', ':').replace('\\\\', '\\') for field in _NMCLI_FIELD_RE.split(line)]
+
+
+def parse_nmcli_wifi_list(output: str) -> list:
+    """
+    Parse `nmcli -t -f SSID,SIGNAL,SECURITY device wifi list` output
+    
+    Returns:
+        List of {"ssid", "signal", "security"} (one entry per SSID, strongest first)
+    """
+    networks = []
+    seen_ssids = set()
+    for line in output.split('\n'):
+        if not line:
+            continue
+        parts = _split_nmcli_terse(line)
+        if len(parts) < 3:
+            continue
+        ssid = parts[0].strip()
+        # Skip hidden networks and SSIDs already listed by another BSSID
+        if not ssid or ssid == '--' or ssid in seen_ssids:
+            continue
+        seen_ssids.add(ssid)
+        try:
+            signal = int(parts[1].strip())
+        except ValueError:
+            signal = 0
+        networks.append({'ssid': ssid, 'signal': signal, 'security': parts[2].strip()})
+    networks.sort(key=lambda x: x['signal'], reverse=True)
+    return networks
+
+
+def parse_wpa_scan_results(output: str) -> list:
+    """
+    Parse wpa_supplicant SCAN_RESULTS (bssid, frequency, signal level, flags, ssid per line)
+    
+    Returns:
+        List of {"ssid", "signal", "security"} (one entry per SSID, strongest first)
+    """
+    networks = []
+    seen_ssids = set()
+    for line in output.strip().split('\n')[1:]:  # Skip header
+        parts = line.split('\t')
+        if len(parts) < 5:
+            continue
+        ssid = parts[4].strip()
+        if not ssid or ssid in seen_ssids:
+            continue
+        try:
+            signal = int(parts[2])
+        except ValueError:
+            continue
+        seen_ssids.add(ssid)
+        flags = parts[3]
+        security = 'WPA2' if 'WPA2' in flags else ('WPA' if 'WPA' in flags else 'Open')
+        networks.append({'ssid': ssid, 'signal': signal, 'security': security})
+    networks.sort(key=lambda x: x['signal'], reverse=True)
+    return networks
+
+
+@timeline.traced
 def get_ip_address(interface: str = "wlan0", timeout: int = 60) -> str:
     """
     Get IP address from network interface
@@ -387,15 +570,27 @@ def get_ip_address(interface: str = "wlan0", timeout: int = 60) -> str:
     Returns:
         IP address as string, or empty string if not found
     """
-    print(f"Waiting for IP address on {interface} (timeout: {timeout}s)...")
+    logger.info(f"Waiting for IP address on {interface} (timeout: {timeout}s)...")
     start_time = time.time()
     check_count = 0
-    
+
+    # Preferred: wake up on the kernel's RTM_NEWADDR notification (no process spawns, no poll delay)
+    try:
+        ip = wait_for_ipv4_address(interface, timeout)
+        elapsed = time.time() - start_time
+        if ip:
+            logger.info(f"IP address obtained: {ip} (after {elapsed:.1f}s, via rtnetlink)")
+        else:
+            logger.warning(f"Timeout waiting for IP address after {int(elapsed)}s (via rtnetlink)")
+        return ip
+    except OSError as e:
+        logger.warning(f"rtnetlink not available ({e}), falling back to polling 'ip addr show'")
+
     while time.time() - start_time < timeout:
         try:
             check_count += 1
             # Use ip command to get IP address
-            result = subprocess.run(
+            result = commands.run(
                 ['ip', 'addr', 'show', interface],
                 capture_output=True,
                 text=True,
@@ -403,30 +598,26 @@ def get_ip_address(interface: str = "wlan0", timeout: int = 60) -> str:
             )
             
             if result.returncode == 0:
-                # Extract IPv4 address using regex
-                pattern = r'inet\s+(\d+\.\d+\.\d+\.\d+)/\d+'
-                match = re.search(pattern, result.stdout)
-                if match:
-                    ip = match.group(1)
-                    if ip and ip != "127.0.0.1":
-                        elapsed = int(time.time() - start_time)
-                        print(f"IP address obtained: {ip} (after {elapsed}s, {check_count} checks)")
-                        return ip
+                ip = parse_ipv4_address(result.stdout)
+                if ip:
+                    elapsed = int(time.time() - start_time)
+                    logger.info(f"IP address obtained: {ip} (after {elapsed}s, {check_count} checks)")
+                    return ip
             
             # Log progress every 5 seconds
             elapsed = int(time.time() - start_time)
             if check_count % 5 == 0:
-                print(f"Still waiting for IP address... ({elapsed}s elapsed)")
+                logger.info(f"Still waiting for IP address... ({elapsed}s elapsed)")
             
-            time.sleep(1)
+            timeline.sleep(1)
         except subprocess.TimeoutExpired:
             continue
         except Exception as e:
-            print(f"Error getting IP address: {e}")
-            time.sleep(1)
+            logger.error(f"Error getting IP address: {e}")
+            timeline.sleep(1)
     
     elapsed = int(time.time() - start_time)
-    print(f"Timeout waiting for IP address after {elapsed}s ({check_count} checks)")
+    logger.warning(f"Timeout waiting for IP address after {elapsed}s ({check_count} checks)")
     return ""
 
 
@@ -441,10 +632,22 @@ def get_current_ip_address() -> str:
     # Check common interfaces in order of preference
     interfaces = ["eth0", "wlan0", "usb0"]
     
+    # Preferred: in-process address table (one rtnetlink dump, cached until an address changes)
+    try:
+        addresses = interface_addresses()
+    except OSError:
+        addresses = None
+    if addresses is not None:
+        for interface in interfaces:
+            for ip in addresses.get(interface, []):
+                if ip != "127.0.0.1":
+                    return ip
+        return ""
+    
     for interface in interfaces:
         try:
             # Use ip command to get IP address
-            result = subprocess.run(
+            result = commands.run(
                 ['ip', 'addr', 'show', interface],
                 capture_output=True,
                 text=True,
@@ -452,13 +655,9 @@ def get_current_ip_address() -> str:
             )
             
             if result.returncode == 0:
-                # Extract IPv4 address using regex
-                pattern = r'inet\s+(\d+\.\d+\.\d+\.\d+)/\d+'
-                match = re.search(pattern, result.stdout)
-                if match:
-                    ip = match.group(1)
-                    if ip and ip != "127.0.0.1":
-                        return ip
+                ip = parse_ipv4_address(result.stdout)
+                if ip:
+                    return ip
         except subprocess.TimeoutExpired:
             continue
         except Exception as e:
@@ -468,6 +667,7 @@ def get_current_ip_address() -> str:
     return ""
 
 
+@metrics.timed()
 def scan_wifi_networks() -> list:
     """
     Scan for available WiFi networks
@@ -478,9 +678,25 @@ def scan_wifi_networks() -> list:
     """
     networks = []
     
-    # Try NetworkManager first (Raspberry Pi OS Bookworm+)
+    # Try NetworkManager D-Bus API first (Raspberry Pi OS Bookworm+, no nmcli spawn)
+    nm_client = _get_networkmanager_client()
+    if nm_client:
+        try:
+            nm_client.request_scan(timeout=10)
+            strongest = {}
+            for ap in nm_client.get_access_points():
+                ssid = ap['ssid'].strip()
+                if ssid and (ssid not in strongest or ap['signal'] > strongest[ssid]['signal']):
+                    strongest[ssid] = {'ssid': ssid, 'signal': ap['signal'], 'security': ap['security']}
+            if strongest:
+                networks = sorted(strongest.values(), key=lambda x: x['signal'], reverse=True)
+                return networks
+        except Exception as e:
+            logger.warning(f"Error scanning with NetworkManager D-Bus API: {e}")
+    
+    # Try nmcli (NetworkManager without usable D-Bus access)
     try:
-        result = subprocess.run(
+        result = commands.run(
             ['nmcli', '-t', '-f', 'SSID,SIGNAL,SECURITY', 'device', 'wifi', 'list'],
             capture_output=True,
             text=True,
@@ -488,97 +704,40 @@ def scan_wifi_networks() -> list:
         )
         
         if result.returncode == 0:
-            for line in result.stdout.strip().split('\n'):
-                if not line:
-                    continue
-                parts = line.split(':')
-                if len(parts) >= 3:
-                    ssid = parts[0].strip()
-                    if ssid and ssid != '--':  # Skip empty SSIDs
-                        try:
-                            signal = int(parts[1].strip())
-                        except (ValueError, IndexError):
-                            signal = 0
-                        security = parts[2].strip() if len(parts) > 2 else ''
-                        
-                        # Avoid duplicates
-                        if not any(n['ssid'] == ssid for n in networks):
-                            networks.append({
-                                'ssid': ssid,
-                                'signal': signal,
-                                'security': security
-                            })
-            
+            networks = parse_nmcli_wifi_list(result.stdout)
             if networks:
-                # Sort by signal strength (descending)
-                networks.sort(key=lambda x: x['signal'], reverse=True)
                 return networks
     except (FileNotFoundError, subprocess.TimeoutExpired):
         pass
     except Exception as e:
-        print(f"Error scanning with nmcli: {e}")
+        logger.error(f"Error scanning with nmcli: {e}")
     
-    # Fallback to wpa_cli (older Raspberry Pi OS)
+    # Fallback to wpa_supplicant (older Raspberry Pi OS)
     try:
-        # Start scan
-        scan_result = subprocess.run(
-            ['sudo', 'wpa_cli', '-i', 'wlan0', 'scan'],
-            capture_output=True,
-            text=True,
-            timeout=5
-        )
+        try:
+            # Control socket: results are read as soon as CTRL-EVENT-SCAN-RESULTS arrives
+            list_result = subprocess.CompletedProcess(
+                ['scan_results'], 0, stdout=wpa_ctrl.scan('wlan0', timeout=10), stderr='')
+        except OSError:
+            # No control socket access - start scan with wpa_cli and wait for it to complete
+            list_result = subprocess.CompletedProcess(['scan_results'], 1, stdout='', stderr='')
+            scan_result = _wpa_cli('scan', timeout=5)
+            if scan_result.returncode == 0:
+                timeline.sleep(3)
+                list_result = _wpa_cli('scan_results', timeout=5)
         
-        if scan_result.returncode == 0:
-            # Wait for scan to complete
-            time.sleep(3)
-            
-            # Get scan results
-            list_result = subprocess.run(
-                ['sudo', 'wpa_cli', '-i', 'wlan0', 'scan_results'],
-                capture_output=True,
-                text=True,
-                timeout=5
-            )
-            
-            if list_result.returncode == 0:
-                seen_ssids = set()
-                for line in list_result.stdout.strip().split('\n')[1:]:  # Skip header
-                    if not line.strip():
-                        continue
-                    
-                    # Format: bssid frequency signal_level flags ssid
-                    parts = line.split('\t')
-                    if len(parts) >= 5:
-                        try:
-                            signal = int(parts[2])
-                            ssid = parts[4].strip()
-                            
-                            if ssid and ssid not in seen_ssids:
-                                seen_ssids.add(ssid)
-                                
-                                # Determine security from flags
-                                flags = parts[3] if len(parts) > 3 else ''
-                                security = 'WPA2' if 'WPA2' in flags else ('WPA' if 'WPA' in flags else 'Open')
-                                
-                                networks.append({
-                                    'ssid': ssid,
-                                    'signal': signal,
-                                    'security': security
-                                })
-                        except (ValueError, IndexError):
-                            continue
-                
-                # Sort by signal strength (descending)
-                networks.sort(key=lambda x: x['signal'], reverse=True)
-                return networks
+        if list_result.returncode == 0:
+            networks = parse_wpa_scan_results(list_result.stdout)
+            return networks
     except (FileNotFoundError, subprocess.TimeoutExpired):
         pass
     except Exception as e:
-        print(f"Error scanning with wpa_cli: {e}")
+        logger.error(f"Error scanning with wpa_cli: {e}")
     
     return networks
 
 
+@timeline.traced
 def ensure_wifi_enabled() -> bool:
     """
     Ensure WiFi interface is enabled and powered on
@@ -588,11 +747,11 @@ def ensure_wifi_enabled() -> bool:
     """
     interface = "wlan0"
     
-    print(f"Checking if WiFi interface {interface} is enabled...")
+    logger.info(f"Checking if WiFi interface {interface} is enabled...")
     
     # First, check and unblock WiFi with rfkill (in case it's soft/hard blocked)
     try:
-        rfkill_result = subprocess.run(
+        rfkill_result = commands.run(
             ['rfkill', 'list', 'wifi'],
             capture_output=True,
             text=True,
@@ -600,95 +759,110 @@ def ensure_wifi_enabled() -> bool:
         )
         if rfkill_result.returncode == 0:
             rfkill_output = rfkill_result.stdout
-            print(f"rfkill status:\n{rfkill_output}")
+            logger.info(f"rfkill status:\n{rfkill_output}")
             # Check if WiFi is blocked
             if ' blocked: yes' in rfkill_output or ': blocked' in rfkill_output:
-                print("⚠ WiFi is blocked, attempting to unblock...")
+                logger.warning("WiFi is blocked, attempting to unblock...")
                 try:
-                    subprocess.run(['sudo', 'rfkill', 'unblock', 'wifi'], 
+                    commands.run(['sudo', 'rfkill', 'unblock', 'wifi'], 
                                  check=True, timeout=5)
-                    print("✓ WiFi unblocked with rfkill")
-                    time.sleep(2)  # Give time for unblock to take effect
+                    logger.info("WiFi unblocked with rfkill")
+                    timeline.sleep(2)  # Give time for unblock to take effect
                 except subprocess.CalledProcessError as e:
-                    print(f"ERROR: Failed to unblock WiFi with rfkill: {e}")
+                    logger.error(f"Failed to unblock WiFi with rfkill: {e}")
                     return False
             else:
-                print("✓ WiFi is not blocked")
+                logger.info("WiFi is not blocked")
     except FileNotFoundError:
-        print("rfkill not found (may not be installed, continuing...)")
+        logger.info("rfkill not found (may not be installed, continuing...)")
     except Exception as e:
-        print(f"Could not check rfkill status: {e}")
+        logger.warning(f"Could not check rfkill status: {e}")
     
     # Check if interface exists
     try:
-        result = subprocess.run(
+        result = commands.run(
             ['ip', 'link', 'show', interface],
             capture_output=True,
             text=True,
             timeout=5
         )
         if result.returncode != 0:
-            print(f"ERROR: Interface {interface} does not exist")
+            logger.error(f"Interface {interface} does not exist")
             return False
         
-        print(f"Interface {interface} details:\n{result.stdout}")
+        logger.info(f"Interface {interface} details:\n{result.stdout}")
         
         # Check if interface is UP
         if 'state UP' in result.stdout:
-            print(f"✓ WiFi interface {interface} is UP")
+            logger.info(f"WiFi interface {interface} is UP")
             return True
         elif 'state DOWN' in result.stdout:
-            print(f"⚠ WiFi interface {interface} is DOWN, attempting to bring it UP...")
+            logger.warning(f"WiFi interface {interface} is DOWN, attempting to bring it UP...")
             
             # Bring interface UP
             try:
-                subprocess.run(['sudo', 'ip', 'link', 'set', interface, 'up'], 
+                commands.run(['sudo', 'ip', 'link', 'set', interface, 'up'], 
                              check=True, timeout=5)
-                print(f"✓ WiFi interface {interface} brought UP")
-                time.sleep(2)
+                logger.info(f"WiFi interface {interface} brought UP")
                 
                 # Verify it's actually UP now
-                verify_result = subprocess.run(
-                    ['ip', 'link', 'show', interface],
-                    capture_output=True,
-                    text=True,
-                    timeout=5
-                )
-                if 'state UP' in verify_result.stdout:
-                    print(f"✓ Verified: WiFi interface {interface} is now UP")
+                if wait_for_interface_up(interface, timeout=2):
+                    logger.info(f"Verified: WiFi interface {interface} is now UP")
                     return True
                 else:
-                    print(f"⚠ Warning: Interface {interface} may not be fully UP")
+                    logger.warning(f"Interface {interface} may not be fully UP")
                     return True  # Still return True, let it try
             except subprocess.CalledProcessError as e:
-                print(f"ERROR: Failed to bring {interface} UP: {e}")
+                logger.error(f"Failed to bring {interface} UP: {e}")
                 return False
         else:
-            print(f"⚠ Unknown interface state: {result.stdout}")
+            logger.warning(f"Unknown interface state: {result.stdout}")
             return False
             
     except Exception as e:
-        print(f"ERROR: Could not check WiFi interface status: {e}")
+        logger.error(f"Could not check WiFi interface status: {e}")
         return False
 
 
-def configure_wifi_with_networkmanager(ssid: str, password: str) -> tuple[bool, str]:
+@timeline.traced
+def configure_wifi_with_networkmanager(ssid: str, password: str, timeout: float = 30,
+                                       cancel=None, bssid: str = None) -> tuple[bool, str]:
     """
     Configure WiFi using NetworkManager (for Raspberry Pi OS Bookworm+)
     
     Args:
         ssid: WiFi network SSID
         password: WiFi network password
+        timeout: Maximum time to wait for the connection to activate in seconds
+        cancel: Optional threading.Event that aborts the D-Bus activation wait
+        bssid: Optional access point hint (used with the D-Bus API only)
         
     Returns:
         Tuple of (success: bool, ip_address: str)
     """
-    print(f"Configuring WiFi using NetworkManager for SSID: {ssid}")
+    logger.info(f"Configuring WiFi using NetworkManager for SSID: {ssid}")
+    
+    # Preferred: NetworkManager D-Bus API - success is reported as soon as NM reaches ACTIVATED
+    nm_client = _get_networkmanager_client()
+    if nm_client:
+        try:
+            for conn_name in nm_client.delete_wifi_connections(ssid):
+                logger.info(f"Removed existing NetworkManager connection: {conn_name}")
+            logger.info("Activating WiFi connection over NetworkManager D-Bus API...")
+            activated, reason = nm_client.connect(ssid, password, timeout=timeout, cancel=cancel, bssid=bssid)
+            if activated:
+                logger.info("NetworkManager connection ACTIVATED")
+                # NM only reports ACTIVATED after IP configuration, so the address is already there
+                return (True, get_ip_address(timeout=5))
+            logger.error(f"NetworkManager activation failed: {reason}")
+            return (False, "")
+        except Exception as e:
+            logger.warning(f"NetworkManager D-Bus API failed ({e}), falling back to nmcli...")
     
     try:
         # Remove existing connection with same SSID if it exists
         try:
-            subprocess.run(
+            commands.run(
                 ['sudo', 'nmcli', 'connection', 'delete', ssid],
                 capture_output=True,
                 timeout=5
@@ -697,25 +871,25 @@ def configure_wifi_with_networkmanager(ssid: str, password: str) -> tuple[bool,
             pass  # Connection might not exist
         
         # Create new WiFi connection using NetworkManager
-        print("Creating WiFi connection with NetworkManager...")
-        result = subprocess.run(
+        logger.info("Creating WiFi connection with NetworkManager...")
+        result = commands.run(
             ['sudo', 'nmcli', 'device', 'wifi', 'connect', ssid, 'password', password],
             capture_output=True,
             text=True,
-            timeout=30
+            timeout=timeout
         )
         
         if result.returncode == 0:
-            print(f"✓ WiFi connection created successfully")
-            print(f"nmcli output: {result.stdout}")
+            logger.info(f"WiFi connection created successfully")
+            logger.info(f"nmcli output: {result.stdout}")
             return (True, "")
         else:
-            print(f"ERROR: nmcli connect failed: {result.stderr}")
+            logger.error(f"nmcli connect failed: {result.stderr}")
             # Try alternative method - create connection profile first
-            print("Trying alternative method: creating connection profile...")
+            logger.info("Trying alternative method: creating connection profile...")
             try:
                 # Create connection
-                create_result = subprocess.run(
+                create_result = commands.run(
                     ['sudo', 'nmcli', 'connection', 'add', 
                      'type', 'wifi', 
                      'con-name', ssid,
@@ -728,304 +902,80 @@ def configure_wifi_with_networkmanager(ssid: str, password: str) -> tuple[bool,
                     timeout=10
                 )
                 if create_result.returncode == 0:
-                    print("✓ Connection profile created")
+                    logger.info("Connection profile created")
                     # Activate the connection
-                    activate_result = subprocess.run(
+                    activate_result = commands.run(
                         ['sudo', 'nmcli', 'connection', 'up', ssid],
                         capture_output=True,
                         text=True,
                         timeout=30
                     )
                     if activate_result.returncode == 0:
-                        print("✓ Connection activated")
+                        logger.info("Connection activated")
                         return (True, "")
                     else:
-                        print(f"ERROR: Failed to activate connection: {activate_result.stderr}")
+                        logger.error(f"Failed to activate connection: {activate_result.stderr}")
                         return (False, "")
                 else:
-                    print(f"ERROR: Failed to create connection profile: {create_result.stderr}")
+                    logger.error(f"Failed to create connection profile: {create_result.stderr}")
                     return (False, "")
             except Exception as e:
-                print(f"ERROR: Exception in alternative method: {e}")
+                logger.error(f"Exception in alternative method: {e}")
                 return (False, "")
     except Exception as e:
-        print(f"ERROR: NetworkManager configuration failed: {e}")
+        logger.error(f"NetworkManager configuration failed: {e}")
         return (False, "")
 
 
-def configure_wifi(ssid: str, password: str) -> tuple[bool, str]:
+def print_wifi_diagnostics(interface: str = "wlan0"):
     """
-    Complete WiFi configuration process
-    Detects if NetworkManager is active and uses appropriate method
+    Log wpa_supplicant, interface and NetworkManager state after a failed configuration (WARNING)
     
     Args:
-        ssid: WiFi network SSID
-        password: WiFi network password
-        
-    Returns:
-        Tuple of (success: bool, ip_address: str)
+        interface: Network interface name (default: wlan0)
     """
-    print(f"Starting WiFi configuration for SSID: {ssid}")
-    
-    # Check if NetworkManager is active
-    networkmanager_active = False
+    logger.warning("=== Final Diagnostic Check ===")
     try:
-        nm_check = subprocess.run(
-            ['systemctl', 'is-active', '--quiet', 'NetworkManager'],
-            timeout=2
-        )
-        if nm_check.returncode == 0:
-            networkmanager_active = True
-            print("NetworkManager is active - will use NetworkManager for WiFi configuration")
-    except:
-        pass
-    
-    # Step 0: Ensure WiFi is enabled
-    print("Step 0: Checking WiFi interface status...")
-    if not ensure_wifi_enabled():
-        print("ERROR: WiFi interface is not enabled or cannot be enabled")
-        return (False, "")
-    print("WiFi interface is enabled and ready")
-    
-    # If NetworkManager is active, use it for configuration
-    if networkmanager_active:
-        print("Using NetworkManager for WiFi configuration...")
-        # Write to wpa_supplicant.conf as backup, but use NetworkManager primarily
-        write_wifi_config(ssid, password)  # Write as backup
+        # Check wpa_cli status one more time
+        final_status = _wpa_cli('status', timeout=5)
+        if final_status.returncode == 0:
+            logger.warning(f"Final WiFi status:\n{final_status.stdout}")
+            list_result = _wpa_cli('list_networks', timeout=5)
+            if list_result.returncode == 0:
+                logger.warning(f"Configured networks:\n{list_result.stdout}")
         
-        nm_success, _ = configure_wifi_with_networkmanager(ssid, password)
-        if not nm_success:
-            print("NetworkManager configuration failed, falling back to wpa_supplicant method...")
-            # Fall through to wpa_supplicant method
-        else:
-            # NetworkManager configured successfully, now wait for IP
-            print("Waiting 10 seconds for NetworkManager to connect...")
-            time.sleep(10)
-            ip_address = get_ip_address(timeout=60)
-            if ip_address:
-                print(f"WiFi configuration SUCCESSFUL! IP address: {ip_address}")
-                return (True, ip_address)
-            else:
-                print("NetworkManager connected but IP address not obtained")
-                return (False, "")
-    
-    # Write configuration to wpa_supplicant.conf (for non-NetworkManager or fallback)
-    print("Step 1: Writing WiFi configuration to wpa_supplicant.conf...")
-    if not write_wifi_config(ssid, password):
-        print("ERROR: Failed to write WiFi configuration")
-        return (False, "")
-    print("WiFi configuration written successfully")
-    
-    # Restart WiFi
-    print("Step 2: Restarting WiFi services...")
-    if not restart_wifi():
-        print("ERROR: Failed to restart WiFi services")
-        return (False, "")
-    print("WiFi services restarted successfully")
-    
-    # After restarting services, ensure interface is still UP
-    print("Verifying WiFi interface is still UP after service restart...")
-    if not ensure_wifi_enabled():
-        print("WARNING: WiFi interface went DOWN after service restart, attempting to fix...")
-        # Try one more time
-        time.sleep(2)
-        if not ensure_wifi_enabled():
-            print("ERROR: Could not keep WiFi interface UP")
-            return (False, "")
-    
-    # Give WiFi some time to start connecting before checking for IP
-    print("Waiting 5 seconds for WiFi to start connecting...")
-    time.sleep(5)
-    
-    # Check if wpa_supplicant is actually running
-    print("Checking if wpa_supplicant is running...")
-    try:
-        wpa_status = subprocess.run(
-            ['systemctl', 'is-active', 'wpa_supplicant'],
-            capture_output=True,
-            text=True,
-            timeout=3
-        )
-        if wpa_status.returncode == 0:
-            print("✓ wpa_supplicant service is active")
-        else:
-            print("⚠ wpa_supplicant service is not active")
-            print("Attempting to start wpa_supplicant...")
-            try:
-                subprocess.run(['sudo', 'systemctl', 'start', 'wpa_supplicant'], 
-                             check=True, timeout=10)
-                print("✓ wpa_supplicant started")
-                time.sleep(3)  # Give it time to initialize
-            except Exception as e:
-                print(f"Failed to start wpa_supplicant: {e}")
-    except Exception as e:
-        print(f"Could not check wpa_supplicant status: {e}")
-    
-    # Check WiFi connection status
-    print("Checking WiFi connection status...")
-    wifi_connected = False
-    try:
-        status_result = subprocess.run(
-            ['sudo', 'wpa_cli', '-i', 'wlan0', 'status'],
+        # Check if interface has any IP (even link-local)
+        ip_result = commands.run(
+            ['ip', 'addr', 'show', interface],
             capture_output=True,
             text=True,
             timeout=5
         )
-        if status_result.returncode == 0:
-            status_output = status_result.stdout.strip()
-            print(f"WiFi status output:\n{status_output}")
-            # Check if connected
-            if 'wpa_state=COMPLETED' in status_output or 'wpa_state=4' in status_output:
-                print("✓ WiFi is connected (COMPLETED state)")
-                wifi_connected = True
-            else:
-                print(f"⚠ WiFi not in COMPLETED state. Current state: {status_output}")
-        else:
-            print(f"wpa_cli status returned non-zero: {status_result.returncode}")
-            print(f"stderr: {status_result.stderr}")
-            print("This might mean wpa_supplicant is not running or not configured for wlan0")
-            # Try to check if NetworkManager is managing WiFi instead
-            try:
-                nm_result = subprocess.run(
-                    ['nmcli', 'device', 'status'],
-                    capture_output=True,
-                    text=True,
-                    timeout=5
-                )
-                if nm_result.returncode == 0:
-                    print(f"NetworkManager device status:\n{nm_result.stdout}")
-            except:
-                pass
-    except Exception as e:
-        print(f"Could not check WiFi status with wpa_cli: {e}")
-    
-    # Also check interface status with ip command
-    try:
-        link_result = subprocess.run(
-            ['ip', 'link', 'show', 'wlan0'],
-            capture_output=True,
-            text=True,
-            timeout=5
-        )
-        if link_result.returncode == 0:
-            print(f"Interface wlan0 status:\n{link_result.stdout}")
-            if 'state UP' in link_result.stdout:
-                print("✓ Interface wlan0 is UP")
-            else:
-                print("⚠ Interface wlan0 is not UP")
-    except Exception as e:
-        print(f"Could not check interface status: {e}")
-    
-    # Check if we can see the SSID in scan
-    if not wifi_connected:
-        print("WiFi not connected yet, checking available networks...")
-        try:
-            scan_result = subprocess.run(
-                ['sudo', 'wpa_cli', '-i', 'wlan0', 'scan'],
-                capture_output=True,
-                text=True,
-                timeout=5
-            )
-            time.sleep(2)  # Wait for scan to complete
-            list_result = subprocess.run(
-                ['sudo', 'wpa_cli', '-i', 'wlan0', 'list_networks'],
-                capture_output=True,
-                text=True,
-                timeout=5
-            )
-            if list_result.returncode == 0:
-                print(f"Configured networks:\n{list_result.stdout}")
-        except Exception as e:
-            print(f"Could not check networks: {e}")
-    
-    # Wait for IP address (increased timeout to 60 seconds)
-    print("Step 3: Waiting for IP address assignment...")
-    
-    # Periodically check WiFi status while waiting for IP
-    def check_wifi_periodically():
-        """Check WiFi status every 10 seconds"""
-        for i in range(6):  # Check 6 times over 60 seconds
-            time.sleep(10)
-            try:
-                status_result = subprocess.run(
-                    ['sudo', 'wpa_cli', '-i', 'wlan0', 'status'],
-                    capture_output=True,
-                    text=True,
-                    timeout=3
-                )
-                if status_result.returncode == 0:
-                    status_output = status_result.stdout.strip()
-                    if 'wpa_state=COMPLETED' in status_output:
-                        # Extract SSID and signal strength if available
-                        ssid_line = [line for line in status_output.split('\n') if 'ssid=' in line]
-                        if ssid_line:
-                            print(f"WiFi status check: Connected to {ssid_line[0]}")
-                        else:
-                            print("WiFi status check: Connected (COMPLETED)")
-                    else:
-                        print(f"WiFi status check: Not connected - {status_output.split(chr(10))[0] if status_output else 'unknown'}")
-            except:
-                pass
-    
-    # Start background status checking
-    import threading
-    status_thread = threading.Thread(target=check_wifi_periodically, daemon=True)
-    status_thread.start()
-    
-    ip_address = get_ip_address(timeout=60)
-    
-    if ip_address:
-        print(f"WiFi configuration SUCCESSFUL! IP address: {ip_address}")
-        return (True, ip_address)
-    else:
-        print("ERROR: WiFi configuration completed but IP address not obtained")
+        if ip_result.returncode == 0:
+            logger.warning(f"Interface {interface} details:\n{ip_result.stdout}")
         
-        # Final diagnostic check
-        print("\n=== Final Diagnostic Check ===")
+        # Check NetworkManager status if it's running
         try:
-            # Check wpa_cli status one more time
-            final_status = subprocess.run(
-                ['sudo', 'wpa_cli', '-i', 'wlan0', 'status'],
+            nm_status = commands.run(
+                ['systemctl', 'status', 'NetworkManager', '--no-pager', '-l'],
                 capture_output=True,
                 text=True,
                 timeout=5
             )
-            if final_status.returncode == 0:
-                print(f"Final WiFi status:\n{final_status.stdout}")
-            
-            # Check if interface has any IP (even link-local)
-            ip_result = subprocess.run(
-                ['ip', 'addr', 'show', 'wlan0'],
-                capture_output=True,
-                text=True,
-                timeout=5
-            )
-            if ip_result.returncode == 0:
-                print(f"Interface wlan0 details:\n{ip_result.stdout}")
+            if nm_status.returncode == 0:
+                logger.warning(f"NetworkManager status (last 10 lines):\n" + '\n'.join(nm_status.stdout.split('\n')[-10:]))
+        except:
+            pass
             
-            # Check NetworkManager status if it's running
-            try:
-                nm_status = subprocess.run(
-                    ['systemctl', 'status', 'NetworkManager', '--no-pager', '-l'],
-                    capture_output=True,
-                    text=True,
-                    timeout=5
-                )
-                if nm_status.returncode == 0:
-                    print(f"NetworkManager status (last 10 lines):\n" + '\n'.join(nm_status.stdout.split('\n')[-10:]))
-            except:
-                pass
-                
-        except Exception as e:
-            print(f"Error during final diagnostic: {e}")
-        
-        print("\nPossible causes:")
-        print("  - WiFi credentials are incorrect")
-        print("  - WiFi network is not in range")
-        print("  - Network requires additional configuration (WPA2 Enterprise, etc.)")
-        print("  - DHCP server is not responding")
-        print("  - NetworkManager may be interfering with wpa_supplicant")
-        return (False, "")
+    except Exception as e:
+        logger.error(f"Error during final diagnostic: {e}")
+    
+    logger.warning("Possible causes:\n"
+                   "  - WiFi credentials are incorrect\n"
+                   "  - WiFi network is not in range\n"
+                   "  - Network requires additional configuration (WPA2 Enterprise, etc.)\n"
+                   "  - DHCP server is not responding\n"
+                   "  - NetworkManager may be interfering with wpa_supplicant")
 
 
 if __name__ == "__main__":
@@ -1036,6 +986,8 @@ if __name__ == "__main__":
     """
     import sys
     
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    
     if len(sys.argv) > 1 and sys.argv[1] == "delete-all":
         print("=" * 60)
         print("Deleting all saved WiFi networks from Raspberry Pi")
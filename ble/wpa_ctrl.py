@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+"""
+wpa_supplicant control interface client for Raspberry Pi
+Speaks the wpa_ctrl datagram protocol on /var/run/wpa_supplicant/<interface> directly,
+replacing `sudo wpa_cli` process spawns and fixed sleeps with ATTACHed event waits
+"""
+
+import itertools
+import os
+import re
+import select
+import socket
+import time
+
+WPA_CTRL_DIR = "/var/run/wpa_supplicant"
+LOCAL_SOCKET_DIR = "/tmp"
+
+# How often waits with a cancel event re-check it (seconds)
+CANCEL_CHECK_INTERVAL = 0.25
+
+EVENT_SCAN_RESULTS = "CTRL-EVENT-SCAN-RESULTS"
+EVENT_CONNECTED = "CTRL-EVENT-CONNECTED"
+EVENT_DISCONNECTED = "CTRL-EVENT-DISCONNECTED"
+EVENT_SSID_TEMP_DISABLED = "CTRL-EVENT-SSID-TEMP-DISABLED"
+
+_local_counter = itertools.count()
+
+# key=value fields of an event; values may be quoted with \" and \\ escapes (e.g. ssid="My \"Net\"")
+_EVENT_FIELD = re.compile(r'(\w+)=("(?:[^"\\]|\\.)*"|[^\s\]]*)')
+# wpa_supplicant's printf_encode() escapes in SSIDs
+_SSID_ESCAPE = re.compile(r'\\(x[0-9a-fA-F]{2}|.)')
+_SSID_ESCAPES = {'n': b'\n', 'r': b'\r', 't': b'\t', 'e': b'\x1b'}
+
+
+class WpaCtrlError(OSError):
+    """Raised when wpa_supplicant does not answer or rejects a command"""
+
+
+def ctrl_path(interface: str = "wlan0") -> str:
+    """Path of the wpa_supplicant control socket for an interface"""
+    return os.path.join(WPA_CTRL_DIR, interface)
+
+
+def decode_ssid(text: str) -> str:
+    """Undo the escaping wpa_supplicant applies to SSIDs (printf_encode) in STATUS and events"""
+    if '\\' not in text:
+        return text
+    data = bytearray()
+    position = 0
+    for match in _SSID_ESCAPE.finditer(text):
+        data += text[position:match.start()].encode('utf-8')
+        code = match.group(1)
+        if len(code) == 3:
+            data.append(int(code[1:], 16))
+        else:
+            data += _SSID_ESCAPES.get(code, code.encode('utf-8'))
+        position = match.end()
+    data += text[position:].encode('utf-8')
+    return data.decode('utf-8', 'replace')
+
+
+def parse_event(message: str) -> tuple[str, dict]:
+    """
+    Split an unsolicited message into event name and key=value fields
+
+    Args:
+        message: e.g. '<3>CTRL-EVENT-SSID-TEMP-DISABLED id=0 ssid="Home" auth_failures=1 reason=WRONG_KEY'
+
+    Returns:
+        Tuple of (event name, fields dict); quoted values are unquoted and unescaped
+    """
+    if message.startswith('<') and '>' in message:
+        message = message[message.index('>') + 1:]
+    name, _, rest = message.strip().partition(' ')
+    fields = {}
+    for key, value in _EVENT_FIELD.findall(rest):
+        if len(value) >= 2 and value[0] == value[-1] == '"':
+            value = decode_ssid(value[1:-1])
+        fields[key] = value
+    return (name, fields)
+
+
+def parse_status(output: str) -> dict:
+    """Parse STATUS reply (key=value lines) into a dictionary"""
+    status = {}
+    for line in output.splitlines():
+        if '=' in line:
+            key, value = line.split('=', 1)
+            status[key] = value
+    return status
+
+
+class WpaCtrl:
+    """One connection to a wpa_supplicant control socket"""
+
+    def __init__(self, path: str = None, local_dir: str = LOCAL_SOCKET_DIR):
+        """
+        Args:
+            path: Control socket of wpa_supplicant (default: /var/run/wpa_supplicant/wlan0)
+            local_dir: Directory for our own bound socket (wpa_supplicant replies to it)
+
+        Raises:
+            OSError: If the control socket does not exist or refuses the connection
+        """
+        self.path = path or ctrl_path()
+        self.local_path = os.path.join(local_dir, f"wpa_ctrl_{os.getpid()}-{next(_local_counter)}")
+        self.attached = False
+        self.pending_events = []
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        try:
+            if os.path.exists(self.local_path):
+                os.unlink(self.local_path)
+            self.sock.bind(self.local_path)
+            self.sock.connect(self.path)
+        except OSError:
+            self.close()
+            raise
+
+    def close(self):
+        if self.attached:
+            try:
+                self.request("DETACH", timeout=1)
+            except OSError:
+                pass
+            self.attached = False
+        self.sock.close()
+        try:
+            os.unlink(self.local_path)
+        except OSError:
+            pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def _receive(self, timeout: float):
+        readable, _, _ = select.select([self.sock], [], [], max(0.0, timeout))
+        if not readable:
+            return None
+        return self.sock.recv(8192).decode('utf-8', 'replace')
+
+    def request(self, command: str, timeout: float = 5) -> str:
+        """
+        Send a command and return wpa_supplicant's reply
+
+        Unsolicited event messages that arrive in between are kept for wait_event().
+
+        Raises:
+            WpaCtrlError: If no reply arrives within timeout
+        """
+        self.sock.send(command.encode('utf-8'))
+        deadline = time.monotonic() + timeout
+        while True:
+            message = self._receive(deadline - time.monotonic())
+            if message is None:
+                raise WpaCtrlError(f"Timeout waiting for reply to {command.split(' ')[0]}")
+            if message.startswith('<'):
+                self.pending_events.append(message)
+                continue
+            return message
+
+    def attach(self):
+        """Subscribe this connection to unsolicited events"""
+        reply = self.request("ATTACH")
+        if not reply.startswith("OK"):
+            raise WpaCtrlError(f"ATTACH failed: {reply.strip()}")
+        self.attached = True
+
+    def wait_event(self, events, timeout: float):
+        """
+        Wait for the first event whose name is in events
+
+        Args:
+            events: Iterable of event names, e.g. (EVENT_CONNECTED, EVENT_SSID_TEMP_DISABLED)
+            timeout: Maximum time to wait in seconds
+
+        Returns:
+            Tuple of (event name, fields dict), or None on timeout
+        """
+        events = tuple(events)
+        deadline = time.monotonic() + timeout
+        while True:
+            while self.pending_events:
+                name, fields = parse_event(self.pending_events.pop(0))
+                if name in events:
+                    return (name, fields)
+            message = self._receive(deadline - time.monotonic())
+            if message is None:
+                return None
+            if message.startswith('<'):
+                self.pending_events.append(message)
+
+
+def scan(interface: str = "wlan0", timeout: float = 10, path: str = None) -> str:
+    """
+    Trigger a scan and return SCAN_RESULTS as soon as CTRL-EVENT-SCAN-RESULTS arrives
+
+    Returns:
+        SCAN_RESULTS text (same format as `wpa_cli scan_results`)
+
+    Raises:
+        OSError: If the control socket is not available
+    """
+    with WpaCtrl(path or ctrl_path(interface)) as ctrl:
+        ctrl.attach()
+        reply = ctrl.request("SCAN")
+        # FAIL-BUSY means a scan is already running - its results are just as good
+        if reply.startswith("OK") or reply.startswith("FAIL-BUSY"):
+            ctrl.wait_event((EVENT_SCAN_RESULTS,), timeout)
+        return ctrl.request("SCAN_RESULTS")
+
+
+def connected_ssid(ctrl: WpaCtrl):
+    """SSID wpa_supplicant is associated with, or None while not connected"""
+    status = parse_status(ctrl.request("STATUS"))
+    if status.get('wpa_state') != 'COMPLETED':
+        return None
+    return decode_ssid(status.get('ssid', ''))
+
+
+def wait_for_connection(interface: str = "wlan0", timeout: float = 30, path: str = None,
+                        cancel=None, ssid: str = None) -> tuple[bool, str]:
+    """
+    Wait until wpa_supplicant associates with the network or gives up on it
+
+    Other networks saved in wpa_supplicant.conf may connect or fail meanwhile; with `ssid`
+    given, only a connection to that network counts and only its rejections fail the wait.
+
+    Args:
+        cancel: Optional threading.Event - the wait gives up with reason "cancelled" when set
+        ssid: Network that was just provisioned (None: any network)
+
+    Returns:
+        Tuple of (connected: bool, failure reason: str)
+        reason is e.g. "WRONG_KEY" for CTRL-EVENT-SSID-TEMP-DISABLED, "timeout" otherwise
+
+    Raises:
+        OSError: If the control socket is not available
+    """
+    deadline = time.monotonic() + timeout
+    with WpaCtrl(path or ctrl_path(interface)) as ctrl:
+        ctrl.attach()
+        # Attach first, then check the state, so a connection in between is not missed
+        current = connected_ssid(ctrl)
+        if current is not None and (ssid is None or current == ssid):
+            return (True, "")
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return (False, "timeout")
+            if cancel is not None:
+                if cancel.is_set():
+                    return (False, "cancelled")
+                remaining = min(remaining, CANCEL_CHECK_INTERVAL)
+            event = ctrl.wait_event((EVENT_CONNECTED, EVENT_SSID_TEMP_DISABLED), remaining)
+            if event is None:
+                continue
+            name, fields = event
+            if name == EVENT_CONNECTED:
+                # The event names the BSSID only - confirm it is the provisioned network
+                if ssid is None or connected_ssid(ctrl) == ssid:
+                    return (True, "")
+                continue
+            if ssid is not None and 'ssid' in fields and fields['ssid'] != ssid:
+                # Another saved network was rejected
+                continue
+            return (False, fields.get('reason', 'SSID temporarily disabled'))
@@ -214,16 +214,18 @@ install_ble_files() {
         exit 1
     fi
     
-    # Download wifi_config.py
-    print_info "Downloading wifi_config.py from GitHub..."
-    if wget -q --spider "${GITHUB_RAW_BASE}/wifi_config.py" 2>/dev/null; then
-        wget --progress=bar:force "${GITHUB_RAW_BASE}/wifi_config.py" -O "wifi_config.py"
-        chmod +x "wifi_config.py"
-        print_info "Downloaded wifi_config.py"
-    else
-        print_error "Failed to download wifi_config.py from ${GITHUB_RAW_BASE}/wifi_config.py"
-        exit 1
-    fi
+    # Download Python modules imported by ble_wifi_server.py
+    for module in wifi_config.py netlink_monitor.py nm_dbus.py wpa_ctrl.py scan_cache.py scan_codec.py podman_api.py container_monitor.py log_tail.py journal_reader.py log_stream.py tracing.py metrics.py commands.py timeline.py provisioning.py provisioning_queue.py credentials_codec.py session_recorder.py; do
+        print_info "Downloading ${module} from GitHub..."
+        if wget -q --spider "${GITHUB_RAW_BASE}/${module}" 2>/dev/null; then
+            wget --progress=bar:force "${GITHUB_RAW_BASE}/${module}" -O "${module}"
+            chmod +x "${module}"
+            print_info "Downloaded ${module}"
+        else
+            print_error "Failed to download ${module} from ${GITHUB_RAW_BASE}/${module}"
+            exit 1
+        fi
+    done
     
     # Download requirements.txt
     print_info "Downloading requirements.txt from GitHub..."